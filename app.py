@@ -1,223 +1,205 @@
 import streamlit as st
-import requests
 import json
+import os
 import re
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
 from datetime import datetime
 
-# Configure page
-st.set_page_config(
-    page_title="AI Time Machine",
-    page_icon="🕰️",
-    layout="wide",
-    initial_sidebar_state="expanded"
+from archive import get_archive
+from chat_session import ChatSession
+from context_assembly import DEFAULT_CONTEXT_TOKENS, assemble_context, context_stats
+from deadlines import CONTEXT_SHARE, REQUEST_BUDGET, Deadline, DeadlineExceeded
+from entities import extract_entities, get_title_index
+from gemini_client import genai_available, get_gemini_client, shared_stats, speculation_budget
+from jobs import DONE, FAILED, get_job_queue
+from json_stream import IncrementalItemParser, parse_generation, parse_stats
+from metrics import get_metrics
+from prewarm import get_warmer
+from question_index import get_question_index
+from render import (
+    archive_hits_html, chat_html, chat_message_html, chat_page, chat_page_count, fragments, items_html,
+    news_item_html, newsfeed_html, page_style_html, timeline_event_html, timeline_html
 )
+from result_cache import get_result_cache, normalize_question, result_cache_key
+from session_store import get_session_store
+from timeline_extension import add_sub_events, last_year, merge_events, timeline_digest
+from wiki_context import get_wikipedia_fetcher
 
-# Custom CSS for better UI
-st.markdown("""
-<style>
-    .main-header {
-        background: ./time_bg.jpg;
-        padding: 2rem 1rem;
-        border-radius: 10px;
-        margin-bottom: 2rem;
-        text-align: center;
-        color: white;
-    }
-    
-    .main-header h1 {
-        font-size: 3rem;
-        margin: 0;
-        text-shadow: 2px 2px 4px rgba(0,0,0,0.3);
-    }
-    
-    .main-header p {
-        font-size: 1.2rem;
-        margin: 0.5rem 0 0 0;
-        opacity: 0.9;
-    }
-    
-    .timeline-item {
-        background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%);
-        padding: 1.5rem;
-        border-radius: 15px;
-        margin: 1rem 0;
-        border-left: 5px solid #667eea;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        transition: transform 0.3s ease;
-    }
-    
-    .timeline-item:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 8px 15px rgba(0, 0, 0, 0.15);
-    }
-    
-    .news-item {
-        background: linear-gradient(135deg, #ffecd2 0%, #fcb69f 100%);
-        padding: 1.5rem;
-        border-radius: 15px;
-        margin: 1rem 0;
-        border-left: 5px solid #ff6b6b;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        transition: transform 0.3s ease;
-    }
-    
-    .news-item:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 8px 15px rgba(0, 0, 0, 0.15);
-    }
-    
-    .chat-message {
-        background: linear-gradient(135deg, #e3ffe7 0%, #d9e7ff 100%);
-        padding: 1rem;
-        border-radius: 10px;
-        margin: 0.5rem 0;
-        border-left: 4px solid #4ecdc4;
-    }
-    
-    .mode-card {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        padding: 1rem;
-        border-radius: 10px;
-        margin: 0.5rem 0;
-        color: white;
-        text-align: center;
-        transition: all 0.3s ease;
-    }
-    
-    .mode-card:hover {
-        transform: scale(1.05);
-        box-shadow: 0 8px 20px rgba(102, 126, 234, 0.3);
-    }
-    
-    .probability-high {
-        background: linear-gradient(90deg, #ff6b6b, #ee5a24);
-        color: white;
-        padding: 0.2rem 0.5rem;
-        border-radius: 20px;
-        font-size: 0.8rem;
-        font-weight: bold;
-    }
-    
-    .probability-medium {
-        background: linear-gradient(90deg, #feca57, #ff9ff3);
-        color: white;
-        padding: 0.2rem 0.5rem;
-        border-radius: 20px;
-        font-size: 0.8rem;
-        font-weight: bold;
-    }
-    
-    .probability-low {
-        background: linear-gradient(90deg, #48dbfb, #0abde3);
-        color: white;
-        padding: 0.2rem 0.5rem;
-        border-radius: 20px;
-        font-size: 0.8rem;
-        font-weight: bold;
-    }
-    
-    .input-container {
-        background: linear-gradient(135deg, #ffffff 0%, #f8f9fa 100%);
-        padding: 2rem;
-        border-radius: 15px;
-        margin: 1rem 0;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-    }
-    
-    .sidebar .stSelectbox {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        border-radius: 10px;
-    }
-    
-    .stButton > button {
-        background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        border: none;
-        padding: 0.5rem 2rem;
-        border-radius: 25px;
-        font-weight: bold;
-        transition: all 0.3s ease;
-    }
-    
-    .stButton > button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 15px rgba(102, 126, 234, 0.4);
-    }
-    
-    .footer {
-        background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        text-align: center;
-        padding: 1rem;
-        border-radius: 10px;
-        margin-top: 2rem;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# Check if google-generativeai is available
-try:
-    import google.generativeai as genai
-    GENAI_AVAILABLE = True
-except ImportError:
-    GENAI_AVAILABLE = False
-    st.error("Please install google-generativeai: pip install google-generativeai")
+# The SDK itself is imported lazily, on the first Gemini call
+GENAI_AVAILABLE = genai_available()
 
 # Configure Gemini API
-GOOGLE_API_KEY = "your api key"
+GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY", "your api key")
+
+# Chat history is shown a page of this many messages at a time, newest page first
+CHAT_MESSAGES_SHOWN = 20
+
+# Asking several figures at once: at most this many calls run in parallel
+FANOUT_WORKERS = 6
+
+# Archived events listed for one sidebar search
+ARCHIVE_HITS_SHOWN = 20
+
+# Offered in the sidebar and generated ahead of time so a click renders at once
+EXAMPLE_QUESTIONS = [
+    "What if the Library of Alexandria never burned down?",
+    "What if Napoleon won at Waterloo?",
+    "What if the internet was invented in the 1800s?",
+    "What if dinosaurs never went extinct?",
+    "What if the Roman Empire never fell?"
+]
+
+# Response schemas for Gemini's structured output mode
+TIMELINE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "timeline": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "year": {"type": "string"},
+                    "event": {"type": "string"},
+                    "impact": {"type": "string"},
+                    "probability": {"type": "string", "enum": ["High", "Medium", "Low"]}
+                },
+                "required": ["year", "event", "impact", "probability"]
+            }
+        },
+        "summary": {"type": "string"}
+    },
+    "required": ["timeline", "summary"]
+}
+
+# Follow-ups return bare events: more of the timeline, or sub-events of one event
+EXTENSION_SCHEMA = {
+    "type": "object",
+    "properties": {"timeline": TIMELINE_SCHEMA["properties"]["timeline"]},
+    "required": ["timeline"]
+}
+
+SUB_EVENTS_SCHEMA = {
+    "type": "object",
+    "properties": {"sub_events": TIMELINE_SCHEMA["properties"]["timeline"]},
+    "required": ["sub_events"]
+}
+
+NEWSFEED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "news_items": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "headline": {"type": "string"},
+                    "date": {"type": "string"},
+                    "source": {"type": "string"},
+                    "summary": {"type": "string"}
+                },
+                "required": ["headline", "date", "source", "summary"]
+            }
+        }
+    },
+    "required": ["news_items"]
+}
+
+FANOUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "replies": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "figure": {"type": "string"},
+                    "reply": {"type": "string"}
+                },
+                "required": ["figure", "reply"]
+            }
+        }
+    },
+    "required": ["replies"]
+}
 
-if GENAI_AVAILABLE:
-    genai.configure(api_key=GOOGLE_API_KEY)
+# Default for TimeMachine collaborators: use the process-wide instance (None turns it off)
+SHARED = object()
 
 class TimeMachine:
-    def __init__(self):
-        if GENAI_AVAILABLE:
-            # Try different model names that are available
-            try:
-                self.model = genai.GenerativeModel('gemini-1.5-flash')
-            except:
-                try:
-                    self.model = genai.GenerativeModel('gemini-1.5-pro')
-                except:
-                    try:
-                        self.model = genai.GenerativeModel('models/gemini-1.5-flash')
-                    except:
-                        self.model = None
-                        st.error("Could not initialize Gemini model. Please check your API key and model availability.")
-        else:
-            self.model = None
+    # Bump whenever a generation prompt changes so cached results are not reused
+    PROMPT_VERSION = 2
+
+    def __init__(self, structured_output=True, api_key=None, model=SHARED, fetcher=SHARED, title_index=SHARED,
+                 result_cache=SHARED, question_index=SHARED, archive=SHARED, metrics=SHARED):
+        # Ask Gemini for JSON matching TIMELINE_SCHEMA / NEWSFEED_SCHEMA instead of free text
+        self.structured_output = structured_output
+        self.result_cache = get_result_cache(self.PROMPT_VERSION) if result_cache is SHARED else result_cache
+        self.question_index = get_question_index() if question_index is SHARED else question_index
+        # Every generation is also kept for search; None when TIME_MACHINE_ARCHIVE=off
+        self.archive = get_archive() if archive is SHARED else archive
+        self.fetcher = get_wikipedia_fetcher() if fetcher is SHARED else fetcher
+        self.title_index = get_title_index(self.fetcher) if title_index is SHARED else title_index
+        # Token budget for Wikipedia context in generation prompts; None sends every extract in full
+        self.context_tokens = DEFAULT_CONTEXT_TOKENS
+        # One client per process, shared by every session
+        if model is SHARED:
+            model = get_gemini_client(api_key or GOOGLE_API_KEY) if GENAI_AVAILABLE else None
+        self.model = model
+        self.metrics = get_metrics() if metrics is SHARED else metrics
+        self.register_collectors()
+    
+    def register_collectors(self):
+        """Export the caches' and clients' own counters alongside the stage timings"""
+        self.metrics.register_collector('result_cache', self.result_cache.stats)
+        self.metrics.register_collector('question_index', self.question_index.stats)
+        if self.archive is not None:
+            self.metrics.register_collector('archive', self.archive.stats)
+        if getattr(self.fetcher, 'cache', None) is not None:
+            self.metrics.register_collector('wiki_cache', self.fetcher.cache.stats)
+        if hasattr(self.fetcher, 'stats'):
+            self.metrics.register_collector('wiki_fetch', self.fetcher.stats)
+        self.metrics.register_collector('gemini', shared_stats.snapshot)
+        self.metrics.register_collector('parse', parse_stats.snapshot, label='mode')
+        self.metrics.register_collector('context', context_stats.snapshot)
+        self.metrics.register_collector('jobs', get_job_queue().stats)
             
-    def fetch_wikipedia_context(self, query):
-        """Fetch relevant historical context from Wikipedia"""
+    def fetch_wikipedia_context(self, query, deadline=None, errors=None):
+        """Fetch relevant historical context from Wikipedia, within its share of the deadline if given
+        
+        This runs in job threads, where st.error does nothing, so a failure is
+        appended to `errors` for the polling rerun to show and [] is returned.
+        """
         try:
-            # Search for relevant articles
-            search_url = "https://en.wikipedia.org/api/rest_v1/page/summary/"
-            
             # Extract key terms from query for better search
-            search_terms = self.extract_search_terms(query)
+            with self.metrics.span('extract_terms'):
+                search_terms = self.extract_search_terms(query)[:3]  # Limit to 3 searches
             context_data = []
             
-            for term in search_terms[:3]:  # Limit to 3 searches
-                try:
-                    response = requests.get(f"{search_url}{term}", timeout=5)
-                    if response.status_code == 200:
-                        data = response.json()
-                        context_data.append({
-                            'title': data.get('title', ''),
-                            'extract': data.get('extract', ''),
-                            'year': self.extract_year(data.get('extract', ''))
-                        })
-                except Exception as e:
-                    continue
+            # Terms are fetched concurrently; results come back in search term order,
+            # with None for any that missed the deadline
+            budget = deadline.share(CONTEXT_SHARE) if deadline is not None else None
+            with self.metrics.span('wiki_fetch'):
+                summaries = self.fetcher.fetch_all(search_terms, budget)
+            for data in summaries:
+                if data:
+                    context_data.append({
+                        'title': data.get('title', ''),
+                        'extract': data.get('extract', ''),
+                        'year': self.extract_year(data.get('extract', ''))
+                    })
                     
             return context_data
         except Exception as e:
-            st.error(f"Error fetching Wikipedia data: {str(e)}")
+            self.metrics.incr('errors_total', stage='wiki_fetch')
+            if errors is not None:
+                errors.append(f"Error fetching Wikipedia data: {str(e)}")
             return []
     
     def create_fallback_timeline(self, response_text, what_if_question):
-        """Create a simple timeline if JSON parsing fails"""
+        """Create a simple timeline if JSON parsing fails; 'error' marks it as not generated"""
         return {
             "timeline": [
                 {"year": "Year 1", "event": "Initial change occurs", "impact": "The alternate timeline begins", "probability": "High"},
@@ -226,22 +208,14 @@ class TimeMachine:
                 {"year": "Year 25", "event": "Generational changes", "impact": "New generation grows up in changed world", "probability": "Medium"},
                 {"year": "Year 50", "event": "Historical legacy", "impact": "The change becomes part of history", "probability": "High"}
             ],
-            "summary": f"This timeline explores the consequences of: {what_if_question}"
+            "summary": f"This timeline explores the consequences of: {what_if_question}",
+            "error": "Gemini's response could not be read as a timeline"
         }
     
     def extract_search_terms(self, query):
-        """Extract key search terms from user query"""
-        # Remove common words and extract meaningful terms
-        stop_words = {'what', 'if', 'had', 'not', 'never', 'been', 'was', 'were', 'would', 'could', 'should'}
-        words = re.findall(r'\b[A-Za-z]+\b', query.lower())
-        
-        # Keep important words and proper nouns
-        meaningful_words = []
-        for word in words:
-            if word not in stop_words and len(word) > 2:
-                meaningful_words.append(word.title())
-        
-        return meaningful_words[:5]  # Return top 5 terms
+        """Extract key search terms from user query, most likely Wikipedia titles first"""
+        # Multi-word titles such as "Library of Alexandria" are kept whole
+        return extract_entities(query, self.title_index)[:5]  # Return top 5 terms
     
     def extract_year(self, text):
         """Extract year from text"""
@@ -250,15 +224,112 @@ class TimeMachine:
         years = re.findall(r'\b(1[0-9]{3}|20[0-9]{2})\b', text)
         return int(years[0]) if years else None
     
-    def generate_timeline(self, what_if_question, context_data):
-        """Generate alternate history timeline"""
+    def get_cached_result(self, what_if_question, mode, cache_key):
+        """Return a stored result for this question or a close paraphrase of it"""
+        cached = self.result_cache.get(cache_key)
+        if cached is None:
+            similar_key = self.question_index.lookup(what_if_question, mode)
+            if similar_key:
+                cached = self.result_cache.get(similar_key)
+        return cached
+    
+    def store_result(self, what_if_question, mode, cache_key, result, context_data=()):
+        """Share a generated result with every session asking the same thing, and archive it"""
+        self.result_cache.put(cache_key, result, self.PROMPT_VERSION)
+        self.question_index.add(what_if_question, mode, cache_key)
+        self.archive_result(what_if_question, mode, result, context_data)
+    
+    def archive_result(self, what_if_question, mode, result, context_data=()):
+        if self.archive is None:
+            return
+        with self.metrics.span('archive', output=mode):
+            self.archive.record(what_if_question, mode, result, [item['title'] for item in context_data or ()])
+    
+    def build_context(self, what_if_question, context_data, context_used=None):
+        """Historical Context for a prompt: the sentences most relevant to the question, within budget
+        
+        Its token counts also go into `context_used`, if a dict is given.
+        """
+        with self.metrics.span('prompt_build'):
+            context_text, stats = assemble_context(what_if_question, context_data, self.context_tokens)
+        context_stats.record(stats)
+        if context_used is not None:
+            context_used.update(stats)
+        return context_text
+    
+    def json_generation_config(self, schema):
+        """Generation config for structured output, or None for free text"""
+        if not self.structured_output:
+            return None
+        return {"response_mime_type": "application/json", "response_schema": schema}
+    
+    def record_usage(self, response):
+        """Count the tokens Gemini reports for a response (the last chunk, when streaming)"""
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            self.metrics.incr('gemini_tokens_total', getattr(usage, 'prompt_token_count', 0) or 0, kind='prompt')
+            self.metrics.incr('gemini_tokens_total', getattr(usage, 'candidates_token_count', 0) or 0, kind='output')
+    
+    def generate_text(self, prompt, array_key=None, on_item=None, generation_config=None, deadline=None):
+        """Call Gemini, streaming each completed item of array_key to on_item when given"""
+        with self.metrics.span('llm_call', output=array_key or 'text'):
+            if on_item is None:
+                response = self.model.generate_content(prompt, generation_config=generation_config, deadline=deadline)
+                self.record_usage(response)
+                return response.text
+            
+            parser = IncrementalItemParser(array_key)
+            chunks = []
+            chunk = None
+            # Closed straight away if on_item raises, e.g. JobCancelled, so the call is let go at once
+            stream = self.model.generate_content(prompt, generation_config=generation_config, stream=True, deadline=deadline)
+            try:
+                with closing(stream):
+                    for chunk in stream:
+                        chunks.append(chunk.text)
+                        for item in parser.feed(chunk.text):
+                            on_item(item)
+            except DeadlineExceeded as e:
+                # Kept for salvage_cut_short, so the items already streamed are not thrown away
+                e.partial_text = "".join(chunks)
+                raise
+            self.record_usage(chunk)
+            return "".join(chunks)
+    
+    def salvage_cut_short(self, error, array_key, summary_key=None, mode=None):
+        """The complete items a stream sent before its deadline ran out, or None
+
+        The result is marked 'incomplete' and, like any salvaged result, is
+        never cached or shared.
+        """
+        partial_text = getattr(error, 'partial_text', None)
+        if not partial_text:
+            return None
+        data, _ = parse_generation(partial_text, array_key, summary_key, mode=mode)
+        if not data or not data[array_key]:
+            return None
+        data['incomplete'] = str(error)
+        return data
+    
+    def generate_timeline(self, what_if_question, context_data, on_event=None, deadline=None, context_used=None):
+        """Generate alternate history timeline, passing each event to on_event as it arrives
+        
+        `context_used`, if given, receives the prompt's context token counts;
+        it stays empty when the result comes from the cache.
+        """
         if not self.model:
             return {
                 "timeline": [{"year": "Error", "event": "Gemini API not available", "impact": "Please install google-generativeai", "probability": "Low"}],
-                "summary": "API not configured"
+                "summary": "API not configured",
+                "error": "Gemini API not available"
             }
+        
+        cache_key = result_cache_key(what_if_question, 'timeline', context_data, self.PROMPT_VERSION)
+        cached = self.get_cached_result(what_if_question, 'timeline', cache_key)
+        if cached is not None:
+            return cached
             
-        context_text = "\n".join([f"- {item['title']}: {item['extract']}" for item in context_data])
+        context_text = self.build_context(what_if_question, context_data, context_used)
         
         prompt = f"""
         You are an expert historian creating an alternate history timeline. Based on the following historical context and the hypothetical scenario, create a realistic alternate timeline.
@@ -285,33 +356,146 @@ class TimeMachine:
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            response_text = response.text
+            response_text = self.generate_text(
+                prompt, 'timeline', on_event, generation_config=self.json_generation_config(TIMELINE_SCHEMA), deadline=deadline
+            )
             
-            # Extract JSON from response
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                try:
-                    return json.loads(json_match.group())
-                except json.JSONDecodeError:
-                    # If JSON parsing fails, create a simple timeline from the text
-                    return self.create_fallback_timeline(response_text, what_if_question)
-            else:
-                # If no JSON found, create timeline from text
-                return self.create_fallback_timeline(response_text, what_if_question)
+            # Extract JSON from response, keeping every complete event if the rest is broken
+            with self.metrics.span('json_parse', output='timeline'):
+                timeline_data, outcome = parse_generation(response_text, 'timeline', 'summary')
+            if timeline_data and timeline_data['timeline']:
+                # Partial results are shown but not shared with other sessions
+                if outcome == 'parsed':
+                    self.store_result(what_if_question, 'timeline', cache_key, timeline_data, context_data)
+                return timeline_data
+            
+            # If nothing could be recovered, create a simple timeline
+            return self.create_fallback_timeline(response_text, what_if_question)
         except Exception as e:
-            st.error(f"Error generating timeline: {str(e)}")
+            self.metrics.incr('errors_total', stage='timeline')
+            salvaged = self.salvage_cut_short(e, 'timeline', 'summary', mode='timeline')
+            if salvaged is not None:
+                return salvaged
             return {
                 "timeline": [{"year": "Error", "event": "Failed to generate", "impact": str(e), "probability": "Low"}],
-                "summary": "Generation failed"
+                "summary": "Generation failed",
+                "error": str(e)
             }
     
-    def generate_newsfeed(self, what_if_question, context_data):
-        """Generate newsfeed-style events"""
+    def generate_follow_up(self, what_if_question, mode, digest, prompt, array_key, schema, deadline=None):
+        """Events for a follow-up prompt, cached by the digest it was built from; [] if none could be parsed"""
+        cache_key = result_cache_key(what_if_question, mode, [{'title': mode, 'extract': digest}], self.PROMPT_VERSION)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            response_text = self.generate_text(
+                prompt, array_key, generation_config=self.json_generation_config(schema), deadline=deadline
+            )
+            with self.metrics.span('json_parse', output=mode):
+                data, outcome = parse_generation(response_text, array_key, mode=mode)
+        except Exception:
+            # Runs in a job, which reports the error to the session that asked
+            self.metrics.incr('errors_total', stage=mode)
+            raise
+        
+        events = data[array_key] if data else []
+        if outcome == 'parsed' and events:
+            self.result_cache.put(cache_key, events, self.PROMPT_VERSION)
+            self.archive_result(what_if_question, mode, {array_key: events})
+        return events
+    
+    def extend_timeline(self, what_if_question, timeline, count=4, deadline=None):
+        """Add events after the last year of `timeline`, sending a digest of it rather than the whole thing"""
         if not self.model:
-            return {"news_items": [{"headline": "API Error", "date": "Now", "source": "System", "summary": "Please install google-generativeai"}]}
+            return timeline
+        
+        events = timeline.get('timeline', [])
+        after = last_year(events)
+        digest = timeline_digest(timeline)
+        prompt = f"""
+        You are an expert historian continuing an alternate history timeline.
+
+        Hypothetical Scenario: {what_if_question}
+
+        Timeline so far (year: event):
+        {digest}
+
+        Continue it with {count} major events that happen after {after if after is not None else "the last event above"}. Do not repeat earlier events. Format as JSON:
+        {{
+            "timeline": [
+                {{
+                    "year": "YYYY",
+                    "event": "Brief description of major event",
+                    "impact": "How this affects the broader world",
+                    "probability": "High"
+                }}
+            ]
+        }}
+        """
+        
+        new_events = self.generate_follow_up(
+            what_if_question, 'extend', f"{count}\n{digest}", prompt, 'timeline', EXTENSION_SCHEMA, deadline
+        )
+        return dict(timeline, timeline=merge_events(events, new_events, after=after))
+    
+    def drill_down_event(self, what_if_question, timeline, index, count=4, deadline=None):
+        """Expand the event at `index` into sub-events, merged under it in year order"""
+        if not self.model:
+            return timeline
+        
+        events = timeline.get('timeline', [])
+        event = events[index]
+        until = events[index + 1].get('year') if index + 1 < len(events) else None
+        digest = timeline_digest(timeline)
+        period = f"between {event.get('year')} and {until}" if until else f"in the years following {event.get('year')}"
+        prompt = f"""
+        You are an expert historian expanding one event of an alternate history timeline.
+
+        Hypothetical Scenario: {what_if_question}
+
+        Timeline (year: event):
+        {digest}
+
+        Event to expand: {event.get('year')}: {event.get('event')}
+        Impact: {event.get('impact', '')}
+
+        Describe {count} smaller events {period} that make up or follow directly from this event. Format as JSON:
+        {{
+            "sub_events": [
+                {{
+                    "year": "YYYY",
+                    "event": "Brief description of the smaller event",
+                    "impact": "What it changes",
+                    "probability": "High"
+                }}
+            ]
+        }}
+        """
+        
+        sub_events = self.generate_follow_up(
+            what_if_question, 'drill_down', f"{count}\n{index}\n{digest}", prompt, 'sub_events', SUB_EVENTS_SCHEMA, deadline
+        )
+        return add_sub_events(timeline, index, sub_events)
+    
+    def generate_newsfeed(self, what_if_question, context_data, on_item=None, deadline=None, context_used=None):
+        """Generate newsfeed-style events, passing each news item to on_item as it arrives
+        
+        `context_used` is filled in as for generate_timeline.
+        """
+        if not self.model:
+            return {
+                "news_items": [{"headline": "API Error", "date": "Now", "source": "System", "summary": "Please install google-generativeai"}],
+                "error": "Gemini API not available"
+            }
+        
+        cache_key = result_cache_key(what_if_question, 'newsfeed', context_data, self.PROMPT_VERSION)
+        cached = self.get_cached_result(what_if_question, 'newsfeed', cache_key)
+        if cached is not None:
+            return cached
             
-        context_text = "\n".join([f"- {item['title']}: {item['extract']}" for item in context_data])
+        context_text = self.build_context(what_if_question, context_data, context_used)
         
         prompt = f"""
         You are a news editor creating breaking news headlines for an alternate history scenario.
@@ -337,53 +521,295 @@ class TimeMachine:
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            response_text = response.text
+            response_text = self.generate_text(
+                prompt, 'news_items', on_item, generation_config=self.json_generation_config(NEWSFEED_SCHEMA), deadline=deadline
+            )
             
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                try:
-                    return json.loads(json_match.group())
-                except json.JSONDecodeError:
-                    return self.create_fallback_newsfeed(what_if_question)
-            else:
-                return self.create_fallback_newsfeed(what_if_question)
+            with self.metrics.span('json_parse', output='news_items'):
+                newsfeed_data, outcome = parse_generation(response_text, 'news_items', mode='newsfeed')
+            if newsfeed_data and newsfeed_data['news_items']:
+                if outcome == 'parsed':
+                    self.store_result(what_if_question, 'newsfeed', cache_key, newsfeed_data, context_data)
+                return newsfeed_data
+            
+            return self.create_fallback_newsfeed(what_if_question)
         except Exception as e:
-            st.error(f"Error generating newsfeed: {str(e)}")
-            return {"news_items": [{"headline": "Error", "date": "Now", "source": "System", "summary": str(e)}]}
+            self.metrics.incr('errors_total', stage='newsfeed')
+            salvaged = self.salvage_cut_short(e, 'news_items', mode='newsfeed')
+            if salvaged is not None:
+                return salvaged
+            return {"news_items": [{"headline": "Error", "date": "Now", "source": "System", "summary": str(e)}], "error": str(e)}
+    
+    def generation_failed(self, data):
+        """Whether a result is a stand-in (no model, an error, or nothing parsed) rather than a generation"""
+        return bool(data.get('error'))
     
     def create_fallback_newsfeed(self, what_if_question):
-        """Create a simple newsfeed if JSON parsing fails"""
+        """Create a simple newsfeed if JSON parsing fails; 'error' marks it as not generated"""
         return {
             "news_items": [
                 {"headline": "Breaking: Historical Timeline Altered", "date": "Today", "source": "Time News", "summary": f"Major changes reported following: {what_if_question}"},
                 {"headline": "Experts Analyze New Timeline", "date": "Yesterday", "source": "History Today", "summary": "Historians are working to understand the implications of the timeline change."},
                 {"headline": "Society Adapts to New Reality", "date": "Last Week", "source": "World Report", "summary": "Citizens are adjusting to the altered course of history."}
-            ]
+            ],
+            "error": "Gemini's response could not be read as news items"
         }
     
-    def chat_with_historical_figure(self, figure_name, context, user_message):
-        """Chat with a historical figure in the alternate timeline"""
+    def run_generation_job(self, job, what_if_question, mode, speculative=False, context_data=None, deadline=None):
+        """Fetch context and generate one mode inside a background job
+        
+        With speculative=True the other mode is started as a sibling job on the
+        same context, so switching modes afterwards is instant. The whole job
+        runs within one deadline (REQUEST_BUDGET seconds by default); context
+        that has not arrived by its share of it is left out. Errors for the
+        user are returned in the result's 'errors', since a job thread cannot
+        show them itself.
+        """
+        if deadline is None:
+            deadline = Deadline(REQUEST_BUDGET)
+        
+        errors = []
+        if context_data is None:
+            job.update("🔍 Searching historical records...", 25)
+            context_data = self.fetch_wikipedia_context(what_if_question, deadline, errors)
+        # Token counts for the page's caption, from the prompt that was built; none for a cached result
+        context_used = {}
+        
+        if speculative:
+            self.start_speculative_job(job, what_if_question, mode, context_data)
+        
+        # Streamed items are collected on the job so polling reruns can show them
+        if mode == 'timeline':
+            job.update("📅 Creating timeline events...", 75)
+            data = self.generate_timeline(
+                what_if_question, context_data, on_event=job.add_item, deadline=deadline, context_used=context_used
+            )
+        else:
+            job.update("📰 Generating news headlines...", 75)
+            data = self.generate_newsfeed(
+                what_if_question, context_data, on_item=job.add_item, deadline=deadline, context_used=context_used
+            )
+        if self.generation_failed(data):
+            errors.append(f"Error generating {mode}: {data['error']}")
+        elif data.get('incomplete'):
+            errors.append(f"The {mode} was cut short ({data['incomplete']}); showing what arrived in time")
+        
+        return {'question': what_if_question, 'mode': mode, 'context_data': context_data,
+                'context_used': context_used if context_data else None, 'data': data, 'errors': errors}
+    
+    def run_follow_up_job(self, job, what_if_question, follow_up, timeline, index=None, deadline=None):
+        """Extend `timeline` or drill into its event at `index` inside a background job, within one deadline"""
+        if deadline is None:
+            deadline = Deadline(REQUEST_BUDGET)
+        
+        if follow_up == 'extend':
+            job.update("📅 Extending the timeline...", 50)
+            data = self.extend_timeline(what_if_question, timeline, deadline=deadline)
+        else:
+            job.update("🔍 Expanding the event...", 50)
+            data = self.drill_down_event(what_if_question, timeline, index, deadline=deadline)
+        # Nothing parsed, or every event was a repeat: say so rather than store the same timeline silently
+        notes = []
+        if data == timeline:
+            notes.append("No new events were added" if follow_up == 'extend' else "No sub-events were added to that event")
+        return {'question': what_if_question, 'mode': 'timeline', 'data': data, 'notes': notes}
+    
+    def warm_result(self, what_if_question, mode):
+        """Generate one mode for the warmer, joining a user's identical job if one is running"""
+        job = get_job_queue().submit(
+            (normalize_question(what_if_question), mode), self.run_generation_job, what_if_question, mode
+        )
+        job.future.result()
+        if job.status != DONE:
+            raise RuntimeError(job.message)
+        data = job.result['data']
+        if self.generation_failed(data) or data.get('incomplete'):
+            # Warm results are served as they are, so a cut-short one is retried rather than kept
+            raise RuntimeError(f"{mode} generation failed or was cut short")
+        return job.result
+    
+    def start_speculative_job(self, job, what_if_question, mode, context_data):
+        """Generate the other mode alongside this one if it is cached or within the cost cap"""
+        other_mode = 'newsfeed' if mode == 'timeline' else 'timeline'
+        cache_key = result_cache_key(what_if_question, other_mode, context_data, self.PROMPT_VERSION)
+        
+        # A cached result costs nothing, so it never counts against the budget
+        if self.get_cached_result(what_if_question, other_mode, cache_key) is None and not speculation_budget.try_acquire():
+            return
+        
+        sibling = job.queue.submit(
+            (normalize_question(what_if_question), other_mode),
+            self.run_generation_job, what_if_question, other_mode, context_data=context_data
+        )
+        job.spawned[other_mode] = sibling.id
+    
+    def chat_with_historical_figure(self, figure_name, context, user_message, session=None):
+        """Chat with a historical figure in the alternate timeline
+        
+        When a ChatSession is given the figure remembers earlier turns, within
+        the session's token budget.
+        """
         if not self.model:
             return "Sorry, Gemini API is not available. Please install google-generativeai."
-            
+        
+        if session is not None:
+            prompt = session.build_prompt(user_message)
+        else:
+            prompt = f"""
+            You are {figure_name} in an alternate history where: {context}
+
+            Respond to this message as {figure_name} would, considering how this alternate history would have affected their life, beliefs, and circumstances. Keep responses conversational and in character.
+
+            Message: {user_message}
+
+            Response as {figure_name}:
+            """
+        
+        try:
+            reply = self.generate_text(prompt)
+        except Exception as e:
+            self.metrics.incr('errors_total', stage='chat')
+            reply = f"Sorry, I'm having trouble responding right now. Error: {str(e)}"
+            if session is not None:
+                session.note(user_message, reply)
+            return reply
+        
+        if session is not None:
+            session.record(user_message, reply, summarize=self.chat_summarizer(figure_name))
+        return reply
+    
+    def chat_summarizer(self, figure_name):
+        return lambda summary, turns: self.summarize_chat(figure_name, summary, turns)
+    
+    def summarize_chat(self, figure_name, summary, turns):
+        """Fold older chat turns into the running summary of the conversation"""
+        exchanges = "\n".join(f"User: {user}\n{figure_name}: {reply}" for user, reply in turns)
         prompt = f"""
-        You are {figure_name} in an alternate history where: {context}
+        Update the running summary of a conversation between a user and {figure_name}.
 
-        Respond to this message as {figure_name} would, considering how this alternate history would have affected their life, beliefs, and circumstances. Keep responses conversational and in character.
+        Current summary: {summary or "(none yet)"}
+
+        New exchanges:
+        {exchanges}
+
+        Write the updated summary in at most 120 words. Keep names, facts and promises {figure_name} has made.
+        """
+        return self.generate_text(prompt).strip()
+
+    def batch_chat_prompt(self, figure_names, context, user_message, sessions):
+        """One prompt asking every figure in figure_names to answer the same message"""
+        figures = "\n".join(
+            f"- {name}" + (f" (earlier in your conversation: {sessions[name].recap()})" if sessions[name].turns else "")
+            for name in figure_names
+        )
+        return f"""
+        Several historical figures are answering the same message in an alternate history where: {context}
+
+        Figures:
+        {figures}
 
         Message: {user_message}
 
-        Response as {figure_name}:
+        For each figure, respond as they would, considering how this alternate history would have affected their life, beliefs, and circumstances. Keep each response conversational, in character, and independent of the others.
+
+        Format as JSON:
+        {{
+            "replies": [
+                {{"figure": "Exact name from the list", "reply": "Their response"}}
+            ]
+        }}
         """
+    
+    def fanout_strategy(self, figure_names):
+        """'batch' for one combined call, 'concurrent' for one call per figure
         
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            return f"Sorry, I'm having trouble responding right now. Error: {str(e)}"
+        This chooses on speed, not cost, on purpose. The batched prompt is
+        always the cheaper one: each concurrent call resends the scenario
+        and that figure's history, so five fresh figures cost about 650
+        prompt tokens against 180 for the batch. But a batch streams the
+        replies one after another. Parallel calls finish in about the time
+        of one, so they are used whenever the rate limiter can grant them
+        all right now. Otherwise they would queue behind each other, and the
+        batched call is both quicker and cheaper. Pass strategy='batch' to
+        ask_figures to always take the cheaper route.
+        """
+        if len(figure_names) < 2:
+            return 'concurrent'
+        limiter = getattr(self.model, 'limiter', None)
+        if limiter is not None and limiter.available() < min(len(figure_names), FANOUT_WORKERS):
+            return 'batch'
+        if len(figure_names) > FANOUT_WORKERS:
+            return 'batch'
+        return 'concurrent'
+    
+    def ask_figures(self, figure_names, context, user_message, sessions, on_reply=None, strategy=None):
+        """Put one message to several figures, passing each reply to on_reply(figure, reply) as it arrives
+        
+        on_reply is always called on the calling thread. Returns the replies
+        keyed by figure name.
+        """
+        if not self.model:
+            reply = "Sorry, Gemini API is not available. Please install google-generativeai."
+            return {name: reply for name in figure_names}
+        
+        replies = {}
+        def deliver(figure_name, reply):
+            replies[figure_name] = reply
+            if on_reply:
+                on_reply(figure_name, reply)
+        
+        strategy = strategy or self.fanout_strategy(figure_names)
+        if strategy == 'batch':
+            def on_item(item):
+                figure_name, reply = item.get('figure'), item.get('reply')
+                if figure_name in sessions and figure_name in figure_names and figure_name not in replies and reply:
+                    sessions[figure_name].record(user_message, reply, summarize=self.chat_summarizer(figure_name))
+                    deliver(figure_name, reply)
+            try:
+                self.generate_text(
+                    self.batch_chat_prompt(figure_names, context, user_message, sessions),
+                    array_key='replies',
+                    on_item=on_item,
+                    generation_config=self.json_generation_config(FANOUT_SCHEMA)
+                )
+            except Exception:
+                # Counted, then every figure still without a reply is asked on its own below
+                self.metrics.incr('errors_total', stage='fanout')
+        
+        # Anyone the batched reply left out is asked directly
+        pending = [name for name in figure_names if name not in replies]
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(FANOUT_WORKERS, len(pending)), thread_name_prefix="fanout") as executor:
+                futures = {
+                    executor.submit(self.chat_with_historical_figure, name, context, user_message, sessions[name]): name
+                    for name in pending
+                }
+                for future in as_completed(futures):
+                    deliver(futures[future], future.result())
+        return replies
+
+@st.cache_resource
+def get_time_machine():
+    """One TimeMachine for every session; it only holds the process-wide clients and caches"""
+    return TimeMachine()
+
+
+def configure_page():
+    """Page settings and stylesheet; called from main() so importing this module (as batch does) draws nothing"""
+    st.set_page_config(
+        page_title="AI Time Machine",
+        page_icon="🕰️",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    
+    # Custom CSS for better UI, from static/time_machine.css
+    st.markdown(page_style_html(st.get_option("server.enableStaticServing")), unsafe_allow_html=True)
+
 
 def main():
+    configure_page()
+    
     # Custom header
     st.markdown("""
     <div class="main-header">
@@ -398,8 +824,21 @@ def main():
         st.stop()
     
     # Initialize the Time Machine
-    if 'time_machine' not in st.session_state:
-        st.session_state.time_machine = TimeMachine()
+    time_machine = get_time_machine()
+    
+    # Results live in the shared store; session state only holds this session's keys into it
+    store = get_session_store()
+    time_machine.metrics.register_collector('sessions', store.stats)
+    time_machine.metrics.register_collector('render', fragments.stats)
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    session_id = st.session_state.session_id
+    
+    # Warming runs in its own thread, so this returns before any generation starts
+    warmer = get_warmer(EXAMPLE_QUESTIONS, TimeMachine.PROMPT_VERSION)
+    if warmer is not None:
+        warmer.start(time_machine.warm_result)
+        time_machine.metrics.register_collector('warm', warmer.stats)
     
     # Enhanced Sidebar
     st.sidebar.markdown("## 🎛️ Control Panel")
@@ -420,21 +859,59 @@ def main():
     # Add mode description
     st.sidebar.markdown(f"**Current Mode:** {mode_descriptions[mode]}")
     
+    stream_results = st.sidebar.checkbox(
+        "⚡ Stream results as they arrive",
+        value=True,
+        help="Show each event as soon as Gemini writes it instead of waiting for the whole response"
+    )
+    
+    speculative = st.sidebar.checkbox(
+        "🔮 Prepare the other mode too",
+        value=False,
+        help="Generate the timeline and the newsfeed together so switching modes is instant"
+    )
+    
     # Add some example questions
     st.sidebar.markdown("### 💡 Example Questions")
-    example_questions = [
-        "What if the Library of Alexandria never burned down?",
-        "What if Napoleon won at Waterloo?",
-        "What if the internet was invented in the 1800s?",
-        "What if dinosaurs never went extinct?",
-        "What if the Roman Empire never fell?"
-    ]
-    
     selected_example = st.sidebar.selectbox(
         "Try an example:",
-        [""] + example_questions
+        [""] + EXAMPLE_QUESTIONS
     )
     
+    # Past generations, searchable by words and by the years of their events
+    if time_machine.archive is not None:
+        with st.sidebar.expander("🔎 Search the archive"):
+            archive_text = st.text_input("Words:", key="archive_text")
+            from_col, to_col = st.columns(2)
+            year_from = from_col.number_input("From year:", value=None, step=1, key="archive_from")
+            year_to = to_col.number_input("To year:", value=None, step=1, key="archive_to")
+            if archive_text or year_from is not None or year_to is not None:
+                hits = time_machine.archive.search(
+                    archive_text,
+                    int(year_from) if year_from is not None else None,
+                    int(year_to) if year_to is not None else None,
+                    limit=ARCHIVE_HITS_SHOWN
+                )
+                if hits:
+                    st.markdown(archive_hits_html(hits), unsafe_allow_html=True)
+                    openable = {hit['generation_id']: hit for hit in hits if hit['mode'] in ('timeline', 'newsfeed')}
+                    if openable:
+                        open_id = st.selectbox(
+                            "Open a result:",
+                            list(openable),
+                            format_func=lambda i: f"{openable[i]['mode']}: {openable[i]['question'][:60]}",
+                            key="archive_open"
+                        )
+                        if st.button("📂 Open", key="archive_open_btn"):
+                            archived = time_machine.archive.generation(open_id)
+                            st.session_state.current_question = archived['question']
+                            store.put(session_id, 'context', [])
+                            store.put(session_id, 'context_used', None)
+                            store.put(session_id, archived['mode'], archived['data'])
+                            st.caption(f"Opened in {'Timeline Generator' if archived['mode'] == 'timeline' else 'Newsfeed Simulation'}")
+                else:
+                    st.caption("No archived events match")
+    
     # Main input with enhanced styling
     st.markdown('<div class="input-container">', unsafe_allow_html=True)
     
@@ -454,88 +931,142 @@ def main():
     
     st.markdown('</div>', unsafe_allow_html=True)
     
-    # Progress indicators
-    if generate_clicked and what_if_question:
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        status_text.text("🔍 Searching historical records...")
-        progress_bar.progress(25)
-        
-        # Fetch context
-        context_data = st.session_state.time_machine.fetch_wikipedia_context(what_if_question)
+    # Generation runs in the background job queue; this script only polls and renders
+    job_queue = get_job_queue()
+    generation_modes = {"Timeline Generator": 'timeline', "Newsfeed Simulation": 'newsfeed'}
+    
+    if 'generation_jobs' not in st.session_state:
+        st.session_state.generation_jobs = {}
+    generation_jobs = st.session_state.generation_jobs
+    
+    if generate_clicked and what_if_question and mode in generation_modes:
+        for job_id in generation_jobs.values():
+            job_queue.cancel(job_id)
+        generation_jobs.clear()
         
-        status_text.text("🤖 Generating alternate timeline...")
-        progress_bar.progress(50)
+        job_mode = generation_modes[mode]
+        warm = warmer.get(what_if_question, job_mode) if warmer is not None else None
+        if warm is not None:
+            st.session_state.current_question = warm['question']
+            store.put(session_id, 'context', warm['context_data'])
+            for warm_mode in ('timeline', 'newsfeed'):
+                warm_result = warm if warm_mode == job_mode else warmer.get(what_if_question, warm_mode)
+                if warm_result is not None:
+                    store.put(session_id, warm_mode, warm_result['data'])
+                    if warm_mode == 'timeline':
+                        store.put(session_id, 'context_used', warm_result.get('context_used'))
+        else:
+            # Identical questions already being generated for another session are joined, not repeated
+            job = job_queue.submit(
+                (normalize_question(what_if_question), job_mode),
+                time_machine.run_generation_job, what_if_question, job_mode,
+                speculative=speculative
+            )
+            generation_jobs[job_mode] = job.id
+    
+    # Pick up jobs started speculatively for the other mode
+    for job_id in list(generation_jobs.values()):
+        job = job_queue.get(job_id)
+        if job is not None:
+            for spawned_mode, spawned_id in job.spawned.items():
+                generation_jobs.setdefault(spawned_mode, spawned_id)
+    
+    jobs_running = False
+    for job_mode, job_id in list(generation_jobs.items()):
+        job = job_queue.get(job_id)
         
-        # Store in session state
-        st.session_state.current_question = what_if_question
-        st.session_state.context_data = context_data
+        if job is not None and not job.done:
+            jobs_running = True
+            if job_mode != generation_modes.get(mode):
+                continue
+            
+            st.progress(job.progress)
+            status_col, cancel_col = st.columns([4, 1])
+            status_col.text(job.message)
+            if cancel_col.button("✖️ Cancel", key="cancel_btn"):
+                for job_id in generation_jobs.values():
+                    job_queue.cancel(job_id)
+                generation_jobs.clear()
+                st.rerun()
+            
+            # Show streamed items until the full result replaces them below
+            if stream_results:
+                render_item = timeline_event_html if job_mode == 'timeline' else news_item_html
+                st.markdown(items_html(list(job.items), render_item), unsafe_allow_html=True)
+            continue
         
-        if mode == "Timeline Generator":
-            status_text.text("📅 Creating timeline events...")
-            progress_bar.progress(75)
-            timeline_data = st.session_state.time_machine.generate_timeline(what_if_question, context_data)
-            st.session_state.timeline_data = timeline_data
+        del generation_jobs[job_mode]
+        if job is not None and job.status == DONE:
+            result = job.result
             
-        elif mode == "Newsfeed Simulation":
-            status_text.text("📰 Generating news headlines...")
-            progress_bar.progress(75)
-            newsfeed_data = st.session_state.time_machine.generate_newsfeed(what_if_question, context_data)
-            st.session_state.newsfeed_data = newsfeed_data
-        
-        status_text.text("✅ Complete!")
-        progress_bar.progress(100)
-        time.sleep(1)
-        status_text.empty()
-        progress_bar.empty()
+            # Store in session state
+            st.session_state.current_question = result['question']
+            # Follow-ups keep the context the timeline was generated with
+            if 'context_data' in result:
+                store.put(session_id, 'context', result['context_data'])
+            # The caption under the timeline describes the timeline's own prompt
+            if result['mode'] == 'timeline' and 'context_data' in result:
+                store.put(session_id, 'context_used', result.get('context_used'))
+            store.put(session_id, result['mode'], result['data'])
+            for message in result.get('errors', ()):
+                st.error(message)
+            for message in result.get('notes', ()):
+                st.caption(message)
+        elif job is not None and job.status == FAILED:
+            st.error(f"Error generating alternate history: {job.error}")
     
     # Display results based on mode with enhanced styling
-    if mode == "Timeline Generator" and 'timeline_data' in st.session_state:
+    timeline = store.get(session_id, 'timeline') if mode == "Timeline Generator" else None
+    newsfeed = store.get(session_id, 'newsfeed') if mode == "Newsfeed Simulation" else None
+    
+    if timeline is not None:
         st.markdown("## 📅 Alternate Timeline")
         
-        timeline = st.session_state.timeline_data
+        context_used = store.get(session_id, 'context_used')
+        if context_used:
+            st.caption(f"📚 Grounded in {context_used['used_tokens']} of {context_used['source_tokens']} tokens of Wikipedia context")
         
-        # Display summary with styling
-        st.markdown(f"""
-        <div class="timeline-item">
-            <h3>🎯 Timeline Summary</h3>
-            <p><strong>{timeline.get('summary', 'No summary available')}</strong></p>
-        </div>
-        """, unsafe_allow_html=True)
+        # Summary and events go to the browser as one element
+        with time_machine.metrics.span('render', output='timeline'):
+            st.markdown(timeline_html(timeline), unsafe_allow_html=True)
         
-        # Display timeline with enhanced styling
-        for i, event in enumerate(timeline.get('timeline', [])):
-            probability = event.get('probability', 'Medium')
-            probability_class = f"probability-{probability.lower()}"
-            
-            st.markdown(f"""
-            <div class="timeline-item">
-                <div style="display: flex; justify-content: space-between; align-items: center;">
-                    <h3 style="margin: 0; color: #667eea;">📍 {event.get('year', 'Unknown')}</h3>
-                    <span class="{probability_class}">{probability} Probability</span>
-                </div>
-                <h4 style="margin: 0.5rem 0; color: #2c3e50;">{event.get('event', 'Unknown event')}</h4>
-                <p style="margin: 0.5rem 0 0 0; color: #5a6c7d;"><strong>Impact:</strong> {event.get('impact', 'No impact specified')}</p>
-            </div>
-            """, unsafe_allow_html=True)
-    
-    elif mode == "Newsfeed Simulation" and 'newsfeed_data' in st.session_state:
-        st.markdown("## 📰 Alternate History News Feed")
+        # Follow-ups build on the timeline above instead of regenerating it; a stand-in has nothing to build on
+        extend_clicked = drill_clicked = False
+        if not time_machine.generation_failed(timeline):
+            events = timeline.get('timeline', [])
+            extend_col, event_col, drill_col = st.columns([1, 3, 1])
+            with extend_col:
+                st.markdown("<br>", unsafe_allow_html=True)
+                extend_clicked = st.button("➕ Extend timeline", key="extend_btn")
+            with event_col:
+                drill_index = st.selectbox(
+                    "Drill into an event:",
+                    range(len(events)),
+                    format_func=lambda i: f"{events[i].get('year', '?')}: {events[i].get('event', '')[:80]}",
+                    key="drill_event"
+                )
+            with drill_col:
+                st.markdown("<br>", unsafe_allow_html=True)
+                drill_clicked = st.button("🔍 Drill down", key="drill_btn")
         
-        newsfeed = st.session_state.newsfeed_data
+        # Run in the job queue like a generation; the polling above stores the result
+        if extend_clicked or (drill_clicked and drill_index is not None):
+            follow_up = 'extend' if extend_clicked else 'drill_down'
+            index = None if extend_clicked else drill_index
+            if 'timeline' in generation_jobs:
+                job_queue.cancel(generation_jobs.pop('timeline'))
+            job = job_queue.submit(
+                (normalize_question(st.session_state.current_question), follow_up, index, json.dumps(timeline, sort_keys=True)),
+                time_machine.run_follow_up_job, st.session_state.current_question, follow_up, timeline, index
+            )
+            generation_jobs['timeline'] = job.id
+            st.rerun()
+    
+    elif newsfeed is not None:
+        st.markdown("## 📰 Alternate History News Feed")
         
-        for item in newsfeed.get('news_items', []):
-            st.markdown(f"""
-            <div class="news-item">
-                <h3 style="margin: 0 0 0.5rem 0; color: #2c3e50;">📢 {item.get('headline', 'No headline')}</h3>
-                <div style="display: flex; justify-content: space-between; margin-bottom: 0.5rem;">
-                    <span style="color: #667eea; font-weight: bold;">📅 {item.get('date', 'Unknown date')}</span>
-                    <span style="color: #e74c3c; font-weight: bold;">📺 {item.get('source', 'Unknown')}</span>
-                </div>
-                <p style="margin: 0; color: black;">{item.get('summary', 'No summary available')}</p>
-            </div>
-            """, unsafe_allow_html=True)
+        with time_machine.metrics.span('render', output='news_items'):
+            st.markdown(newsfeed_html(newsfeed), unsafe_allow_html=True)
     
     elif mode == "Chat with Historical Figures":
         st.markdown("## 💬 Chat with Historical Figures")
@@ -553,31 +1084,57 @@ def main():
                 "Winston Churchill": "🎩 Winston Churchill"
             }
             
-            figure_name = st.selectbox(
-                "Choose a historical figure:",
-                list(figures.keys()),
-                format_func=lambda x: figures[x],
-                key="figure_select"
-            )
+            # One bounded session per figure, started afresh for each new question and dropped when idle
+            chat = store.private(session_id, 'chat', dict)
+            if chat.get('question') != st.session_state.current_question:
+                chat['sessions'] = {}
+                chat['question'] = st.session_state.current_question
+            sessions = chat['sessions']
+            for name in figures:
+                if name not in sessions:
+                    sessions[name] = ChatSession(name, st.session_state.current_question)
             
-            if 'chat_history' not in st.session_state:
-                st.session_state.chat_history = []
+            fanout = st.checkbox("🎭 Ask several figures at once", key="fanout_toggle")
+            if fanout:
+                figure_names = st.multiselect(
+                    "Choose historical figures:",
+                    list(figures.keys()),
+                    default=list(figures.keys())[:3],
+                    format_func=lambda x: figures[x],
+                    key="figures_multi"
+                )
+            else:
+                figure_names = [st.selectbox(
+                    "Choose a historical figure:",
+                    list(figures.keys()),
+                    format_func=lambda x: figures[x],
+                    key="figure_select"
+                )]
             
             # Display chat history with styling
-            st.markdown("### 💭 Conversation")
-            for message in st.session_state.chat_history:
-                if message['role'] == 'user':
-                    st.markdown(f"""
-                    <div class="chat-message" style="margin-left: 2rem;">
-                        <strong>🧑 You:</strong> {message['content']}
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    st.markdown(f"""
-                    <div class="chat-message">
-                        <strong>{figures[figure_name]} {figure_name}:</strong> {message['content']}
-                    </div>
-                    """, unsafe_allow_html=True)
+            if fanout:
+                # Compare the latest answer from each figure
+                st.markdown("### 🎭 Answers")
+                latest = [
+                    chat_message_html(sessions[name].messages[-1], figures[name])
+                    for name in figure_names if sessions[name].messages
+                ]
+                if latest:
+                    st.markdown("\n".join(latest), unsafe_allow_html=True)
+            else:
+                st.markdown("### 💭 Conversation")
+                figure_name = figure_names[0]
+                messages = list(sessions[figure_name].messages)
+                pages_back = 0
+                if len(messages) > CHAT_MESSAGES_SHOWN:
+                    pages_back = st.number_input(
+                        "Earlier messages (pages back)", min_value=0,
+                        max_value=chat_page_count(len(messages), CHAT_MESSAGES_SHOWN) - 1, value=0, key="chat_pages_back"
+                    )
+                messages = chat_page(messages, CHAT_MESSAGES_SHOWN, pages_back)
+                if messages:
+                    with time_machine.metrics.span('render', output='chat'):
+                        st.markdown(chat_html(messages, figures[figure_name]), unsafe_allow_html=True)
             
             # Chat input with enhanced styling
             col1, col2 = st.columns([4, 1])
@@ -589,19 +1146,36 @@ def main():
                 st.markdown("<br>", unsafe_allow_html=True)
                 send_clicked = st.button("💬 Send", key="send_btn")
             
-            if send_clicked and user_message:
-                with st.spinner(f"💭 Waiting for {figure_name} to respond..."):
-                    response = st.session_state.time_machine.chat_with_historical_figure(
-                        figure_name, 
-                        st.session_state.current_question, 
-                        user_message
-                    )
+            if send_clicked and user_message and figure_names:
+                if len(figure_names) == 1:
+                    with st.spinner(f"💭 Waiting for {figure_names[0]} to respond..."):
+                        time_machine.chat_with_historical_figure(
+                            figure_names[0], 
+                            st.session_state.current_question, 
+                            user_message,
+                            session=sessions[figure_names[0]]
+                        )
+                else:
+                    # Show each answer the moment it arrives
+                    placeholders = {name: st.empty() for name in figure_names}
+                    for name, placeholder in placeholders.items():
+                        placeholder.caption(f"💭 Waiting for {name} to respond...")
                     
-                    # Add to chat history
-                    st.session_state.chat_history.append({'role': 'user', 'content': user_message})
-                    st.session_state.chat_history.append({'role': 'assistant', 'content': response})
+                    def show_reply(name, reply):
+                        placeholders[name].markdown(
+                            chat_message_html({'role': 'assistant', 'content': reply}, figures[name]),
+                            unsafe_allow_html=True
+                        )
                     
-                    st.rerun()
+                    time_machine.ask_figures(
+                        figure_names,
+                        st.session_state.current_question,
+                        user_message,
+                        sessions,
+                        on_reply=show_reply
+                    )
+                
+                st.rerun()
     
     # Enhanced Footer
     st.markdown("""
@@ -610,6 +1184,15 @@ def main():
         <p>✨ Explore infinite possibilities of history • Made with ❤️ for curious minds</p>
     </div>
     """, unsafe_allow_html=True)
+    
+    # The page is on screen, so load the Gemini SDK in the background
+    if time_machine.model:
+        time_machine.model.warm_up()
+    
+    # Poll the background jobs until they finish
+    if jobs_running:
+        time.sleep(0.5)
+        st.rerun()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,261 @@
+"""Searchable archive of every generated timeline and newsfeed
+
+Each generation is stored once in SQLite with its question, mode, the
+Wikipedia titles it was grounded in and the full result. Every event or
+news item also gets a row with its parsed year, for year-range queries,
+and an entry in a contentless FTS5 index of its text and question, for
+full-text search. The index also holds the event's year as year, decade,
+century and millennium tokens, so a search for words within a range of
+years is one FTS5 query that intersects both. The archive lives in
+.cache/archive.sqlite3 unless TIME_MACHINE_ARCHIVE names another file;
+TIME_MACHINE_ARCHIVE=off turns it off.
+
+    python -m archive search "trade embargo" --from 1800 --to 1850
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from result_cache import normalize_question
+from timeline_extension import event_year
+
+DEFAULT_ARCHIVE_PATH = os.environ.get(
+    "TIME_MACHINE_ARCHIVE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "archive.sqlite3")
+)
+
+# Where the events of each mode's result are, and which fields are their text
+EVENT_FIELDS = {
+    'timeline': ('timeline', 'year', 'event', 'impact'),
+    'extend': ('timeline', 'year', 'event', 'impact'),
+    'drill_down': ('sub_events', 'year', 'event', 'impact'),
+    'newsfeed': ('news_items', 'date', 'headline', 'summary'),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    question TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    context_titles TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    generation_id INTEGER NOT NULL REFERENCES generations(id),
+    year INTEGER,
+    year_text TEXT NOT NULL,
+    text TEXT NOT NULL,
+    detail TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_year ON events(year);
+CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+    text, detail, question, years, content='', tokenize='porter unicode61'
+);
+"""
+
+# Years are indexed as offsets from this, so BC years get tokens too
+YEAR_OFFSET = 10000
+# Token prefix for each granularity of YEAR_TOKENS, in years
+YEAR_TOKENS = ((1000, 'k'), (100, 'c'), (10, 'd'), (1, 'y'))
+
+
+def year_tokens(year):
+    """The year, decade, century and millennium tokens indexed for an event"""
+    if year is None:
+        return ""
+    offset = year + YEAR_OFFSET
+    return " ".join(f"{prefix}{offset // size}" for size, prefix in YEAR_TOKENS)
+
+
+def year_range_terms(year_from, year_to):
+    """The fewest year tokens that together cover year_from..year_to, either end optional"""
+    low = max(year_from if year_from is not None else -YEAR_OFFSET + 1, -YEAR_OFFSET + 1) + YEAR_OFFSET
+    high = min(year_to if year_to is not None else YEAR_OFFSET - 1, YEAR_OFFSET - 1) + YEAR_OFFSET
+    terms = []
+    while low <= high:
+        for size, prefix in YEAR_TOKENS:
+            if low % size == 0 and low + size - 1 <= high:
+                terms.append(f"{prefix}{low // size}")
+                low += size
+                break
+    return terms
+
+
+def fts_query(text, year_from=None, year_to=None):
+    """An FTS5 query for every word of `text` within the year range, or "" if it can match nothing
+
+    Words are quoted, so user input is never parsed as query syntax.
+    """
+    words = [f'"{word}"' for word in re.findall(r'\w+', text.lower())]
+    query = "{text detail question} : (" + " ".join(words) + ")" if words else ""
+    if year_from is not None or year_to is not None:
+        terms = year_range_terms(year_from, year_to)
+        if not terms:
+            return ""
+        query += (" AND " if query else "") + "years : (" + " OR ".join(terms) + ")"
+    return query
+
+
+class Archive:
+    """Every generation, searchable by words and by the years of its events"""
+
+    def __init__(self, path=DEFAULT_ARCHIVE_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.recorded = 0
+        self.searches = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def _insert(self, question, mode, result, context_titles, created_at):
+        payload = json.dumps(result, sort_keys=True)
+        key = hashlib.sha256(json.dumps([normalize_question(question), mode, payload]).encode()).hexdigest()
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO generations (key, question, mode, context_titles, created_at, payload) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, question, mode, json.dumps(list(context_titles)), created_at, payload)
+        )
+        if not cursor.rowcount:
+            return False
+
+        generation_id = cursor.lastrowid
+        array_key, year_field, text_field, detail_field = EVENT_FIELDS.get(mode, EVENT_FIELDS['timeline'])
+        for item in result.get(array_key, []) if isinstance(result, dict) else result:
+            if not isinstance(item, dict):
+                continue
+            year_text = str(item.get(year_field, ''))
+            text, detail = str(item.get(text_field, '')), str(item.get(detail_field, ''))
+            event_id = self._conn.execute(
+                "INSERT INTO events (generation_id, year, year_text, text, detail) VALUES (?, ?, ?, ?, ?)",
+                (generation_id, event_year(year_text), year_text, text, detail)
+            ).lastrowid
+            self._conn.execute(
+                "INSERT INTO events_fts (rowid, text, detail, question, years) VALUES (?, ?, ?, ?, ?)",
+                (event_id, text, detail, question, year_tokens(event_year(year_text)))
+            )
+        return True
+
+    def record(self, question, mode, result, context_titles=(), created_at=None):
+        """Store one generation; an identical one already stored is skipped"""
+        self.record_many([(question, mode, result, context_titles, created_at)])
+
+    def record_many(self, generations):
+        """Store (question, mode, result, context titles, created_at) tuples in one transaction"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for question, mode, result, context_titles, created_at in generations:
+                    if self._insert(question, mode, result, context_titles, created_at or time.time()):
+                        self.recorded += 1
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def search(self, text=None, year_from=None, year_to=None, limit=50):
+        """Matching events with the question and mode they belong to
+
+        `text` matches whole words of the event, its detail or the question,
+        and their other forms ("embargoes" finds "embargo"). Either year
+        bound may be left out. Word searches list the newest events first;
+        year-only searches list events in year order.
+        """
+        columns = ("SELECT e.id, e.generation_id, e.year, e.year_text, e.text, e.detail, g.question, g.mode "
+                   "FROM events e JOIN generations g ON g.id = e.generation_id ")
+        if text and re.search(r'\w', text):
+            match = fts_query(text, year_from, year_to)
+            if not match:
+                return []
+            sql = columns + ("JOIN (SELECT rowid FROM events_fts WHERE events_fts MATCH ? ORDER BY rowid DESC LIMIT ?) f "
+                             "ON e.id = f.rowid ORDER BY e.id DESC")
+            params = [match, limit]
+        elif year_from is not None or year_to is not None:
+            conditions, params = [], []
+            if year_from is not None:
+                conditions.append("e.year >= ?")
+                params.append(year_from)
+            if year_to is not None:
+                conditions.append("e.year <= ?")
+                params.append(year_to)
+            sql = columns + "WHERE " + " AND ".join(conditions) + " ORDER BY e.year, e.id LIMIT ?"
+            params.append(limit)
+        else:
+            return []
+
+        with self._lock:
+            self.searches += 1
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {'event_id': row[0], 'generation_id': row[1], 'year': row[2], 'year_text': row[3],
+             'text': row[4], 'detail': row[5], 'question': row[6], 'mode': row[7]}
+            for row in rows
+        ]
+
+    def generation(self, generation_id):
+        """The stored generation with its full result, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT question, mode, context_titles, created_at, payload FROM generations WHERE id = ?",
+                (generation_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'question': row[0], 'mode': row[1], 'context_titles': json.loads(row[2]),
+                'created_at': row[3], 'data': json.loads(row[4])}
+
+    def stats(self):
+        with self._lock:
+            generations = self._conn.execute("SELECT MAX(id) FROM generations").fetchone()[0] or 0
+            events = self._conn.execute("SELECT MAX(id) FROM events").fetchone()[0] or 0
+        return {'generations': generations, 'events': events, 'recorded': self.recorded, 'searches': self.searches}
+
+    def close(self):
+        self._conn.close()
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive():
+    """Return the process-wide archive, or None when TIME_MACHINE_ARCHIVE=off"""
+    global _archive
+    if DEFAULT_ARCHIVE_PATH == "off":
+        return None
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = Archive()
+    return _archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    search = commands.add_parser("search", help="search the archive")
+    search.add_argument("text", nargs="?", help="words to look for")
+    search.add_argument("--from", dest="year_from", type=int)
+    search.add_argument("--to", dest="year_to", type=int)
+    search.add_argument("--limit", type=int, default=20)
+    search.add_argument("--archive", default=DEFAULT_ARCHIVE_PATH)
+    args = parser.parse_args()
+
+    archive = Archive(args.archive)
+    for hit in archive.search(args.text, args.year_from, args.year_to, args.limit):
+        print(f"{hit['year_text']:>12}  {hit['text']}  [{hit['mode']}: {hit['question']}]")
+    archive.close()
+
+
+if __name__ == "__main__":
+    main()
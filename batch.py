@@ -0,0 +1,190 @@
+"""Generate alternate histories in bulk without the Streamlit UI
+
+Reads what-if questions as JSON lines ({"id": ..., "question": ...}; a
+line that is not a JSON object is taken as the question itself) from a
+file or stdin, and appends one JSON line per question to the output as
+soon as it finishes:
+
+    python -m batch questions.jsonl --output histories.jsonl --modes timeline,newsfeed --concurrency 8
+    echo "What if Napoleon won at Waterloo?" | python -m batch - --output histories.jsonl
+
+The Gemini key comes from --api-key or the GOOGLE_API_KEY environment
+variable. Questions already in the output without an error are skipped,
+so an interrupted run picks up where it stopped when started again.
+Context is fetched once per question for all modes and results go
+through the same caches as the app. Model calls share the app's rate
+limiter, so throughput grows with --concurrency until the limit is
+reached.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from deadlines import REQUEST_BUDGET, Deadline
+
+MODES = ('timeline', 'newsfeed')
+
+
+def question_id(question):
+    return hashlib.sha1(question.strip().encode('utf-8')).hexdigest()[:12]
+
+
+def read_questions(lines):
+    """Yield {'id', 'question'} for every non-blank input line"""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            item = None
+        if not isinstance(item, dict):
+            item = {'question': line}
+        question = str(item.get('question', '')).strip()
+        if question:
+            yield {'id': str(item.get('id') or question_id(question)), 'question': question}
+
+
+def completed_ids(path):
+    """IDs already written to `path` without an error; a torn last line is ignored"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and 'id' in record and not record.get('errors'):
+                done.add(str(record['id']))
+    return done
+
+
+def open_output(path):
+    """Open `path` for appending, finishing a line left half-written by a crash"""
+    f = open(path, 'a+', encoding='utf-8')
+    if f.tell() > 0:
+        f.seek(f.tell() - 1)
+        if f.read(1) != '\n':
+            f.write('\n')
+    return f
+
+
+def generate(time_machine, item, modes, budget):
+    """Fetch context once and generate every mode for one question"""
+    start = time.perf_counter()
+    deadline = Deadline(budget)
+    question = item['question']
+    context_data = time_machine.fetch_wikipedia_context(question, deadline)
+    record = {'id': item['id'], 'question': question, 'context': [entry['title'] for entry in context_data]}
+    errors = []
+    for i, mode in enumerate(modes):
+        # Context counts against the first mode's budget, as in the app; later modes start afresh
+        if i:
+            deadline = Deadline(budget)
+        if mode == 'timeline':
+            data = time_machine.generate_timeline(question, context_data, deadline=deadline)
+        else:
+            data = time_machine.generate_newsfeed(question, context_data, deadline=deadline)
+        record[mode] = data
+        if time_machine.generation_failed(data):
+            errors.append(mode)
+    if errors:
+        record['errors'] = errors
+    record['seconds'] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def run_batch(time_machine, items, modes, output, concurrency=4, budget=REQUEST_BUDGET, skip=(), on_record=None):
+    """Generate every item not in `skip`, writing each record to `output` as it finishes
+
+    At most `concurrency` questions are in flight, so input from a pipe is
+    read as it is needed. Returns counts of written, failed and skipped
+    questions.
+    """
+    counts = {'written': 0, 'failed': 0, 'skipped': 0}
+    write_lock = threading.Lock()
+    slots = threading.BoundedSemaphore(concurrency)
+    seen = set(skip)
+
+    def work(item):
+        try:
+            try:
+                record = generate(time_machine, item, modes, budget)
+            except Exception as e:
+                record = {'id': item['id'], 'question': item['question'], 'errors': list(modes), 'exception': str(e)}
+            with write_lock:
+                output.write(json.dumps(record) + '\n')
+                output.flush()
+                counts['written'] += 1
+                if record.get('errors'):
+                    counts['failed'] += 1
+                if on_record:
+                    on_record(record)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for item in items:
+            if item['id'] in seen:
+                counts['skipped'] += 1
+                continue
+            seen.add(item['id'])
+            slots.acquire()
+            executor.submit(work, item)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file of questions, or - for stdin")
+    parser.add_argument("--output", required=True, help="JSONL file results are appended to")
+    parser.add_argument("--modes", default="timeline", help="comma-separated: timeline, newsfeed")
+    parser.add_argument("--concurrency", type=int, default=4, help="questions generated at once")
+    parser.add_argument("--budget", type=float, default=REQUEST_BUDGET, help="seconds allowed per generation")
+    parser.add_argument("--quiet", action="store_true", help="do not report each question on stderr")
+    parser.add_argument("--api-key", default=os.environ.get("GOOGLE_API_KEY"), help="Gemini API key (default: $GOOGLE_API_KEY)")
+    args = parser.parse_args()
+
+    modes = [mode for mode in args.modes.split(",") if mode]
+    if not modes or set(modes) - set(MODES):
+        parser.error("--modes must be a comma-separated subset of timeline,newsfeed")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if not args.api_key:
+        parser.error("a Gemini API key is needed: pass --api-key or set GOOGLE_API_KEY")
+
+    # Imported here so --help works without Streamlit and the Gemini SDK; importing app draws no page
+    from app import TimeMachine
+
+    time_machine = TimeMachine(api_key=args.api_key)
+    if time_machine.model is None:
+        sys.exit("Gemini API is not available. Please install google-generativeai.")
+
+    def report(record):
+        if not args.quiet:
+            status = "failed: " + ", ".join(record['errors']) if record.get('errors') else "ok"
+            print(f"{record['id']} {status} ({record.get('seconds', 0):.1f}s)", file=sys.stderr)
+
+    skip = completed_ids(args.output)
+    source = sys.stdin if args.input == "-" else open(args.input, encoding='utf-8')
+    start = time.perf_counter()
+    with source, open_output(args.output) as output:
+        counts = run_batch(time_machine, read_questions(source), modes, output, args.concurrency,
+                           args.budget, skip, on_record=report)
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {counts['written']} questions ({counts['failed']} failed), skipped {counts['skipped']} "
+          f"already done, in {elapsed:.1f}s", file=sys.stderr)
+    if counts['failed']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
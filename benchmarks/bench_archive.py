@@ -0,0 +1,122 @@
+"""Measure archive search latency on a synthetic corpus of a million events
+
+Builds an archive of timelines in a temporary file, each event with a
+year between 1000 BC and 2100 and text drawn from a Zipf-distributed
+vocabulary, so some words appear in a third of all events and most in
+only a handful. Then times full-text, year-range and combined queries
+against the 50ms target, from common words to rare ones and from wide
+ranges to a single year.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_archive --events 1000000
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from archive import Archive
+
+TARGET_MS = 50
+
+EVENTS_PER_TIMELINE = 8
+
+
+def make_vocabulary(size):
+    syllables = ["ka", "lo", "ven", "tar", "mi", "dros", "el", "qua", "sun", "rho", "bex", "nor"]
+    rng = random.Random(1)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_generations(count, vocabulary, seed=0):
+    """`count` timelines of EVENTS_PER_TIMELINE events with Zipf-distributed words"""
+    rng = random.Random(seed)
+    cumulative = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+
+    def sentence(length):
+        return " ".join(rng.choices(vocabulary, cum_weights=cumulative, k=length))
+
+    for i in range(count):
+        start = rng.randint(-1000, 2000)
+        events = [
+            {"year": f"{-year} BC" if year < 0 else str(year), "event": sentence(12), "impact": sentence(10),
+             "probability": "Medium"}
+            for year in sorted(start + rng.randint(0, 100) for _ in range(EVENTS_PER_TIMELINE))
+        ]
+        question = f"What if {sentence(5)}?"
+        yield question, "timeline", {"timeline": events, "summary": sentence(15)}, ["Synthetic"], 1_700_000_000 + i
+
+
+def build(archive, events, vocabulary):
+    generations = make_generations(events // EVENTS_PER_TIMELINE, vocabulary)
+    batch = []
+    for generation in generations:
+        batch.append(generation)
+        if len(batch) == 2000:
+            archive.record_many(batch)
+            batch = []
+    archive.record_many(batch)
+
+
+def time_query(archive, repeats, **query):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        hits = archive.search(limit=50, **query)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), max(timings), len(hits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    vocabulary = make_vocabulary(args.vocabulary)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "archive.sqlite3")
+        archive = Archive(path)
+        start = time.perf_counter()
+        build(archive, args.events, vocabulary)
+        stats = archive.stats()
+        print(f"built {stats['events']} events in {stats['generations']} timelines in "
+              f"{time.perf_counter() - start:.1f}s, {os.path.getsize(path) / 2 ** 20:.0f} MiB")
+
+        common, middle, rare = vocabulary[0], vocabulary[50], vocabulary[-1]
+        queries = [
+            ("common word", dict(text=common)),
+            ("mid word", dict(text=middle)),
+            ("rare word", dict(text=rare)),
+            ("two words", dict(text=f"{common} {middle}")),
+            ("no match", dict(text="zzzz")),
+            ("open range", dict(year_from=2050)),
+            ("century", dict(year_from=1800, year_to=1899)),
+            ("one year", dict(year_from=1815, year_to=1815)),
+            ("BC range", dict(year_from=-500, year_to=-400)),
+            ("common + year", dict(text=common, year_from=1815, year_to=1815)),
+            ("common + 1815-", dict(text=common, year_from=1815)),
+            ("two + odd range", dict(text=f"{common} {middle}", year_from=-333, year_to=1777)),
+            ("common + empty", dict(text=common, year_from=3000)),
+            ("rare + century", dict(text=rare, year_from=1800, year_to=1899)),
+            ("mid + BC range", dict(text=middle, year_from=-500, year_to=-400)),
+        ]
+        slowest = 0
+        for name, query in queries:
+            median, worst, hits = time_query(archive, args.repeats, **query)
+            slowest = max(slowest, worst)
+            print(f"{name:<15} median {median:7.2f}ms  max {worst:7.2f}ms  {hits:>3} hits")
+        print(f"slowest query {slowest:.1f}ms, target {TARGET_MS}ms: {'met' if slowest < TARGET_MS else 'missed'}")
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
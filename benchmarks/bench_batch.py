@@ -0,0 +1,71 @@
+"""Measure batch generation throughput against concurrency and check resuming
+
+Runs batch.run_batch over generated questions with a stub model behind a
+rate-limited GeminiClient and a local Wikipedia stub, at increasing
+--concurrency, to show throughput growing until the rate limit caps it.
+Then interrupts a run halfway and resumes it from its output file.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_batch --rate 10
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from batch import completed_ids, open_output, read_questions, run_batch
+from benchmarks import stubs
+from benchmarks.stubs import FakeModel, WikipediaStubServer
+from gemini_client import ClientStats, CircuitBreaker, GeminiClient, TokenBucket
+from wiki_context import WikipediaFetcher
+
+PLACES = ["Waterloo", "Alexandria", "Carthage", "Constantinople", "Trafalgar", "Hastings", "Tenochtitlan", "Kyoto"]
+
+
+def questions(count):
+    lines = [f'{{"id": "q{i}", "question": "What if the battle of {PLACES[i % len(PLACES)]} in year {1000 + i} went the other way?"}}'
+             for i in range(count)]
+    return list(read_questions(lines))
+
+
+def make_time_machine(stub, rate):
+    model = FakeModel(first_token_latency=0.3, seconds_per_char=0.0001)
+    client = GeminiClient(model, limiter=TokenBucket(rate=rate, capacity=1), breaker=CircuitBreaker(), stats=ClientStats())
+    return stubs.make_time_machine(client, WikipediaFetcher(base_url=stub.base_url, max_workers=32))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--rate", type=float, default=10.0, help="model calls per second")
+    parser.add_argument("--concurrency", default="1,2,4,8,16")
+    args = parser.parse_args()
+
+    items = questions(args.questions)
+    with WikipediaStubServer(latency=0.1, jitter=0.05) as stub:
+        for concurrency in [int(value) for value in args.concurrency.split(",")]:
+            time_machine = make_time_machine(stub, args.rate)
+            start = time.perf_counter()
+            counts = run_batch(time_machine, items, ['timeline'], io.StringIO(), concurrency)
+            elapsed = time.perf_counter() - start
+            print(f"concurrency {concurrency:>2}: {counts['written'] / elapsed:5.2f} questions/s "
+                  f"(rate limit {args.rate:.0f}/s), {counts['failed']} failed")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "out.jsonl")
+            time_machine = make_time_machine(stub, args.rate)
+            half = len(items) // 2
+            with open_output(path) as output:
+                run_batch(time_machine, items[:half], ['timeline'], output, 4)
+                # Simulate a crash in the middle of writing a record
+                output.write('{"id": "q-torn", "question": "What if')
+            with open_output(path) as output:
+                counts = run_batch(time_machine, items, ['timeline'], output, 4, skip=completed_ids(path))
+            print(f"resumed: {counts['skipped']} skipped, {counts['written']} written, "
+                  f"{len(completed_ids(path))} of {len(items)} complete in the output")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Compare ways of putting one message to several historical figures
+
+"sequential" asks each figure in turn, as the single-figure chat does;
+"concurrent" and "batch" are the two fan-out strategies of
+TimeMachine.ask_figures, and "auto" lets it choose, preferring speed to
+cost. The last run shares a rate limiter that only has two requests left,
+where batching should win.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_chat_fanout --figures 5
+"""
+import argparse
+import json
+import time
+
+from benchmarks.stubs import FakeModel, make_time_machine
+from chat_session import ChatSession
+from gemini_client import ClientStats, CircuitBreaker, GeminiClient, TokenBucket
+
+QUESTION = "What if Napoleon won at Waterloo?"
+FIGURES = ["Napoleon Bonaparte", "Albert Einstein", "Cleopatra", "Leonardo da Vinci", "Marie Curie", "Winston Churchill"]
+REPLY = "In this world my life took quite a different turn, and I would tell you all about it over dinner."
+
+
+def respond(prompt):
+    if '"replies"' in prompt:
+        names = [name for name in FIGURES if f"- {name}" in prompt]
+        return json.dumps({"replies": [{"figure": name, "reply": REPLY} for name in names]}, indent=2)
+    return REPLY
+
+
+def run(name, figures, strategy=None, limiter=None):
+    model = FakeModel(first_token_latency=0.4, seconds_per_char=0.002, chunk_chars=40, respond=respond)
+    time_machine = make_time_machine(GeminiClient(model, limiter=limiter or TokenBucket(rate=100, capacity=100),
+                                                  breaker=CircuitBreaker(), stats=ClientStats()))
+    sessions = {figure: ChatSession(figure, QUESTION) for figure in figures}
+    message = "How did this change your life?"
+
+    arrivals = []
+    start = time.perf_counter()
+    if strategy == 'sequential':
+        for figure in figures:
+            time_machine.chat_with_historical_figure(figure, QUESTION, message, session=sessions[figure])
+            arrivals.append(time.perf_counter() - start)
+        chosen = strategy
+    else:
+        chosen = strategy or time_machine.fanout_strategy(figures)
+        replies = time_machine.ask_figures(figures, QUESTION, message, sessions, strategy=chosen,
+                                           on_reply=lambda figure, reply: arrivals.append(time.perf_counter() - start))
+        assert len(replies) == len(figures)
+    print(f"{name:<12} ({chosen}): first reply {arrivals[0]:.2f}s, all {len(figures)} replies {arrivals[-1]:.2f}s, "
+          f"model calls {model.calls}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--figures", type=int, default=5)
+    args = parser.parse_args()
+    figures = FIGURES[:args.figures]
+
+    run("sequential", figures, 'sequential')
+    run("concurrent", figures, 'concurrent')
+    run("batch", figures, 'batch')
+    run("auto", figures)
+    run("auto, limited", figures, limiter=TokenBucket(rate=1 / 60, capacity=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Measure prompt size, latency and memory over a long chat with a historical figure
+
+"unbounded" keeps every turn in the prompt, like sending the whole
+history each time; "bounded" uses the default ChatSession budget, which
+folds old turns into a running summary. The stub model charges time for
+every prompt character it reads as well as every character it writes.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_chat_session --turns 200
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.stubs import FakeModel, make_time_machine
+from chat_session import ChatSession
+
+QUESTION = "What if Napoleon won at Waterloo?"
+FIGURE = "Napoleon Bonaparte"
+
+
+def make_respond(seconds_per_prompt_char):
+    def respond(prompt):
+        time.sleep(len(prompt) * seconds_per_prompt_char)
+        if prompt.lstrip().startswith("Update the running summary"):
+            return "We have discussed the campaign, the new borders and my plans for Europe."
+        return ("Ah, mon ami, after Waterloo everything changed. The coalition broke apart and "
+                "I spent the following years rebuilding France. Ask me about the Congress that followed.")
+    return respond
+
+
+def run(session, turns, seconds_per_prompt_char):
+    time_machine = make_time_machine(FakeModel(first_token_latency=0.0, seconds_per_char=0.0,
+                                               respond=make_respond(seconds_per_prompt_char)))
+    latencies = []
+    prompt_tokens = []
+
+    tracemalloc.start()
+    for turn in range(turns):
+        message = f"Question {turn + 1}: what did you decide about the lands east of the Rhine that year?"
+        prompt_tokens.append(session.prompt_tokens(message))
+        start = time.perf_counter()
+        time_machine.chat_with_historical_figure(FIGURE, QUESTION, message, session=session)
+        latencies.append(time.perf_counter() - start)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return latencies, prompt_tokens, peak, time_machine.model.calls
+
+
+def report(name, turns, result, session):
+    latencies, prompt_tokens, peak, calls = result
+    window = max(1, min(10, turns // 2))
+    early = statistics.mean(latencies[:window]) * 1000
+    late = statistics.mean(latencies[-window:]) * 1000
+    print(f"{name}: turns 1-{window} {early:.1f}ms, last {window} turns {late:.1f}ms, "
+          f"prompt tokens first {prompt_tokens[0]} max {max(prompt_tokens)}, "
+          f"model calls {calls} ({session.folds} summaries), peak memory {peak / 1024:.0f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--prompt-cost", type=float, default=0.000005,
+                        help="simulated seconds per prompt character")
+    args = parser.parse_args()
+
+    session = ChatSession(FIGURE, QUESTION, history_tokens=10 ** 9, max_messages=10 ** 9)
+    report("unbounded", args.turns, run(session, args.turns, args.prompt_cost), session)
+
+    session = ChatSession(FIGURE, QUESTION)
+    report("bounded", args.turns, run(session, args.turns, args.prompt_cost), session)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Measure prompt size and generation latency with and without context budgeting
+
+Each question gets Wikipedia-like extracts of varying length in which
+some sentences are about the question and the rest are background.
+"full" sends every extract whole, as before; the budgeted runs use
+assemble_context. The stub model charges latency per prompt token, so
+smaller prompts show up as faster generations. "relevant kept" is the
+share of on-topic sentences that made it into the prompt.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_context_assembly
+"""
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks.stubs import FakeModel, make_time_machine
+from context_assembly import DEFAULT_CONTEXT_TOKENS, assemble_context
+
+QUESTIONS = {
+    "What if Napoleon won at Waterloo?": ["Napoleon", "Battle of Waterloo", "Seventh Coalition"],
+    "What if the Library of Alexandria never burned down?": ["Library of Alexandria", "Alexandria", "Ptolemaic Kingdom"],
+    "What if the Roman Empire never fell?": ["Roman Empire", "Fall of the Western Roman Empire", "Byzantine Empire"],
+    "What if the printing press was invented in China first?": ["Printing press", "Johannes Gutenberg", "China"],
+    "What if the Black Death never happened?": ["Black Death", "Plague", "Medieval Europe"],
+}
+
+BACKGROUND = [
+    "The name is derived from an older regional word of uncertain origin.",
+    "Several museums hold collections of related objects and manuscripts.",
+    "Scholars continue to debate the accuracy of the surviving accounts.",
+    "The subject has been depicted in numerous paintings, novels and films.",
+    "A number of monuments were later erected by local authorities.",
+    "Modern historians rely on a small set of contemporary sources.",
+    "The area is now part of a protected heritage site open to visitors.",
+    "Its architecture combined elements from several earlier traditions.",
+]
+
+
+def make_context(question, titles, rng):
+    """Extracts of 4 to 24 sentences, about a quarter of them on topic"""
+    words = [word for word in question.rstrip("?").split()[2:] if len(word) > 3]
+    context_data, relevant = [], set()
+    for title in titles:
+        sentences = []
+        for i in range(rng.randint(4, 24)):
+            if i == 0 or rng.random() < 0.25:
+                sentence = f"{title} is closely linked to {rng.choice(words)} and changed the region in {rng.randint(1000, 1900)}."
+                relevant.add(sentence)
+            else:
+                sentence = rng.choice(BACKGROUND)
+            sentences.append(sentence)
+        context_data.append({'title': title, 'extract': " ".join(sentences), 'year': None})
+    return context_data, relevant
+
+
+def run(name, budget, contexts, model_args):
+    time_machine = make_time_machine(FakeModel(**model_args))
+    time_machine.context_tokens = budget
+
+    latencies, kept = [], []
+    for question, (context_data, relevant) in contexts.items():
+        text, _ = assemble_context(question, context_data, budget)
+        kept.append(sum(sentence in text for sentence in relevant) / len(relevant))
+        start = time.perf_counter()
+        time_machine.generate_timeline(question, context_data)
+        latencies.append(time.perf_counter() - start)
+
+    model = time_machine.model
+    print(f"{name:<12} prompt tokens {model.prompt_tokens / model.calls:>5.0f}, "
+          f"generation {statistics.mean(latencies) * 1000:>5.0f}ms, relevant kept {statistics.mean(kept):>4.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prompt-cost", type=float, default=0.001, help="simulated seconds per prompt token")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    contexts = {question: make_context(question, titles, rng) for question, titles in QUESTIONS.items()}
+    model_args = {'first_token_latency': 0.1, 'seconds_per_char': 0.0, 'seconds_per_prompt_token': args.prompt_cost}
+
+    run("full", None, contexts, model_args)
+    run(f"budget {DEFAULT_CONTEXT_TOKENS}", DEFAULT_CONTEXT_TOKENS, contexts, model_args)
+    run("budget 150", 150, contexts, model_args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Measure end-to-end tail latency with and without request deadlines
+
+Every request fetches context from a local Wikipedia stub and generates a
+timeline with a stub model. Both stubs occasionally stall: a few percent
+of Wikipedia requests hang for seconds and a few model calls hang for
+longer. "unbounded" is the old pipeline (fixed 5s context wait, no
+hedging, no generation timeout); "deadline" runs each request under one
+budget with hedged Wikipedia fetches. With --check the script exits
+non-zero if the deadline run's p99 exceeds the budget by more than 10%.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_deadlines --requests 200 --budget 4
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import stubs
+from benchmarks.stubs import FakeModel, WikipediaStubServer
+from deadlines import Deadline
+from gemini_client import ClientStats, CircuitBreaker, GeminiClient, TokenBucket
+from wiki_context import WikipediaFetcher
+
+QUESTIONS = [
+    "What if Napoleon won at Waterloo?",
+    "What if the Library of Alexandria never burned down?",
+    "What if the Roman Empire never fell?",
+    "What if Cleopatra defeated Octavian?",
+    "What if the Spanish Armada succeeded?",
+]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def make_time_machine(stub, args, hedge):
+    model = FakeModel(first_token_latency=0.3, seconds_per_char=0.0001, stall_rate=args.model_stalls, stall_seconds=8.0)
+    client = GeminiClient(model, limiter=TokenBucket(rate=1000, capacity=1000),
+                          breaker=CircuitBreaker(failure_threshold=10 ** 6), stats=ClientStats())
+    return stubs.make_time_machine(client, WikipediaFetcher(base_url=stub.base_url, hedge=hedge, max_workers=32))
+
+
+def run(name, time_machine, args, budget):
+    def request(i):
+        question = QUESTIONS[i % len(QUESTIONS)]
+        deadline = Deadline(budget) if budget else None
+        start = time.perf_counter()
+        context_data = time_machine.fetch_wikipedia_context(question, deadline)
+        data = time_machine.generate_timeline(question, context_data, deadline=deadline)
+        failed = data['timeline'][0]['year'] == 'Error'
+        complete = len(context_data) == len(time_machine.extract_search_terms(question)[:3])
+        return time.perf_counter() - start, complete, failed
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(request, range(args.requests)))
+
+    latencies = [latency for latency, _, _ in results]
+    full_context = sum(complete for _, complete, _ in results) / len(results)
+    failed = sum(failed for *_, failed in results)
+    print(f"{name:<10} p50 {percentile(latencies, 50):.2f}s p95 {percentile(latencies, 95):.2f}s "
+          f"p99 {percentile(latencies, 99):.2f}s max {max(latencies):.2f}s, full context {full_context:.0%}, "
+          f"generation timeouts {failed}")
+    stats = time_machine.fetcher.stats()
+    if stats['hedges']:
+        print(f"{'':<10} {stats['hedges']} hedged Wikipedia requests, {stats['hedge_wins']} answered first")
+    return percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--budget", type=float, default=4.0, help="end-to-end deadline in seconds")
+    parser.add_argument("--wiki-stalls", type=float, default=0.05, help="share of Wikipedia requests that stall")
+    parser.add_argument("--model-stalls", type=float, default=0.02, help="share of model calls that stall")
+    parser.add_argument("--check", action="store_true", help="fail if the deadline p99 is over budget")
+    args = parser.parse_args()
+
+    with WikipediaStubServer(latency=0.05, jitter=0.05, stall_rate=args.wiki_stalls, stall_seconds=3.0) as stub:
+        run("unbounded", make_time_machine(stub, args, hedge=False), args, budget=None)
+        p99 = run("deadline", make_time_machine(stub, args, hedge=True), args, budget=args.budget)
+
+    if args.check and p99 > args.budget * 1.1:
+        print(f"p99 {p99:.2f}s is over the {args.budget:.1f}s budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Compare search term extraction on a corpus of what-if questions
+
+Each question is labelled with the articles it is about. "single words"
+is the old extractor (title-cased words minus a few stop words);
+"names" is extract_entities without a title index, which relies on
+capitalization; "title index" checks candidate phrases against the index
+built from the fixture dump. The last few questions are title-cased, so
+"names" has to stop each name at the verb. Like the app, only the first
+three terms of each question are fetched.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_entities
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+
+from benchmarks.bench_offline_wiki import FIXTURE_DUMP, FIXTURE_REDIRECTS
+from entities import extract_entities
+from wiki_offline import OfflineWikipedia, build_index
+
+CORPUS = [
+    ("What if the Library of Alexandria never burned down?", {"Library of Alexandria"}),
+    ("What if Napoleon won at Waterloo?", {"Napoleon", "Battle of Waterloo"}),
+    ("What if the internet was invented in the 1800s?", {"Internet"}),
+    ("What if dinosaurs never went extinct?", {"Dinosaur"}),
+    ("What if the Roman Empire never fell?", {"Roman Empire"}),
+    ("What if Cleopatra defeated Octavian?", {"Cleopatra", "Augustus"}),
+    ("What if the Spanish Armada succeeded?", {"Spanish Armada"}),
+    ("What if the printing press was invented in China first?", {"Printing press", "China"}),
+    ("What if the Wright brothers failed?", {"Wright brothers"}),
+    ("What if the Black Death never happened?", {"Black Death"}),
+    ("What if Carthage won the Punic Wars?", {"Carthage", "Punic Wars"}),
+    ("What if the Mongols conquered Europe?", {"Mongol Empire", "Europe"}),
+    ("What if Leonardo da Vinci built a working flying machine?", {"Leonardo da Vinci", "Flying machine"}),
+    ("What if Marie Curie never discovered radioactivity?", {"Marie Curie", "Radioactivity"}),
+    ("What if Albert Einstein never published relativity?", {"Albert Einstein", "Relativity"}),
+    ("What if Winston Churchill lost the 1940 election?", {"Winston Churchill"}),
+    ("What if Genghis Khan had died young?", {"Genghis Khan", "Mongol Empire"}),
+    ("What if Johannes Gutenberg never built his press?", {"Johannes Gutenberg", "Printing press"}),
+    ("What if Napoleon Bonaparte had conquered Egypt?", {"Napoleon", "Egypt"}),
+    ("What if the fall of the Western Roman Empire never happened?", {"Fall of the Western Roman Empire"}),
+    ("what if the library of alexandria survived the roman empire", {"Library of Alexandria", "Roman Empire"}),
+    ("what if the wright brothers flew in 1850", {"Wright brothers"}),
+    ("What if the Renaissance started in China?", {"Renaissance", "China"}),
+    ("What if Augustus never became emperor?", {"Augustus"}),
+    ("What if the Cretaceous–Paleogene extinction event never happened?", {"Cretaceous–Paleogene extinction event", "Dinosaur"}),
+    ("What If Carthage Won The Punic Wars?", {"Carthage", "Punic Wars"}),
+    ("What If The Roman Empire Never Fell?", {"Roman Empire"}),
+    ("What If Cleopatra Defeated Octavian?", {"Cleopatra", "Augustus"}),
+]
+
+
+def single_words(question):
+    """The previous extract_search_terms"""
+    stop_words = {'what', 'if', 'had', 'not', 'never', 'been', 'was', 'were', 'would', 'could', 'should'}
+    words = re.findall(r'\b[A-Za-z]+\b', question.lower())
+    return [word.title() for word in words if word not in stop_words and len(word) > 2][:5]
+
+
+def evaluate(name, extract, wiki):
+    fetches = hits = relevant = found = wanted = 0
+    elapsed = 0.0
+    for question, articles in CORPUS:
+        start = time.perf_counter()
+        terms = extract(question)[:3]
+        elapsed += time.perf_counter() - start
+
+        titles = set()
+        for summary in wiki.fetch_all(terms):
+            fetches += 1
+            if summary:
+                hits += 1
+                if summary['title'] in articles:
+                    relevant += 1
+                    titles.add(summary['title'])
+        found += len(titles)
+        wanted += len(articles)
+
+    print(f"{name:<13} fetches {fetches:>3}, pages found {hits / fetches:>4.0%}, relevant {relevant / fetches:>4.0%} "
+          f"of fetches, recall {found / wanted:>4.0%} of labelled articles, "
+          f"extraction {elapsed / len(CORPUS) * 1e6:.0f}us per question")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        index_path = os.path.join(directory, "wiki.idx")
+        build_index(FIXTURE_DUMP, index_path, FIXTURE_REDIRECTS)
+        wiki = OfflineWikipedia(index_path)
+
+        evaluate("single words", single_words, wiki)
+        evaluate("names", extract_entities, wiki)
+        evaluate("title index", lambda question: extract_entities(question, wiki), wiki)
+        wiki.close()
+
+
+if __name__ == "__main__":
+    main()
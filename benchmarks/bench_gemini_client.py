@@ -0,0 +1,158 @@
+"""Exercise the Gemini client wrapper against a fake model that injects 429s and outages
+
+The last check runs on an injected clock: after an outage, the half-open
+trial call is throttled, then cancelled mid-stream, then runs out of its
+deadline, and each time the next call must still get through once Gemini
+is healthy again.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_gemini_client --sessions 20 --calls 5 --error-rate 0.2
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stubs import FakeModel
+from deadlines import Deadline, DeadlineExceeded
+from gemini_client import CircuitBreaker, CircuitOpenError, ClientStats, GeminiClient, ThrottledError, TokenBucket
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_sessions(call, sessions, calls):
+    latencies, errors = [], []
+
+    def session():
+        for _ in range(calls):
+            start = time.perf_counter()
+            try:
+                call()
+            except Exception as e:
+                errors.append(type(e).__name__)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        for _ in range(sessions):
+            pool.submit(session)
+    return time.perf_counter() - start, latencies, errors
+
+
+def report(label, elapsed, latencies, errors, stats=None):
+    print(f"{label}: {len(latencies)} calls in {elapsed:.2f}s, {len(errors)} surfaced errors, "
+          f"p50 {statistics.median(latencies) * 1000:.0f} ms, p99 {percentile(latencies, 99) * 1000:.0f} ms")
+    if stats:
+        print(f"    {stats}")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def throttle(client, clock):
+    client.limiter.tokens, client.limiter.updated = 0, clock.now
+    client.generate_content("prompt")
+
+
+def cancel(client, clock):
+    stream = client.generate_content("prompt", stream=True)
+    next(stream)
+    stream.close()
+
+
+def time_out(client, clock):
+    deadline = Deadline(1, clock=clock)
+    for _ in client.generate_content("prompt", stream=True, deadline=deadline):
+        clock.now += 2
+
+
+def recovers_after(abort_trial):
+    """Whether a call gets through once Gemini is healthy, after the half-open trial call was aborted"""
+    clock = FakeClock()
+    client = GeminiClient(
+        FakeModel(first_token_latency=0, seconds_per_char=0, error_rate=1.0, error_code=503, error_latency=0),
+        limiter=TokenBucket(rate=1.0, capacity=1, clock=clock, sleep=clock.sleep),
+        breaker=CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock),
+        stats=ClientStats(),
+        max_retries=0,
+        max_wait=0,
+        sleep=clock.sleep
+    )
+    try:
+        client.generate_content("prompt")
+    except Exception:
+        pass
+    client.model = FakeModel(first_token_latency=0, seconds_per_char=0, chunk_chars=10)
+
+    clock.now += 60
+    try:
+        abort_trial(client, clock)
+    except (ThrottledError, DeadlineExceeded):
+        pass
+    clock.now += 300
+    try:
+        client.generate_content("prompt")
+        return True
+    except CircuitOpenError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--calls", type=int, default=5)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--rpm", type=float, default=1200)
+    args = parser.parse_args()
+
+    model = FakeModel(first_token_latency=0.05, seconds_per_char=0, error_rate=args.error_rate)
+    prompt = "timeline prompt"
+
+    elapsed, latencies, errors = run_sessions(lambda: model.generate_content(prompt), args.sessions, args.calls)
+    report("direct model       ", elapsed, latencies, errors)
+
+    stats = ClientStats()
+    client = GeminiClient(
+        model,
+        limiter=TokenBucket(rate=args.rpm / 60, capacity=10),
+        breaker=CircuitBreaker(failure_threshold=50),
+        stats=stats,
+        base_delay=0.05
+    )
+    elapsed, latencies, errors = run_sessions(lambda: client.generate_content(prompt), args.sessions, args.calls)
+    report("rate limited client", elapsed, latencies, errors, stats.snapshot())
+
+    # Full outage: the breaker should stop calling the model after a few failures
+    outage = FakeModel(first_token_latency=0.05, seconds_per_char=0, error_rate=1.0, error_code=503, error_latency=0.2)
+    stats = ClientStats()
+    client = GeminiClient(
+        outage,
+        limiter=TokenBucket(rate=args.rpm / 60, capacity=10),
+        breaker=CircuitBreaker(failure_threshold=5, reset_timeout=60),
+        stats=stats,
+        max_retries=1,
+        base_delay=0.05
+    )
+    elapsed, latencies, errors = run_sessions(lambda: client.generate_content(prompt), args.sessions, args.calls)
+    report("outage with breaker", elapsed, latencies, errors, stats.snapshot())
+    print(f"    model calls during outage: {outage.calls}, circuit open errors: {errors.count(CircuitOpenError.__name__)}")
+
+    for name, abort_trial in (("throttled trial", throttle), ("cancelled trial", cancel), ("timed out trial", time_out)):
+        recovered = recovers_after(abort_trial)
+        print(f"{name:<19}: next call {'gets through' if recovered else 'still rejected'} 300s after recovery")
+
+
+if __name__ == "__main__":
+    main()
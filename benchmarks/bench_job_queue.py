@@ -0,0 +1,109 @@
+"""Load test the background job queue with stub Gemini and Wikipedia backends
+
+Simulated users pick questions from a small pool, so many ask the same
+thing at the same time. "inline" runs each generation on the user's own
+thread, like the old Generate handler; "queued" submits to the job queue
+and polls, like the current one.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_job_queue --users 50 --questions 10
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+
+from benchmarks import stubs
+from benchmarks.stubs import FakeModel, WikipediaStubServer
+from jobs import JobQueue
+from result_cache import normalize_question
+from wiki_context import WikipediaFetcher
+
+QUESTIONS = [
+    "What if the Library of Alexandria never burned down?",
+    "What if Napoleon won at Waterloo?",
+    "What if the internet was invented in the 1800s?",
+    "What if dinosaurs never went extinct?",
+    "What if the Roman Empire never fell?",
+    "What if Cleopatra defeated Octavian?",
+    "What if the Spanish Armada succeeded?",
+    "What if the printing press was invented in China first?",
+    "What if the Wright brothers failed?",
+    "What if the Black Death never happened?",
+    "What if Carthage won the Punic Wars?",
+    "What if the Mongols conquered Europe?"
+]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def make_time_machine(stub):
+    # No result caching, so every avoided model call is down to deduplication
+    model = FakeModel(first_token_latency=0.5, seconds_per_char=0.0002)
+    return stubs.make_time_machine(model, WikipediaFetcher(base_url=stub.base_url))
+
+
+def run_users(users, questions, request):
+    latencies = []
+    barrier = threading.Barrier(users)
+
+    def user(seed):
+        question = random.Random(seed).choice(questions)
+        barrier.wait()
+        start = time.perf_counter()
+        request(question)
+        latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--questions", type=int, default=10, help="size of the question pool")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--poll", type=float, default=0.1, help="seconds between status polls")
+    args = parser.parse_args()
+    questions = QUESTIONS[:args.questions]
+
+    with WikipediaStubServer(latency=0.1) as stub:
+        time_machine = make_time_machine(stub)
+
+        def inline(question):
+            context_data = time_machine.fetch_wikipedia_context(question)
+            time_machine.generate_timeline(question, context_data)
+
+        elapsed, latencies = run_users(args.users, questions, inline)
+        inline_calls = time_machine.model.calls
+        print(f"inline: {args.users} users in {elapsed:.2f}s, model calls {inline_calls}, "
+              f"p50 {statistics.median(latencies):.2f}s p95 {percentile(latencies, 95):.2f}s, "
+              f"{args.users} threads blocked for the whole generation")
+
+        time_machine = make_time_machine(stub)
+        queue = JobQueue(max_workers=args.workers)
+
+        def queued(question):
+            job = queue.submit((normalize_question(question), 'timeline'), time_machine.run_generation_job, question, 'timeline')
+            while not job.done:
+                time.sleep(args.poll)
+
+        elapsed, latencies = run_users(args.users, questions, queued)
+        stats = queue.stats()
+        print(f"queued: {args.users} users in {elapsed:.2f}s, model calls {time_machine.model.calls}, "
+              f"p50 {statistics.median(latencies):.2f}s p95 {percentile(latencies, 95):.2f}s, "
+              f"{args.workers} worker threads, {stats['deduplicated']} requests joined an in-flight job")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Load-test every mode end to end against local Gemini and Wikipedia stubs
+
+Runs timeline, newsfeed and chat requests through TimeMachine with no API
+key or network: the model is a FakeModel behind the real GeminiClient
+(rate limiter, retries, circuit breaker) and Wikipedia is a local HTTP
+stub. Latency, error rate and response size of both are flags. Each mode
+runs at every session count in --sessions; a session sends its requests
+one after another, as a user would, and sessions run concurrently.
+
+Reports throughput and p50/p95/p99 per mode and load. --output writes the
+results as JSON, and --compare checks them against an earlier file,
+exiting non-zero if any p95 or throughput is worse by more than
+--tolerance.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_load --sessions 1,8 --output load.json
+    python -m benchmarks.bench_load --sessions 1,8 --compare load.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stubs import FakeModel, WikipediaStubServer, make_time_machine
+from chat_session import ChatSession
+from deadlines import REQUEST_BUDGET, Deadline
+from gemini_client import ClientStats, CircuitBreaker, GeminiClient, TokenBucket
+from wiki_context import WikipediaFetcher
+
+MODES = ("timeline", "newsfeed", "chat")
+
+QUESTIONS = [
+    "What if Napoleon won at Waterloo?",
+    "What if the Library of Alexandria never burned down?",
+    "What if the Roman Empire never fell?",
+    "What if Cleopatra defeated Octavian?",
+    "What if the Spanish Armada succeeded?",
+]
+
+FIGURES = ["Napoleon Bonaparte", "Cleopatra", "Julius Caesar", "Queen Elizabeth I"]
+
+CHAT_MESSAGES = [
+    "How did this change your life?",
+    "What do your rivals think of you now?",
+    "What would you do differently?",
+    "What worries you most about the future?",
+]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def make_model(args):
+    """One client for the whole run, shared by every session like get_gemini_client()"""
+    model = FakeModel(first_token_latency=args.model_latency, seconds_per_char=args.seconds_per_char,
+                      error_rate=args.model_error_rate, error_code=503, response_items=args.response_items,
+                      reply_chars=args.reply_chars)
+    return GeminiClient(model, limiter=TokenBucket(rate=args.rate_limit, capacity=args.rate_limit),
+                        breaker=CircuitBreaker(failure_threshold=10 ** 6), stats=ClientStats())
+
+
+def request(time_machine, mode, i, chat_session):
+    """Run one request and return whether it failed"""
+    question = QUESTIONS[i % len(QUESTIONS)]
+    if mode == "chat":
+        reply = time_machine.chat_with_historical_figure(
+            chat_session.figure_name, question, CHAT_MESSAGES[i % len(CHAT_MESSAGES)], chat_session
+        )
+        return reply.startswith("Sorry")
+
+    deadline = Deadline(REQUEST_BUDGET)
+    context_data = time_machine.fetch_wikipedia_context(question, deadline)
+    if mode == "timeline":
+        data = time_machine.generate_timeline(question, context_data, deadline=deadline)
+        return data['timeline'][0]['year'] == 'Error'
+    data = time_machine.generate_newsfeed(question, context_data, deadline=deadline)
+    return data['news_items'][0]['headline'] == 'Error'
+
+
+def run(mode, sessions, args, model, fetcher):
+    def session(number):
+        time_machine = make_time_machine(model, fetcher)
+        chat_session = ChatSession(FIGURES[number % len(FIGURES)], QUESTIONS[number % len(QUESTIONS)])
+        results = []
+        for i in range(args.requests):
+            start = time.perf_counter()
+            failed = request(time_machine, mode, number + i, chat_session)
+            results.append((time.perf_counter() - start, failed))
+        return results
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        results = [result for results in executor.map(session, range(sessions)) for result in results]
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, _ in results]
+    return {
+        'mode': mode,
+        'sessions': sessions,
+        'requests': len(results),
+        'errors': sum(failed for _, failed in results),
+        'throughput': len(results) / elapsed,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'max': max(latencies),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print the change against a baseline run and return the regressions"""
+    previous = {(result['mode'], result['sessions']): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get((result['mode'], result['sessions']))
+        if old is None:
+            continue
+        p95_change = result['p95'] / old['p95'] - 1
+        throughput_change = result['throughput'] / old['throughput'] - 1
+        name = f"{result['mode']} x{result['sessions']}"
+        print(f"{name:<14} p95 {p95_change:+.1%}, throughput {throughput_change:+.1%}")
+        if p95_change > tolerance or throughput_change < -tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated subset of " + ", ".join(MODES))
+    parser.add_argument("--sessions", default="1,8", help="comma-separated concurrent session counts")
+    parser.add_argument("--requests", type=int, default=10, help="requests per session")
+    parser.add_argument("--wiki-latency", type=float, default=0.1)
+    parser.add_argument("--wiki-jitter", type=float, default=0.05)
+    parser.add_argument("--wiki-error-rate", type=float, default=0.0)
+    parser.add_argument("--wiki-sentences", type=int, default=5, help="sentences per Wikipedia extract")
+    parser.add_argument("--model-latency", type=float, default=0.3, help="seconds to the first token")
+    parser.add_argument("--seconds-per-char", type=float, default=0.0002)
+    parser.add_argument("--model-error-rate", type=float, default=0.0)
+    parser.add_argument("--response-items", type=int, default=8, help="timeline events or news items per response")
+    parser.add_argument("--reply-chars", type=int, default=300, help="length of a chat reply")
+    parser.add_argument("--rate-limit", type=float, default=1000.0, help="model calls per second")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression for --compare")
+    args = parser.parse_args()
+
+    modes = [mode for mode in args.modes.split(",") if mode]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+    session_counts = [int(count) for count in args.sessions.split(",")]
+
+    results = []
+    with WikipediaStubServer(latency=args.wiki_latency, jitter=args.wiki_jitter, error_rate=args.wiki_error_rate,
+                             extract_sentences=args.wiki_sentences) as stub:
+        fetcher = WikipediaFetcher(base_url=stub.base_url, max_workers=32)
+        model = make_model(args)
+        for mode in modes:
+            for sessions in session_counts:
+                result = run(mode, sessions, args, model, fetcher)
+                results.append(result)
+                print(f"{mode:<9} x{sessions:<3} {result['throughput']:>6.2f} req/s  p50 {result['p50']:.2f}s "
+                      f"p95 {result['p95']:.2f}s p99 {result['p99']:.2f}s  errors {result['errors']}/{result['requests']}")
+        fetcher.close()
+
+    report = {
+        'time': time.time(),
+        'python': platform.python_version(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'tolerance')},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Measure the cost of instrumentation and show what the metrics endpoint exports
+
+Times a bare span with metrics off and on, then runs the full pipeline
+(term extraction, offline Wikipedia lookups, prompt build, a stub model
+with no latency, JSON parsing) with metrics off and on, so the
+instrumentation is the only difference. Finally serves the metrics on a
+local port and scrapes both export formats.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_metrics
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import requests
+
+from benchmarks.bench_offline_wiki import FIXTURE_DUMP, FIXTURE_REDIRECTS
+from benchmarks.stubs import FakeModel, make_time_machine
+from metrics import Metrics
+from wiki_offline import OfflineWikipedia, build_index
+
+QUESTIONS = [
+    "What if Napoleon won at Waterloo?",
+    "What if the Library of Alexandria never burned down?",
+    "What if the Roman Empire never fell?",
+    "What if Cleopatra defeated Octavian?",
+]
+
+
+def time_spans(metrics, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        with metrics.span('bench'):
+            pass
+    return (time.perf_counter() - start) / count * 1e9
+
+
+def time_pipeline(metrics, wiki, requests_count):
+    time_machine = make_time_machine(FakeModel(first_token_latency=0.0, seconds_per_char=0.0), wiki,
+                                     title_index=wiki, metrics=metrics)
+
+    start = time.perf_counter()
+    for i in range(requests_count):
+        question = QUESTIONS[i % len(QUESTIONS)]
+        context_data = time_machine.fetch_wikipedia_context(question)
+        time_machine.generate_timeline(question, context_data)
+    return (time.perf_counter() - start) / requests_count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--spans", type=int, default=200000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    off, on = Metrics(enabled=False), Metrics(enabled=True)
+    print(f"span:     off {time_spans(off, args.spans):.0f}ns, on {time_spans(on, args.spans):.0f}ns")
+
+    with tempfile.TemporaryDirectory() as directory:
+        index_path = os.path.join(directory, "wiki.idx")
+        build_index(FIXTURE_DUMP, index_path, FIXTURE_REDIRECTS)
+        wiki = OfflineWikipedia(index_path)
+
+        # Warm up imports and caches before timing
+        time_pipeline(Metrics(enabled=False), wiki, 50)
+        baseline = time_pipeline(off, wiki, args.requests)
+        instrumented = time_pipeline(on, wiki, args.requests)
+        print(f"pipeline: off {baseline:.0f}us, on {instrumented:.0f}us per request "
+              f"({(instrumented - baseline) / baseline:+.1%}) with a zero-latency model")
+        wiki.close()
+
+    server = on.serve(0)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    prometheus = requests.get(f"{base}/metrics", timeout=5).text
+    json_lines = requests.get(f"{base}/metrics.jsonl", timeout=5).text.splitlines()
+    server.shutdown()
+    samples = [line for line in prometheus.splitlines() if line and not line.startswith("#")]
+    print(f"scraped {len(samples)} Prometheus samples and {len(json_lines)} JSON lines, e.g.:")
+    for line in samples:
+        if line.startswith(("time_machine_stage_seconds_count", "time_machine_gemini_tokens_total",
+                            "time_machine_parse_failure_rate")):
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Microbenchmark title lookups in the offline Wikipedia index
+
+Builds an index from the fixture dump in benchmarks/fixtures (or, with
+--pages, from a synthetic dump of that many pages) and times single
+lookups for hits, redirects and misses, then the three-term fetch_all the
+app makes per question against the REST fetcher on a local stub server.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_offline_wiki
+    python -m benchmarks.bench_offline_wiki --pages 500000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.stubs import WikipediaStubServer
+from wiki_context import WikipediaFetcher
+from wiki_offline import OfflineWikipedia, build_index
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURE_DUMP = os.path.join(FIXTURES, "enwiki-abstract-sample.xml")
+FIXTURE_REDIRECTS = os.path.join(FIXTURES, "enwiki-redirects-sample.tsv")
+FIXTURE_TERMS = ["Napoleon", "napoleon bonaparte", "Waterloo", "Octavian", "Carthage", "Dinosaurs", "Alexandria"]
+
+
+def resident_kib():
+    """(private, file-backed) resident memory in KiB, from /proc on Linux
+
+    Mapped index pages count as file-backed: they are shared between
+    processes and the kernel can drop them under memory pressure.
+    """
+    sizes = {}
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith(("RssAnon:", "RssFile:")):
+                    name, value = line.split()[:2]
+                    sizes[name] = int(value)
+    except OSError:
+        pass
+    return sizes.get("RssAnon:", 0), sizes.get("RssFile:", 0)
+
+
+def write_synthetic_dump(path, pages):
+    with open(path, "w", encoding="utf-8") as dump:
+        dump.write("<feed>\n")
+        for i in range(pages):
+            dump.write(f"<doc>\n<title>Wikipedia: Synthetic Page {i}</title>\n"
+                       f"<abstract>Synthetic Page {i} describes an event first recorded in {1000 + i % 1000}. "
+                       f"{'It is padded to a realistic abstract length. ' * 4}</abstract>\n</doc>\n")
+        dump.write("</feed>\n")
+
+
+def time_lookups(wiki, terms, rounds):
+    timings = []
+    for _ in range(rounds):
+        for term in terms:
+            start = time.perf_counter()
+            wiki.fetch_summary(term)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    return statistics.median(timings) * 1e6, timings[int(len(timings) * 0.99)] * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=0, help="use a synthetic dump of this many pages")
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.15, help="stub REST API latency in seconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        index_path = os.path.join(directory, "wiki.idx")
+        if args.pages:
+            dump_path = os.path.join(directory, "dump.xml")
+            write_synthetic_dump(dump_path, args.pages)
+            redirects_path = None
+            hits = [f"synthetic page {random.randrange(args.pages)}" for _ in range(1000)]
+        else:
+            dump_path, redirects_path = FIXTURE_DUMP, FIXTURE_REDIRECTS
+            hits = FIXTURE_TERMS
+
+        start = time.perf_counter()
+        articles, redirects = build_index(dump_path, index_path, redirects_path)
+        print(f"build: {articles} articles, {redirects} redirects in {time.perf_counter() - start:.2f}s, "
+              f"index {os.path.getsize(index_path) / 1024:.0f} KiB")
+
+        rss_before = resident_kib()
+        wiki = OfflineWikipedia(index_path)
+        rounds = max(1, args.lookups // len(hits))
+        p50, p99 = time_lookups(wiki, hits, rounds)
+        print(f"hits:   p50 {p50:.1f}us p99 {p99:.1f}us")
+        p50, p99 = time_lookups(wiki, [f"Missing Title {i}" for i in range(1000)], max(1, args.lookups // 1000))
+        print(f"misses: p50 {p50:.1f}us p99 {p99:.1f}us")
+        rss_after = resident_kib()
+        print(f"after {args.lookups * 2} lookups resident memory grew {rss_after[0] - rss_before[0]} KiB private, "
+              f"{rss_after[1] - rss_before[1]} KiB file-backed")
+
+        terms = hits[:3]
+        start = time.perf_counter()
+        wiki.fetch_all(terms)
+        offline = time.perf_counter() - start
+        wiki.close()
+
+        with WikipediaStubServer(latency=args.latency) as stub:
+            fetcher = WikipediaFetcher(base_url=stub.base_url)
+            start = time.perf_counter()
+            fetcher.fetch_all(terms)
+            rest = time.perf_counter() - start
+            fetcher.close()
+        print(f"fetch_all of {len(terms)} terms: offline {offline * 1000:.2f}ms, REST stub {rest * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Measure an example click with and without pre-warming
+
+"cold" is what a click on a sidebar example cost before: a Wikipedia
+fetch and a Gemini generation through the job queue. "warm" is the
+lookup the app now does first. Also times Warmer.start(), which the
+first page render waits on, and how long a restarted process takes to
+have every result back from SQLite.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_prewarm
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from app import EXAMPLE_QUESTIONS, TimeMachine
+from benchmarks import stubs
+from benchmarks.stubs import FakeModel, WikipediaStubServer
+from jobs import JobQueue
+from prewarm import Warmer
+from wiki_context import WikipediaFetcher
+
+
+def make_time_machine(stub):
+    model = FakeModel(first_token_latency=0.8, seconds_per_char=0.0005)
+    return stubs.make_time_machine(model, WikipediaFetcher(base_url=stub.base_url))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wiki-latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    with WikipediaStubServer(latency=args.wiki_latency) as stub, tempfile.TemporaryDirectory() as directory:
+        time_machine = make_time_machine(stub)
+        queue = JobQueue()
+
+        def generate(question, mode):
+            job = queue.submit((question, mode), time_machine.run_generation_job, question, mode)
+            job.future.result()
+            return job.result
+
+        cold = []
+        for question in EXAMPLE_QUESTIONS:
+            start = time.perf_counter()
+            generate(question, 'timeline')
+            cold.append(time.perf_counter() - start)
+
+        path = os.path.join(directory, "warm.sqlite3")
+        warmer = Warmer(EXAMPLE_QUESTIONS, path=path, prompt_version=TimeMachine.PROMPT_VERSION)
+        start = time.perf_counter()
+        warmer.start(generate)
+        started = time.perf_counter() - start
+        while warmer.stats()['warm'] < warmer.stats()['wanted']:
+            time.sleep(0.05)
+        warmed_in = time.perf_counter() - start
+        warmer.stop()
+
+        warm = []
+        for question in EXAMPLE_QUESTIONS:
+            start = time.perf_counter()
+            warmer.get(question, 'timeline')
+            warm.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        restarted = Warmer(EXAMPLE_QUESTIONS, path=path, prompt_version=TimeMachine.PROMPT_VERSION)
+        reloaded = time.perf_counter() - start
+
+    print(f"cold click:    {statistics.mean(cold) * 1000:8.1f}ms")
+    print(f"warm click:    {statistics.mean(warm) * 1000:8.3f}ms")
+    print(f"start():       {started * 1000:8.3f}ms, all {warmer.stats()['wanted']} results warm after {warmed_in:.1f}s")
+    print(f"after restart: {restarted.stats()['warm']} results loaded from SQLite in {reloaded * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Measure paraphrase recall and lookup latency of the question index
+
+Run from the repository root:
+
+    python -m benchmarks.bench_question_index --stored 100000 --queries 2000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from question_index import QuestionIndex
+
+SUBJECTS = [
+    "Napoleon", "the Roman Empire", "the Library of Alexandria", "Cleopatra", "the Ottoman Empire",
+    "Genghis Khan", "the Aztec Empire", "Queen Victoria", "the Confederacy", "the Spanish Armada",
+    "Hannibal", "the Byzantine Empire", "Julius Caesar", "the Mongol fleet", "Alexander the Great"
+]
+EVENTS = [
+    ("won", "at"), ("lost", "at"), ("fell", "in"), ("survived", "in"), ("invaded", ""),
+    ("conquered", ""), ("discovered", ""), ("burned", "in"), ("signed a treaty with", ""), ("allied with", "")
+]
+
+# Paraphrase templates: (subject, past verb, preposition, object) -> question
+PARAPHRASES = [
+    lambda s, v, p, o: f"What if {s} {v} {p} {o}?",
+    lambda s, v, p, o: f"what if {s.lower()} had {v} {o}",
+    lambda s, v, p, o: f"{s} {v} {o} - what then?",
+    lambda s, v, p, o: f"What would have happened if {s} {v} {p} {o}?",
+    lambda s, v, p, o: f"  WHAT IF {s.upper()} {v.upper()} {o.upper()}!!"
+]
+
+# Questions that differ only in a year or a number must never share a result
+DATED = [
+    ("What if the internet was invented in the {}s?", 1800, (1500, 1900)),
+    ("What if the internet was invented in {}?", 1990, (2050, 1890)),
+    ("What if Germany won WW{}?", 1, (2,)),
+    ("What if Rome became a republic again in {} BC?", 44, (27, 133))
+]
+
+# Nor may a question and its negation or opposite outcome, however long the rest of it
+OPPOSITES = [
+    ("What if the Library of Alexandria never burned down?", "What if the Library of Alexandria burned down?"),
+    ("What if the Roman Empire never fell?", "What if the Roman Empire fell?"),
+    ("What if Napoleon won the Battle of Waterloo against Wellington and Blucher near Brussels in Belgium?",
+     "What if Napoleon lost the Battle of Waterloo against Wellington and Blucher near Brussels in Belgium?"),
+    ("What if Hannibal won the Second Punic War against Rome and Scipio at Zama in Africa?",
+     "What if Hannibal lost the Second Punic War against Rome and Scipio at Zama in Africa?"),
+    ("What if the Spanish Armada succeeded in invading England under Philip the Second of Spain?",
+     "What if the Spanish Armada failed in invading England under Philip the Second of Spain?")
+]
+
+
+def synthetic_objects(count, rng):
+    """Made-up place and people names so the stored corpus is mostly unique"""
+    syllables = ["ka", "lo", "mer", "tan", "vi", "dor", "sul", "ren", "ba", "quo", "zim", "ath"]
+    names = set()
+    while len(names) < count:
+        names.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))).title())
+    return sorted(names)
+
+
+def scenario(rng, objects):
+    subject = rng.choice(SUBJECTS)
+    verb, prep = rng.choice(EVENTS)
+    return subject, verb, prep, " and ".join(rng.sample(objects, rng.randint(1, 2)))
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stored", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    objects = synthetic_objects(max(1000, args.stored // 10), rng)
+    index = QuestionIndex(threshold=args.threshold, max_entries=args.stored)
+
+    scenarios = {}
+    start = time.perf_counter()
+    while len(scenarios) < args.stored:
+        parts = scenario(rng, objects)
+        key = f"result-{len(scenarios)}"
+        if parts not in scenarios:
+            scenarios[parts] = key
+            index.add(PARAPHRASES[0](*parts), 'timeline', key)
+    build_seconds = time.perf_counter() - start
+
+    stored = list(scenarios.items())
+    correct = wrong = 0
+    latencies = []
+    for _ in range(args.queries):
+        parts, key = rng.choice(stored)
+        question = rng.choice(PARAPHRASES[1:])(*parts)
+        start = time.perf_counter()
+        found = index.lookup(question, 'timeline')
+        latencies.append(time.perf_counter() - start)
+        if found == key:
+            correct += 1
+        elif found is not None:
+            wrong += 1
+
+    # Unseen scenarios should only match when they nearly contain a stored one
+    false_matches = 0
+    for _ in range(args.queries):
+        parts = scenario(rng, objects)
+        if parts in scenarios:
+            continue
+        start = time.perf_counter()
+        found = index.lookup(PARAPHRASES[0](*parts), 'timeline')
+        latencies.append(time.perf_counter() - start)
+        if found is not None:
+            false_matches += 1
+
+    # Asked again with a different year or number, or turned around: a different question, never a match
+    dated_matches = dated_queries = 0
+    for template, stored_number, other_numbers in DATED:
+        index.add(template.format(stored_number), 'timeline', f"dated-{stored_number}")
+        for number in other_numbers:
+            dated_queries += 1
+            if index.lookup(template.format(number), 'timeline') is not None:
+                dated_matches += 1
+    opposite_matches = 0
+    for number, (stored_question, opposite) in enumerate(OPPOSITES):
+        index.add(stored_question, 'timeline', f"opposite-{number}")
+        if index.lookup(opposite, 'timeline') is not None:
+            opposite_matches += 1
+
+    print(f"stored={len(index._entries)} build={build_seconds:.1f}s threshold={args.threshold}")
+    print(f"paraphrase recall   {correct / args.queries:6.1%}  (wrong match {wrong / args.queries:.1%})")
+    print(f"unseen matched      {false_matches / args.queries:6.1%}")
+    print(f"other year matched  {dated_matches / dated_queries:6.1%}  ({dated_queries} questions)")
+    print(f"opposite matched    {opposite_matches / len(OPPOSITES):6.1%}  ({len(OPPOSITES)} questions)")
+    print(f"lookup p50 {statistics.median(latencies) * 1e6:7.1f} us")
+    print(f"lookup p99 {percentile(latencies, 99) * 1e6:7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
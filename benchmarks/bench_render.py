@@ -0,0 +1,97 @@
+"""Measure rerun time and elements sent for a long chat, per message and batched
+
+Reruns a page showing a 500-message chat with Streamlit's AppTest and
+counts the markdown elements (one websocket delta each) and the HTML
+bytes they carry. "per message" is the old rendering, one st.markdown per
+message with the stylesheet inline; "last 20" is the same with the
+window the chat view used before; "batched" is the current rendering,
+one memoized fragment per page of messages and a link to the
+stylesheet.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_render --messages 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import sys
+sys.path.insert(0, {root!r})
+import streamlit as st
+from benchmarks.bench_render import make_messages, old_chat_message_html
+from render import chat_html, chat_page, page_style_html
+
+messages = make_messages({messages})
+variant = {variant!r}
+st.markdown(page_style_html(static_serving=variant == 'batched'), unsafe_allow_html=True)
+if variant == 'batched':
+    st.markdown(chat_html(chat_page(messages, 20), "⚔️ Napoleon Bonaparte"), unsafe_allow_html=True)
+else:
+    shown = messages if variant == 'per message' else messages[-20:]
+    for message in shown:
+        st.markdown(old_chat_message_html(message, "⚔️ Napoleon Bonaparte"), unsafe_allow_html=True)
+"""
+
+_messages = {}
+
+
+def make_messages(count):
+    if count not in _messages:
+        messages = []
+        for i in range(count // 2):
+            messages.append({'role': 'user', 'content': f"Question {i}: how did the new borders change your plans?"})
+            messages.append({'role': 'assistant', 'content': f"Answer {i}: " + "The coalition never recovered, and I turned to the east. " * 4})
+        _messages[count] = messages
+    return _messages[count]
+
+
+def old_chat_message_html(message, figure_label):
+    """The chat bubble as it was rendered before, unescaped and one element per message"""
+    if message['role'] == 'user':
+        return f"""
+        <div class="chat-message" style="margin-left: 2rem;">
+            <strong>🧑 You:</strong> {message['content']}
+        </div>
+        """
+    return f"""
+    <div class="chat-message">
+        <strong>{figure_label}:</strong> {message['content']}
+    </div>
+    """
+
+
+def run(variant, args):
+    at = AppTest.from_string(SCRIPT.format(root=ROOT, messages=args.messages, variant=variant), default_timeout=60)
+    at.run()
+    timings = []
+    for _ in range(args.reruns):
+        start = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - start)
+    elements = list(at.markdown)
+    sent = sum(len(element.value.encode()) for element in elements)
+    print(f"{variant:<12} {len(elements):>4} elements, {sent / 1024:7.1f} KiB per rerun, "
+          f"rerun {statistics.median(timings) * 1000:6.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--reruns", type=int, default=20)
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    for variant in ("per message", "last 20", "batched"):
+        run(variant, args)
+
+
+if __name__ == "__main__":
+    main()
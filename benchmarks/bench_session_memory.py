@@ -0,0 +1,147 @@
+"""Measure server memory for many sessions with per-session copies and with the shared store
+
+Simulates --sessions users. Each has generated a timeline, a newsfeed
+and their Wikipedia context for one of --questions what-if questions,
+with popular questions asked far more often than the rest. Some have
+also chatted at length. "per-session" keeps everything in each session's
+state, as before: its own copy of every result, an unbounded chat
+history and its own TimeMachine. "shared store" puts results in the
+SessionStore and chats in capped ChatSessions. "after idle sweep" is the
+shared store once the sessions that went idle have been evicted.
+Memory is measured with tracemalloc.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_session_memory --sessions 1000
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+
+from benchmarks.stubs import fake_extract, fake_newsfeed, fake_timeline, make_time_machine
+from chat_session import ChatSession
+from session_store import SessionStore
+
+REPLY = "In this world my campaigns took a very different turn, and the consequences reached every court in Europe. " * 3
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_payloads(questions):
+    """JSON as the result cache returns it; every json.loads is a fresh copy, as for a cache hit"""
+    payloads = []
+    for i in range(questions):
+        question = f"What if event {i} had gone the other way?"
+        timeline = fake_timeline(8)
+        timeline['summary'] = f"How the world changes after: {question}"
+        context = [{'title': f"Topic {i}-{j}", 'extract': fake_extract(f"Topic {i}-{j}", 8), 'year': 1815}
+                   for j in range(3)]
+        payloads.append((question, json.dumps(timeline), json.dumps(fake_newsfeed(7)), json.dumps(context)))
+    return payloads
+
+
+def plan_sessions(args, rng):
+    """(question index, chat turns, goes idle) for each simulated session"""
+    weights = [1 / (rank + 1) for rank in range(args.questions)]
+    plans = []
+    for _ in range(args.sessions):
+        question = rng.choices(range(args.questions), weights)[0]
+        turns = rng.randint(20, 80) if rng.random() < args.chat_share else 0
+        plans.append((question, turns, rng.random() < args.idle_share))
+    return plans
+
+
+def per_session(plans, payloads, shared):
+    states = []
+    for question, turns, _ in plans:
+        text, timeline, newsfeed, context = payloads[question]
+        history = []
+        for turn in range(turns):
+            history.append({'role': 'user', 'content': f"Question number {turn} about your life?"})
+            history.append({'role': 'assistant', 'content': REPLY})
+        states.append({
+            # Each session's TimeMachine referred to the same caches and client
+            'time_machine': make_time_machine(result_cache=shared.result_cache, question_index=shared.question_index,
+                                              metrics=shared.metrics),
+            'current_question': text,
+            'timeline_data': json.loads(timeline),
+            'newsfeed_data': json.loads(newsfeed),
+            'context_data': json.loads(context),
+            'chat_history': history
+        })
+    return states
+
+
+def shared_store(plans, payloads, clock):
+    store = SessionStore(idle_seconds=1800, sweep_interval=60, clock=clock)
+    states = []
+    for number, (question, turns, _) in enumerate(plans):
+        session_id = f"session-{number}"
+        text, timeline, newsfeed, context = payloads[question]
+        store.put(session_id, 'timeline', json.loads(timeline))
+        store.put(session_id, 'newsfeed', json.loads(newsfeed))
+        store.put(session_id, 'context', json.loads(context))
+        if turns:
+            chat = store.private(session_id, 'chat', dict)
+            chat['sessions'] = {'Napoleon Bonaparte': ChatSession('Napoleon Bonaparte', text)}
+            for turn in range(turns):
+                chat['sessions']['Napoleon Bonaparte'].record(f"Question number {turn} about your life?", REPLY)
+        states.append({'session_id': session_id, 'current_question': text})
+    return store, states
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--questions", type=int, default=100, help="distinct questions asked")
+    parser.add_argument("--chat-share", type=float, default=0.3, help="share of sessions that chatted")
+    parser.add_argument("--idle-share", type=float, default=0.6, help="share of sessions that went idle")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    payloads = make_payloads(args.questions)
+    plans = plan_sessions(args, rng)
+    # Create the caches every session shares outside the measurement
+    shared = make_time_machine()
+
+    tracemalloc.start()
+    states = per_session(plans, payloads, shared)
+    before = tracemalloc.get_traced_memory()[0]
+    del states
+    gc.collect()
+
+    start = tracemalloc.get_traced_memory()[0]
+    clock = FakeClock()
+    store, states = shared_store(plans, payloads, clock)
+    after = tracemalloc.get_traced_memory()[0] - start
+
+    # Active sessions rerun after 25 minutes; idle ones never come back and are swept at 40
+    clock.now = 1500
+    for (_, _, idle), state in zip(plans, states):
+        if not idle:
+            store.get(state['session_id'], 'timeline')
+    clock.now = 2400
+    store.evict_idle()
+    gc.collect()
+    swept = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+
+    stats = store.stats()
+    print(f"{args.sessions} sessions, {args.questions} questions")
+    print(f"per-session:      {before / 2 ** 20:6.1f} MiB ({before / args.sessions / 1024:5.1f} KiB per session)")
+    print(f"shared store:     {after / 2 ** 20:6.1f} MiB ({after / args.sessions / 1024:5.1f} KiB per session)")
+    print(f"after idle sweep: {swept / 2 ** 20:6.1f} MiB, {stats['sessions']} sessions and "
+          f"{stats['values']} values left, {stats['evicted_sessions']} sessions evicted")
+
+
+if __name__ == "__main__":
+    main()
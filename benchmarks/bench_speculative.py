@@ -0,0 +1,70 @@
+"""Compare wall-clock time for two serial generations with one speculative click
+
+"serial" is the old flow: generate a timeline, switch mode, generate a
+newsfeed, each paying for its own context fetch. "speculative" submits one
+job that fetches context once and runs both modes concurrently.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_speculative --rounds 3
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks import stubs
+from benchmarks.stubs import FakeModel, WikipediaStubServer
+from jobs import JobQueue
+from result_cache import ResultCache, normalize_question
+from wiki_context import WikipediaFetcher
+
+QUESTION = "What if Napoleon won at Waterloo?"
+
+
+def make_time_machine(stub):
+    model = FakeModel(first_token_latency=0.5, seconds_per_char=0.0003)
+    return stubs.make_time_machine(model, WikipediaFetcher(base_url=stub.base_url), result_cache=ResultCache(path=None))
+
+
+def serial(time_machine):
+    start = time.perf_counter()
+    time_machine.generate_timeline(QUESTION, time_machine.fetch_wikipedia_context(QUESTION))
+    time_machine.generate_newsfeed(QUESTION, time_machine.fetch_wikipedia_context(QUESTION))
+    return time.perf_counter() - start
+
+
+def speculative(time_machine):
+    queue = JobQueue(max_workers=4)
+    start = time.perf_counter()
+    job = queue.submit((normalize_question(QUESTION), 'timeline'), time_machine.run_generation_job, QUESTION, 'timeline', speculative=True)
+    first = None
+    while True:
+        jobs = [job] + [queue.get(job_id) for job_id in job.spawned.values()]
+        if job.done and first is None:
+            first = time.perf_counter() - start
+        if len(jobs) == 2 and all(j.done for j in jobs):
+            return first, time.perf_counter() - start
+        time.sleep(0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--wiki-latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    with WikipediaStubServer(latency=args.wiki_latency) as stub:
+        serial_times, first_times, both_times = [], [], []
+        for _ in range(args.rounds):
+            serial_times.append(serial(make_time_machine(stub)))
+            first, both = speculative(make_time_machine(stub))
+            first_times.append(first)
+            both_times.append(both)
+
+    print(f"serial timeline + newsfeed      {statistics.median(serial_times) * 1000:7.0f} ms")
+    print(f"speculative: first mode ready   {statistics.median(first_times) * 1000:7.0f} ms")
+    print(f"speculative: both modes ready   {statistics.median(both_times) * 1000:7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
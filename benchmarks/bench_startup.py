@@ -0,0 +1,56 @@
+"""Measure import time and first-render time with and without the Gemini SDK loaded up front
+
+Each measurement runs in a fresh interpreter so module caches do not hide
+the cost. "eager" imports google.generativeai before the app script runs,
+which is what app.py used to do at import time.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup --rounds 3
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MEASURE = r"""
+import json, time
+start = time.perf_counter()
+if {eager}:
+    import google.generativeai
+sdk = time.perf_counter() - start
+
+from streamlit.testing.v1 import AppTest
+render_start = time.perf_counter()
+AppTest.from_file("app.py", default_timeout=60).run()
+render = time.perf_counter() - render_start
+
+print(json.dumps({{"sdk_import": sdk, "first_render": render, "total": time.perf_counter() - start}}))
+"""
+
+
+def measure(eager):
+    output = subprocess.run(
+        [sys.executable, "-c", MEASURE.format(eager=eager)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    for label, eager in (("eager SDK import", True), ("lazy SDK import ", False)):
+        runs = [measure(eager) for _ in range(args.rounds)]
+        sdk = statistics.median(run["sdk_import"] for run in runs)
+        render = statistics.median(run["first_render"] for run in runs)
+        total = statistics.median(run["total"] for run in runs)
+        print(f"{label}: sdk import {sdk * 1000:7.1f} ms   first render {render * 1000:7.1f} ms   "
+              f"time to first paint {total * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
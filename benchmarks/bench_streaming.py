@@ -0,0 +1,49 @@
+"""Compare time-to-first-event for blocking and streaming generation
+
+Run from the repository root:
+
+    python -m benchmarks.bench_streaming
+"""
+import argparse
+import time
+
+from benchmarks.stubs import FakeModel, make_time_machine
+
+
+def run(time_machine, mode, stream):
+    start = time.perf_counter()
+    first = []
+
+    def on_item(item):
+        if not first:
+            first.append(time.perf_counter() - start)
+
+    if mode == 'timeline':
+        result = time_machine.generate_timeline("What if Napoleon won at Waterloo?", [], on_event=on_item if stream else None)
+        count = len(result['timeline'])
+    else:
+        result = time_machine.generate_newsfeed("What if Napoleon won at Waterloo?", [], on_item=on_item if stream else None)
+        count = len(result['news_items'])
+
+    total = time.perf_counter() - start
+    return (first[0] if first else total), total, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--seconds-per-char", type=float, default=0.0005)
+    args = parser.parse_args()
+
+    model = FakeModel(args.first_token_latency, args.seconds_per_char)
+
+    for mode in ('timeline', 'newsfeed'):
+        for stream in (False, True):
+            # A fresh instance per run, with nothing cached, so every call reaches the model
+            first, total, count = run(make_time_machine(model), mode, stream)
+            label = "streaming" if stream else "blocking "
+            print(f"{mode:9} {label} first item {first * 1000:7.1f} ms   complete {total * 1000:7.1f} ms   items {count}")
+
+
+if __name__ == "__main__":
+    main()
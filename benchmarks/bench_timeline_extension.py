@@ -0,0 +1,107 @@
+"""Measure the tokens a follow-up costs against regenerating the whole timeline
+
+"regenerate" asks for a fresh 7-10 event timeline with Wikipedia
+context, the only way to go deeper before. "extend" asks for four events
+after the last year and "drill down" for four sub-events of one event;
+both send a digest of the current timeline instead. Token counts are
+estimated the way the stub model reports usage (four characters a token).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_timeline_extension
+"""
+import argparse
+import json
+import re
+
+from benchmarks.stubs import FakeModel, fake_extract, make_time_machine
+from chat_session import estimate_tokens
+from timeline_extension import event_year
+
+QUESTION = "What if Napoleon won at Waterloo?"
+
+# How the model writes dates, and the year each must sort under
+DATED_FORMATS = {
+    "1815": 1815, "c. 1820": 1820, "1820s": 1820, "June 18, 1815": 1815, "18 June 1815": 1815,
+    "15 March 44 BC": -44, "44 BC": -44, "Year 5": 5, "1815-1820": 1815
+}
+
+CONTEXT = [
+    {'title': title, 'extract': fake_extract(title, 8), 'year': 1815}
+    for title in ("Napoleon", "Battle of Waterloo", "Seventh Coalition")
+]
+
+
+def make_events(start, count, step, label, date="{}"):
+    return [
+        {
+            "year": date.format(start + i * step),
+            "event": f"{label} {i + 1}: the new order reshapes alliances and trade across the continent",
+            "impact": "Borders, markets and dynasties shift in response to the change",
+            "probability": ["High", "Medium", "Low"][i % 3]
+        }
+        for i in range(count)
+    ]
+
+
+def respond(prompt):
+    """A timeline, an extension after the year asked for, or sub-events, as the prompt wants"""
+    if '"sub_events"' in prompt:
+        start = int(re.search(r'between (\d+)', prompt).group(1))
+        data = {"sub_events": make_events(start + 1, 4, 1, "Sub-event", date="18 June {}")}
+    elif 'happen after' in prompt:
+        start = int(re.search(r'happen after (\d+)', prompt).group(1))
+        data = {"timeline": make_events(start + 5, 4, 6, "Later event", date="June 18, {}")}
+    else:
+        data = {"timeline": make_events(1816, 9, 6, "Event"), "summary": "Europe under a lasting French peace"}
+    return json.dumps(data)
+
+
+class CountingModel(FakeModel):
+    def __init__(self):
+        super().__init__(first_token_latency=0.0, seconds_per_char=0.0, respond=self.count)
+        self.output_tokens = 0
+
+    def count(self, prompt):
+        text = respond(prompt)
+        self.output_tokens += estimate_tokens(text)
+        return text
+
+
+def step(time_machine, name, action):
+    model = time_machine.model
+    prompt_before, output_before = model.prompt_tokens, model.output_tokens
+    result = action()
+    prompt, output = model.prompt_tokens - prompt_before, model.output_tokens - output_before
+    return name, prompt, output, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    time_machine = make_time_machine(CountingModel())
+
+    rows = []
+    rows.append(step(time_machine, "regenerate", lambda: time_machine.generate_timeline(QUESTION, CONTEXT)))
+    timeline = rows[-1][3]
+    rows.append(step(time_machine, "extend", lambda: time_machine.extend_timeline(QUESTION, timeline)))
+    extended = rows[-1][3]
+    rows.append(step(time_machine, "drill down", lambda: time_machine.drill_down_event(QUESTION, extended, 2)))
+    drilled = rows[-1][3]
+
+    full = rows[0][1] + rows[0][2]
+    for name, prompt, output, _ in rows:
+        print(f"{name:<11} prompt {prompt:>4} + output {output:>4} = {prompt + output:>4} tokens "
+              f"({(prompt + output) / full:.0%} of a regeneration)")
+
+    years = [event_year(event['year']) for event in drilled['timeline']]
+    sub_years = [event_year(event['year']) for event in drilled['timeline'][2].get('sub_events', [])]
+    print(f"{len(extended['timeline'])} events after extending, years in order: {years == sorted(years)}; "
+          f"event 3 has {len(sub_years)} sub-events, in order: {sub_years == sorted(sub_years)} {sub_years}")
+    read = sum(event_year(text) == year for text, year in DATED_FORMATS.items())
+    print(f"dated formats read as the right year: {read}/{len(DATED_FORMATS)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Compare serial and concurrent Wikipedia context fetching against a local stub
+
+Run from the repository root:
+
+    python -m benchmarks.bench_wiki_fetch --latency 0.3 --rounds 5
+"""
+import argparse
+import statistics
+import time
+
+import requests
+
+from benchmarks.stubs import WikipediaStubServer
+from wiki_context import WikipediaFetcher
+
+TERMS = ["Library", "Alexandria", "Burned"]
+
+
+def fetch_serial(base_url, terms):
+    """The original approach: one fresh connection and a 5s timeout per term"""
+    results = []
+    for term in terms:
+        response = requests.get(f"{base_url}{term}", timeout=5)
+        results.append(response.json() if response.status_code == 200 else None)
+    return results
+
+
+def time_rounds(fn, rounds):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.3, help="stub latency per request in seconds")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with WikipediaStubServer(latency=args.latency) as stub:
+        fetcher = WikipediaFetcher(base_url=stub.base_url)
+        serial = time_rounds(lambda: fetch_serial(stub.base_url, TERMS), args.rounds)
+        concurrent = time_rounds(lambda: fetcher.fetch_all(TERMS), args.rounds)
+        fetcher.close()
+
+    serial_median = statistics.median(serial)
+    concurrent_median = statistics.median(concurrent)
+    print(f"terms={len(TERMS)} latency={args.latency:.3f}s rounds={args.rounds}")
+    print(f"serial     median {serial_median * 1000:8.1f} ms")
+    print(f"concurrent median {concurrent_median * 1000:8.1f} ms")
+    print(f"speedup    {serial_median / concurrent_median:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
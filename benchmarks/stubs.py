@@ -0,0 +1,225 @@
+"""Local stand-ins for the external services the Time Machine talks to"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import unquote
+
+
+class WikipediaStubServer:
+    """Serve /page/summary/<Term> locally with configurable latency
+
+    A fraction `stall_rate` of requests take an extra `stall_seconds`, like
+    a connection stuck behind a slow upstream, and a fraction `error_rate`
+    answer 503. Extracts are `extract_sentences` sentences long.
+    """
+
+    def __init__(self, latency=0.2, jitter=0.0, missing=(), port=0, stall_rate=0.0, stall_seconds=3.0,
+                 error_rate=0.0, extract_sentences=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.extract_sentences = extract_sentences
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.missing = {term.lower() for term in missing}
+        self.requests_served = 0
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.requests_served += 1
+                delay = stub.latency + random.uniform(0, stub.jitter)
+                if stub.stall_rate and random.random() < stub.stall_rate:
+                    delay += stub.stall_seconds
+                time.sleep(delay)
+
+                term = unquote(self.path.rsplit('/', 1)[-1])
+                if term.lower() in stub.missing or (stub.error_rate and random.random() < stub.error_rate):
+                    self.send_response(404 if term.lower() in stub.missing else 503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                body = json.dumps({'title': term, 'extract': fake_extract(term, stub.extract_sentences)}).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up waiting, e.g. after a hedged request won
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/page/summary/"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def fake_extract(term, sentences=1):
+    first = f"{term} is a subject of historical interest first recorded in 1815."
+    more = [f"Accounts from {1700 + i * 13} describe how {term} shaped the politics and trade of the region."
+            for i in range(sentences - 1)]
+    return " ".join([first] + more)
+
+
+def fake_timeline(events=8):
+    return {
+        "timeline": [
+            {
+                "year": str(1816 + i * 7),
+                "event": f"Event {i + 1} unfolds across the continent as the new order settles in",
+                "impact": "Trade routes, alliances and borders shift in response to the change",
+                "probability": ["High", "Medium", "Low"][i % 3]
+            }
+            for i in range(events)
+        ],
+        "summary": "A world reshaped by a single different outcome"
+    }
+
+
+def fake_newsfeed(items=7):
+    return {
+        "news_items": [
+            {
+                "headline": f"Headline {i + 1}: Empire Redraws Map of Europe",
+                "date": f"June {1816 + i}",
+                "source": "The Alternate Times",
+                "summary": "Diplomats gathered today to negotiate the new borders. Markets reacted calmly."
+            }
+            for i in range(items)
+        ]
+    }
+
+
+class FakeAPIError(Exception):
+    """Mimics google.api_core errors, which carry the HTTP status in `code`"""
+
+    def __init__(self, code, message="injected error"):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class FakeResponse:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeModel:
+    """Stand-in for genai.GenerativeModel that charges latency per generated character
+
+    `respond` maps a prompt to the response text; by default a timeline or
+    newsfeed JSON document of `response_items` entries is chosen from the
+    prompt, and anything else gets a plain reply of `reply_chars`. Reading
+    the prompt costs `seconds_per_prompt_token` per (estimated) token before
+    the first chunk. A fraction `error_rate` of calls fail with
+    FakeAPIError(`error_code`) after `error_latency` seconds, and a fraction
+    `stall_rate` wait an extra `stall_seconds` first. Like the SDK, a call
+    whose request_options timeout runs out fails with a 504.
+    """
+
+    def __init__(self, first_token_latency=0.3, seconds_per_char=0.0005, chunk_chars=80, respond=None,
+                 error_rate=0.0, error_code=429, error_latency=0.05, seconds_per_prompt_token=0.0,
+                 stall_rate=0.0, stall_seconds=10.0, response_items=None, reply_chars=300):
+        self.response_items = response_items
+        self.reply_chars = reply_chars
+        self.first_token_latency = first_token_latency
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.seconds_per_prompt_token = seconds_per_prompt_token
+        self.seconds_per_char = seconds_per_char
+        self.chunk_chars = chunk_chars
+        self.respond = respond or self.default_response
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.error_latency = error_latency
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+
+    def default_response(self, prompt):
+        if '"news_items"' in prompt:
+            data = fake_newsfeed(self.response_items or 7)
+        elif '"timeline"' in prompt:
+            data = fake_timeline(self.response_items or 8)
+        else:
+            sentence = "Ah, in this world things went rather differently than the books of your time recall. "
+            return (sentence * (self.reply_chars // len(sentence) + 1))[:self.reply_chars].strip()
+        return "```json\n" + json.dumps(data, indent=2) + "\n```"
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            time.sleep(self.error_latency)
+            raise FakeAPIError(self.error_code)
+        text = self.respond(prompt)
+        prompt_tokens = len(prompt) // 4 + 1
+        self.prompt_tokens += prompt_tokens
+        prefill = self.first_token_latency + prompt_tokens * self.seconds_per_prompt_token
+        if self.stall_rate and random.random() < self.stall_rate:
+            prefill += self.stall_seconds
+        timeout = (kwargs.get('request_options') or {}).get('timeout')
+        if timeout is not None and prefill > timeout:
+            time.sleep(timeout)
+            self.errors += 1
+            raise FakeAPIError(504, "deadline exceeded")
+        usage = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=len(text) // 4 + 1)
+        if stream:
+            return self._stream(text, prefill, usage)
+        time.sleep(prefill + len(text) * self.seconds_per_char)
+        return FakeResponse(text, usage)
+
+    def _stream(self, text, prefill, usage):
+        time.sleep(prefill)
+        for start in range(0, len(text), self.chunk_chars):
+            chunk = text[start:start + self.chunk_chars]
+            time.sleep(len(chunk) * self.seconds_per_char)
+            # Like the SDK, the final chunk carries the usage totals
+            yield FakeResponse(chunk, usage if start + self.chunk_chars >= len(text) else None)
+
+
+def make_time_machine(model=None, fetcher=None, **overrides):
+    """A TimeMachine on the given model and fetcher that shares nothing with the app
+
+    Unless overridden, it has no result cache, similarity index, archive or
+    title index, so every request does the full work, and its metrics are
+    its own. None of the process-wide singletons or .cache files are touched.
+    """
+    from app import TimeMachine
+    from metrics import Metrics
+    from question_index import QuestionIndex
+    from result_cache import ResultCache
+
+    components = {
+        'title_index': None,
+        'result_cache': ResultCache(max_entries=0, path=None),
+        'question_index': QuestionIndex(threshold=None),
+        'archive': None,
+        'metrics': Metrics(),
+    }
+    components.update(overrides)
+    return TimeMachine(model=model, fetcher=fetcher, **components)
@@ -0,0 +1,112 @@
+import re
+from collections import deque
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English)"""
+    return len(text) // 4 + 1
+
+
+def truncate_to_tokens(text, tokens, keep_end=False):
+    limit = tokens * 4
+    if len(text) <= limit:
+        return text
+    if keep_end:
+        return "..." + text[-limit:].split(' ', 1)[-1]
+    return text[:limit].rsplit(' ', 1)[0] + "..."
+
+
+def first_sentence(text):
+    match = re.match(r'(.+?[.!?])(\s|$)', text.strip(), re.DOTALL)
+    return match.group(1) if match else text.strip()
+
+
+class ChatSession:
+    """Multi-turn conversation with one historical figure, kept within a token budget
+
+    Recent turns are sent verbatim. Once they exceed `history_tokens`, the
+    oldest ones are folded into a running summary (itself capped at
+    `summary_tokens`) until they fit in half the budget, so the prompt stays
+    bounded however long the chat runs. Only the last `max_messages`
+    messages are kept for display.
+    """
+
+    def __init__(self, figure_name, context, history_tokens=1200, summary_tokens=250, max_messages=100):
+        self.figure_name = figure_name
+        self.context = context
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self.turns = deque()
+        self.messages = deque(maxlen=max_messages)
+        self.turn_count = 0
+        self.folds = 0
+
+    def _history_size(self):
+        return sum(estimate_tokens(user) + estimate_tokens(reply) for user, reply in self.turns)
+
+    def build_prompt(self, user_message):
+        figure_name = self.figure_name
+        history = "\n".join(f"User: {user}\n{figure_name}: {reply}" for user, reply in self.turns)
+        summary = f"\nWhat you have discussed so far: {self.summary}\n" if self.summary else ""
+
+        return f"""
+        You are {figure_name} in an alternate history where: {self.context}
+
+        Respond to the user's latest message as {figure_name} would, considering how this alternate history would have affected their life, beliefs, and circumstances. Keep responses conversational, in character, and consistent with what you have already said.
+        {summary}
+        Conversation so far:
+        {history}
+
+        User: {user_message}
+
+        Response as {figure_name}:
+        """
+
+    def recap(self, max_tokens=200, recent_turns=2):
+        """Short digest of the conversation for prompts that cover several figures"""
+        parts = [self.summary] if self.summary else []
+        parts += [f"User: {user} / {self.figure_name}: {reply}" for user, reply in list(self.turns)[-recent_turns:]]
+        return truncate_to_tokens(" ".join(parts), max_tokens, keep_end=True)
+
+    def record(self, user_message, reply, summarize=None):
+        """Add a finished turn and fold old turns into the summary if over budget
+
+        `summarize(summary, turns)` should return the updated summary text;
+        without it, or if it fails, the first sentence of each turn is kept.
+        """
+        self.turns.append((user_message, reply))
+        self.messages.append({'role': 'user', 'content': user_message})
+        self.messages.append({'role': 'assistant', 'content': reply})
+        self.turn_count += 1
+
+        if self._history_size() <= self.history_tokens:
+            return
+
+        # Fold down to half the budget so folding happens every few turns, not every turn
+        folded = []
+        while len(self.turns) > 1 and self._history_size() > self.history_tokens // 2:
+            folded.append(self.turns.popleft())
+
+        summary = None
+        if summarize is not None:
+            try:
+                summary = summarize(self.summary, folded)
+            except Exception:
+                summary = None
+
+        if summary:
+            self.summary = truncate_to_tokens(summary, self.summary_tokens)
+        else:
+            # Keep the most recent notes when the extractive summary overflows
+            notes = " ".join(f"Asked: {first_sentence(user)} Answered: {first_sentence(reply)}" for user, reply in folded)
+            self.summary = truncate_to_tokens(f"{self.summary} {notes}".strip(), self.summary_tokens, keep_end=True)
+        self.folds += 1
+
+    def note(self, user_message, reply):
+        """Show an exchange without sending it to the model again, e.g. an error reply"""
+        self.messages.append({'role': 'user', 'content': user_message})
+        self.messages.append({'role': 'assistant', 'content': reply})
+
+    def prompt_tokens(self, user_message=""):
+        return estimate_tokens(self.build_prompt(user_message))
@@ -0,0 +1,127 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+from chat_session import estimate_tokens
+from question_index import NEGATIONS, STOP_WORDS, stem
+
+# Token budget for the Historical Context section of generation prompts
+DEFAULT_CONTEXT_TOKENS = int(os.environ.get("TIME_MACHINE_CONTEXT_TOKENS", "300"))
+
+# BM25 parameters; the usual defaults
+K1 = 1.5
+B = 0.75
+
+# Score added to sentences that mention a year, since timelines are built around dates
+YEAR_BONUS = 1.0
+# Score added to the opening sentence of each article, which usually defines the subject
+LEAD_BONUS = 0.5
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"(])')
+_YEAR = re.compile(r'\b(1[0-9]{3}|20[0-9]{2})\b')
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def split_sentences(text):
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+
+
+def terms(text):
+    return [stem(word) for word in _WORD.findall(text.lower()) if word not in STOP_WORDS and word not in NEGATIONS]
+
+
+class ContextStats:
+    """Running totals of how much context went into prompts"""
+
+    def __init__(self):
+        self.prompts = 0
+        self.source_tokens = 0
+        self.used_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, stats):
+        with self._lock:
+            self.prompts += 1
+            self.source_tokens += stats['source_tokens']
+            self.used_tokens += stats['used_tokens']
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'prompts': self.prompts,
+                'source_tokens': self.source_tokens,
+                'used_tokens': self.used_tokens,
+                'mean_used_tokens': self.used_tokens / self.prompts if self.prompts else 0.0
+            }
+
+
+context_stats = ContextStats()
+
+
+def assemble_context(question, context_data, budget_tokens=DEFAULT_CONTEXT_TOKENS):
+    """Build the Historical Context text from the sentences most relevant to the question
+
+    Every extract is split into sentences, which are scored with BM25
+    against the question (the sentences themselves are the corpus), plus a
+    bonus for mentioning a year and for opening an article. The best are
+    taken until `budget_tokens` is used up (None keeps every sentence) and
+    then printed per article in their original order. Returns (text, stats)
+    where stats holds the source and used token counts and the number of
+    sentences kept.
+    """
+    sentences = []
+    for article, item in enumerate(context_data):
+        for position, sentence in enumerate(split_sentences(item.get('extract', ''))):
+            sentences.append((article, position, sentence, terms(sentence)))
+
+    source_tokens = sum(estimate_tokens(f"- {item['title']}: {item.get('extract', '')}") for item in context_data)
+    if not sentences:
+        return "", {'source_tokens': source_tokens, 'used_tokens': 0, 'sentences': 0, 'total_sentences': 0}
+
+    query = set(terms(question))
+    document_frequency = Counter(term for *_, sentence_terms in sentences for term in set(sentence_terms))
+    average_length = sum(len(sentence_terms) for *_, sentence_terms in sentences) / len(sentences) or 1.0
+
+    scored = []
+    for article, position, sentence, sentence_terms in sentences:
+        counts = Counter(sentence_terms)
+        score = 0.0
+        for term in query:
+            frequency = counts.get(term)
+            if not frequency:
+                continue
+            idf = math.log(1 + (len(sentences) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+            score += idf * frequency * (K1 + 1) / (frequency + K1 * (1 - B + B * len(sentence_terms) / average_length))
+        if _YEAR.search(sentence):
+            score += YEAR_BONUS
+        if position == 0:
+            score += LEAD_BONUS
+        scored.append((-score, article, position, sentence))
+
+    # Titles are printed once per article, so they count against the budget too
+    chosen = []
+    used = 0
+    titled = set()
+    for _, article, position, sentence in sorted(scored):
+        cost = estimate_tokens(sentence) + (0 if article in titled else estimate_tokens(context_data[article]['title']) + 1)
+        if budget_tokens is not None and used + cost > budget_tokens:
+            continue
+        chosen.append((article, position, sentence))
+        titled.add(article)
+        used += cost
+
+    lines = []
+    for article in sorted(titled):
+        kept = " ".join(sentence for a, _, sentence in sorted(chosen) if a == article)
+        lines.append(f"- {context_data[article]['title']}: {kept}")
+    text = "\n".join(lines)
+
+    stats = {
+        'source_tokens': source_tokens,
+        'used_tokens': estimate_tokens(text) if text else 0,
+        'sentences': len(chosen),
+        'total_sentences': len(sentences)
+    }
+    return text, stats
@@ -0,0 +1,36 @@
+import os
+import time
+
+# End-to-end budget for one generation, from fetching context to the last token
+REQUEST_BUDGET = float(os.environ.get("TIME_MACHINE_REQUEST_BUDGET", "20"))
+
+# Share of the remaining budget the context stage may use before generation starts without it
+CONTEXT_SHARE = float(os.environ.get("TIME_MACHINE_CONTEXT_SHARE", "0.25"))
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request has used up its time budget"""
+
+
+class Deadline:
+    """Point in time by which a request must finish, handed down to every stage"""
+
+    def __init__(self, seconds, clock=time.monotonic):
+        self.clock = clock
+        self.seconds = seconds
+        self.expires_at = clock() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - self.clock())
+
+    @property
+    def expired(self):
+        return self.clock() >= self.expires_at
+
+    def share(self, fraction):
+        """Seconds a stage may take if it is allowed `fraction` of what is left"""
+        return self.remaining() * fraction
+
+    def check(self):
+        if self.expired:
+            raise DeadlineExceeded(f"Request did not finish within its {self.seconds:.0f}s budget")
@@ -0,0 +1,139 @@
+import gzip
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left
+
+from question_index import NEGATIONS, STOP_WORDS
+from wiki_offline import title_hash
+
+# Words that may sit inside a title ("Library of Alexandria") but never start or end one
+CONNECTORS = {'of', 'the', 'de', 'da', 'di', 'du', 'von', 'van', 'der', 'la', 'le', 'del', 'and', 'on', 'in', 'at'}
+
+# Outcome verbs what-if questions put between names, in each of their forms
+OUTCOME_VERBS = {
+    'win', 'wins', 'won', 'winning', 'lose', 'loses', 'lost', 'losing',
+    'defeat', 'defeats', 'defeated', 'defeating'
+}
+
+# Words that are never worth a lookup on their own
+SKIP_WORDS = STOP_WORDS | NEGATIONS | CONNECTORS | OUTCOME_VERBS | {'a', 'an', 'to', 'by'}
+
+# Skip words that end a capitalized name rather than join it ("The Union Lost The War")
+NAME_BREAKS = SKIP_WORDS - CONNECTORS
+
+# Longest title tried, in words
+MAX_TITLE_WORDS = 6
+
+
+class TitleSet:
+    """Compact set of article titles, stored as a sorted array of 8-byte title hashes
+
+    Titles are folded like the offline index folds them, so membership
+    ignores case, underscores and spacing.
+    """
+
+    def __init__(self, titles=()):
+        self._hashes = array('Q', sorted({title_hash(title) for title in titles}))
+
+    @classmethod
+    def load(cls, path):
+        """Read one title per line, e.g. enwiki-latest-all-titles-in-ns0(.gz)"""
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as titles:
+            return cls(line.rstrip("\n") for line in titles if line.strip())
+
+    def has_title(self, title):
+        key = title_hash(title)
+        i = bisect_left(self._hashes, key)
+        return i < len(self._hashes) and self._hashes[i] == key
+
+    def __len__(self):
+        return len(self._hashes)
+
+
+def _skippable(word):
+    return word.lower() in SKIP_WORDS or len(word) <= 2
+
+
+def _is_name(words):
+    """Whether a phrase looks like a proper name: capitalized apart from its connectors"""
+    return all(word[0].isupper() or word.lower() in CONNECTORS for word in words)
+
+
+def extract_entities(question, titles=None, max_terms=5):
+    """Pick the phrases of a question most likely to be Wikipedia titles, best first
+
+    Scanning left to right, the longest phrase starting at each word is
+    taken: with a title index (anything with has_title), the longest that is
+    a known title; without one, the longest capitalized name such as
+    "Library of Alexandria", which stops at any skip word other than a
+    connector, so "Lost" in a title-cased question is not part of it. Single
+    words are only kept if they are known titles or, without an index, not
+    stop words. Names and longer phrases rank first, then earlier ones.
+    """
+    # Letters, with apostrophes and dashes inside words ("Cretaceous–Paleogene")
+    words = re.findall(r"[^\W\d_](?:[\w'\-–]*[^\W\d_])?", question)
+    candidates = []
+    seen = set()
+
+    i = 0
+    while i < len(words):
+        if _skippable(words[i]):
+            i += 1
+            continue
+
+        match = None
+        for n in range(min(MAX_TITLE_WORDS, len(words) - i), 0, -1):
+            phrase_words = words[i:i + n]
+            if n > 1 and phrase_words[-1].lower() in CONNECTORS:
+                continue
+            if n == 1 and _skippable(phrase_words[0]):
+                break
+            phrase = " ".join(phrase_words)
+            if titles is not None:
+                if titles.has_title(phrase):
+                    match = phrase_words
+                    break
+            elif n == 1 or (_is_name(phrase_words) and not any(word.lower() in NAME_BREAKS for word in phrase_words)):
+                match = phrase_words
+                break
+
+        if match is None:
+            i += 1
+            continue
+
+        phrase = " ".join(match)
+        # Wikipedia titles are case-sensitive apart from the first letter
+        phrase = phrase[0].upper() + phrase[1:]
+        if phrase.casefold() not in seen:
+            seen.add(phrase.casefold())
+            candidates.append((not _is_name(match), -len(match), i, phrase))
+        i += len(match)
+
+    candidates.sort()
+    return [phrase for *_, phrase in candidates[:max_terms]]
+
+
+_title_index = None
+_title_index_lock = threading.Lock()
+
+
+def get_title_index(fetcher=None):
+    """Return the title index used to recognise entities, or None to fall back on capitalization
+
+    An offline Wikipedia provider is its own title index; otherwise
+    TIME_MACHINE_WIKI_TITLES may name a titles list to load once per process.
+    """
+    global _title_index
+    if fetcher is not None and hasattr(fetcher, 'has_title'):
+        return fetcher
+    path = os.environ.get("TIME_MACHINE_WIKI_TITLES")
+    if not path:
+        return None
+    if _title_index is None:
+        with _title_index_lock:
+            if _title_index is None:
+                _title_index = TitleSet.load(path)
+    return _title_index
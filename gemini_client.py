@@ -0,0 +1,440 @@
+import importlib.util
+import os
+import random
+import threading
+import time
+
+from deadlines import DeadlineExceeded
+
+# Tried in order by the availability probe
+MODEL_CANDIDATES = ('gemini-1.5-flash', 'gemini-1.5-pro', 'models/gemini-1.5-flash')
+
+# HTTP statuses worth retrying: rate limited, server error, unavailable, deadline exceeded
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {'ResourceExhausted', 'TooManyRequests', 'InternalServerError', 'ServiceUnavailable', 'DeadlineExceeded'}
+
+
+class ThrottledError(Exception):
+    """Raised when the rate limiter cannot grant a request in time"""
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling Gemini while the upstream is considered down"""
+
+
+class ModelUnavailableError(Exception):
+    """Raised when no candidate model passed the availability probe"""
+
+
+def genai_available():
+    """Whether google-generativeai is installed, checked without importing it"""
+    try:
+        return importlib.util.find_spec("google.generativeai") is not None
+    except ModuleNotFoundError:
+        return False
+
+
+def is_retryable(error):
+    """Whether a Gemini error is transient, judged without importing the SDK"""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    code = getattr(error, 'code', None)
+    if isinstance(code, int) and code in RETRYABLE_CODES:
+        return True
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+def is_timeout(error):
+    """Whether a Gemini error is the request running out of time"""
+    if isinstance(error, TimeoutError):
+        return True
+    return getattr(error, 'code', None) == 504 or type(error).__name__ == 'DeadlineExceeded'
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self):
+        """Tokens that could be taken right now without waiting"""
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+    def try_acquire(self):
+        """Take a token if one is available right now"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def acquire(self, max_wait):
+        """Take a token, waiting up to max_wait seconds; returns the time spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                needed = (1 - self.tokens) / self.rate
+            if waited + needed > max_wait:
+                raise ThrottledError(f"Gemini rate limit reached, retry in {needed:.1f}s")
+            self.sleep(needed)
+            waited += needed
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and lets one trial call through after `reset_timeout`"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """The state a call is let through in, 'closed' or 'half_open' for the trial, or None"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return state
+            if state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return state
+            return None
+
+    def release(self, allowed):
+        """End a call that was abandoned before it said anything about the upstream
+
+        A throttled, cancelled or timed-out trial call records neither success
+        nor failure, so the next call becomes the trial instead.
+        """
+        if allowed == 'half_open':
+            with self._lock:
+                self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = self.clock()
+
+
+class ClientStats:
+    """Counters shared by every client in the process"""
+
+    FIELDS = ('calls', 'succeeded', 'failed', 'throttled', 'throttle_rejected', 'retried', 'circuit_rejected',
+              'deadline_exceeded')
+
+    def __init__(self):
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+        self.throttle_wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def incr(self, field, amount=1):
+        with self._lock:
+            self._counts[field] += amount
+
+    def add_wait(self, seconds):
+        with self._lock:
+            self._counts['throttled'] += 1
+            self.throttle_wait_seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts, throttle_wait_seconds=round(self.throttle_wait_seconds, 3))
+
+
+# Process-wide defaults so concurrent Streamlit sessions share one budget
+shared_limiter = TokenBucket(
+    rate=float(os.environ.get("TIME_MACHINE_GEMINI_RPM", "60")) / 60,
+    capacity=int(os.environ.get("TIME_MACHINE_GEMINI_BURST", "10"))
+)
+shared_breaker = CircuitBreaker()
+shared_stats = ClientStats()
+
+# Cost cap for work nobody has asked for yet, such as speculative generation
+speculation_budget = TokenBucket(
+    rate=float(os.environ.get("TIME_MACHINE_SPECULATIVE_PER_HOUR", "120")) / 3600,
+    capacity=int(os.environ.get("TIME_MACHINE_SPECULATIVE_BURST", "10"))
+)
+
+
+class GeminiClient:
+    """Drop-in wrapper for a GenerativeModel that rate limits, retries and fails fast
+
+    Every call first takes a token from the limiter, then goes to the model.
+    Transient errors (429, 5xx, timeouts) are retried with full-jitter
+    exponential backoff. Persistent failures open the circuit breaker, after
+    which calls raise CircuitOpenError until the upstream recovers.
+
+    A call given a `deadline` passes the time left to the SDK as its request
+    timeout, waits for the limiter and backs off only within that time, and
+    raises DeadlineExceeded once it runs out. Running out of time, whether
+    between chunks or as a request timeout, never trips the breaker.
+    """
+
+    def __init__(self, model, limiter=None, breaker=None, stats=None, max_retries=3,
+                 base_delay=1.0, max_delay=20.0, max_wait=30.0, sleep=time.sleep):
+        self.model = model
+        self.limiter = limiter or shared_limiter
+        self.breaker = breaker or shared_breaker
+        self.stats = stats or shared_stats
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self.sleep = sleep
+
+    def warm_up(self):
+        """Let a lazily created model import and probe ahead of the first call"""
+        if hasattr(self.model, 'warm_up'):
+            self.model.warm_up()
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _before_attempt(self, attempt, deadline=None):
+        """Wait for the breaker and the limiter; returns what breaker.allow() let the attempt through as"""
+        if deadline is not None and deadline.expired:
+            self.stats.incr('deadline_exceeded')
+            raise DeadlineExceeded("Gemini did not answer within the request's time budget")
+        allowed = self.breaker.allow()
+        if not allowed:
+            self.stats.incr('circuit_rejected')
+            if attempt:
+                # The breaker opened while this call was backing off
+                self.stats.incr('failed')
+            raise CircuitOpenError("Gemini is temporarily unavailable, please try again shortly")
+        max_wait = self.max_wait if deadline is None else min(self.max_wait, deadline.remaining())
+        try:
+            waited = self.limiter.acquire(max_wait)
+        except ThrottledError:
+            self.breaker.release(allowed)
+            self.stats.incr('throttle_rejected')
+            raise
+        if waited:
+            self.stats.add_wait(waited)
+        return allowed
+
+    def _check_out_of_time(self, error, allowed, deadline):
+        """Turn a request timeout caused by the call's own deadline into DeadlineExceeded
+
+        The SDK was only given the time left, so timing out says the budget ran
+        out, not that the upstream is failing; the breaker is left alone.
+        """
+        if deadline is not None and deadline.expired and is_timeout(error):
+            self.breaker.release(allowed)
+            self.stats.incr('deadline_exceeded')
+            raise DeadlineExceeded("Gemini did not answer within the request's time budget") from error
+
+    def _after_error(self, error, attempt, deadline=None):
+        """Record a failed attempt; returns True if it should be retried"""
+        if not is_retryable(error):
+            # The request itself was bad; the upstream is fine
+            self.breaker.record_success()
+            self.stats.incr('failed')
+            return False
+        self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            self.stats.incr('failed')
+            return False
+        delay = self.backoff(attempt)
+        if deadline is not None and delay >= deadline.remaining():
+            # A retry could not finish in time anyway
+            self.stats.incr('failed')
+            return False
+        self.stats.incr('retried')
+        self.sleep(delay)
+        return True
+
+    def _request_kwargs(self, kwargs, deadline):
+        if deadline is None:
+            return kwargs
+        request_options = dict(kwargs.get('request_options') or {}, timeout=deadline.remaining())
+        return dict(kwargs, request_options=request_options)
+
+    def generate_content(self, prompt, stream=False, deadline=None, **kwargs):
+        self.stats.incr('calls')
+        if stream:
+            return self._stream(prompt, deadline, **kwargs)
+
+        attempt = 0
+        while True:
+            allowed = self._before_attempt(attempt, deadline)
+            try:
+                response = self.model.generate_content(prompt, **self._request_kwargs(kwargs, deadline))
+            except Exception as e:
+                self._check_out_of_time(e, allowed, deadline)
+                if self._after_error(e, attempt, deadline):
+                    attempt += 1
+                    continue
+                raise
+            except BaseException:
+                self.breaker.release(allowed)
+                raise
+            self.breaker.record_success()
+            self.stats.incr('succeeded')
+            return response
+
+    def _stream(self, prompt, deadline=None, **kwargs):
+        """Retry a streamed call only until its first chunk has been passed on"""
+        attempt = 0
+        while True:
+            allowed = self._before_attempt(attempt, deadline)
+            started = False
+            try:
+                for chunk in self.model.generate_content(prompt, stream=True, **self._request_kwargs(kwargs, deadline)):
+                    started = True
+                    yield chunk
+                    if deadline is not None:
+                        deadline.check()
+            except DeadlineExceeded:
+                # Too slow, not broken, so the breaker is left alone
+                self.breaker.release(allowed)
+                self.stats.incr('deadline_exceeded')
+                raise
+            except GeneratorExit:
+                # The caller stopped reading, e.g. because its job was cancelled
+                self.breaker.release(allowed)
+                raise
+            except Exception as e:
+                self._check_out_of_time(e, allowed, deadline)
+                if not started and self._after_error(e, attempt, deadline):
+                    attempt += 1
+                    continue
+                if started:
+                    self.breaker.record_failure()
+                    self.stats.incr('failed')
+                raise
+            self.breaker.record_success()
+            self.stats.incr('succeeded')
+            return
+
+
+class LazyModel:
+    """Imports the SDK and selects a working model the first time it is needed
+
+    The probe asks the API for each candidate's metadata and keeps the first
+    one that supports generateContent. A successful choice is kept for the
+    life of the process; a failed probe is remembered for `retry_after`
+    seconds so a bad key does not cost a round trip on every click.
+    """
+
+    def __init__(self, api_key, candidates=MODEL_CANDIDATES, retry_after=60.0, probe_timeout=5.0):
+        self.api_key = api_key
+        self.candidates = candidates
+        self.retry_after = retry_after
+        self.probe_timeout = probe_timeout
+        self.model_name = None
+        self._model = None
+        self._failure = None
+        self._failed_at = 0.0
+        self._lock = threading.Lock()
+        # Held by the warm-up thread while it runs, so reruns do not start another
+        self._warming = threading.Lock()
+
+    def probe(self, genai, name):
+        info = genai.get_model(
+            name if name.startswith('models/') else f'models/{name}',
+            request_options={"timeout": self.probe_timeout, "retry": None}
+        )
+        return 'generateContent' in info.supported_generation_methods
+
+    def resolve(self):
+        if self._model is not None:
+            return self._model
+        with self._lock:
+            if self._model is not None:
+                return self._model
+            if self._failure and time.monotonic() - self._failed_at < self.retry_after:
+                raise self._failure
+
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+
+            errors = []
+            for name in self.candidates:
+                try:
+                    if self.probe(genai, name):
+                        self._model = genai.GenerativeModel(name)
+                        self.model_name = name
+                        self._failure = None
+                        return self._model
+                    errors.append(f"{name}: generateContent not supported")
+                except Exception as e:
+                    errors.append(f"{name}: {e}")
+
+            self._failure = ModelUnavailableError(
+                "Could not initialize Gemini model. Please check your API key and model availability. "
+                + "; ".join(errors)
+            )
+            self._failed_at = time.monotonic()
+            raise self._failure
+
+    def warm_up(self):
+        """Import and probe in the background so the first request does not wait
+
+        At most one warm-up thread runs at a time, however often this is called.
+        """
+        if self._model is None and self._warming.acquire(blocking=False):
+            threading.Thread(target=self._warm_up, name="gemini-warm-up", daemon=True).start()
+
+    def _warm_up(self):
+        try:
+            self.resolve()
+        except Exception:
+            pass
+        finally:
+            self._warming.release()
+
+    def generate_content(self, *args, **kwargs):
+        return self.resolve().generate_content(*args, **kwargs)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_gemini_client(api_key):
+    """Return the process-wide client; nothing is imported or probed until it is used"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GeminiClient(LazyModel(api_key))
+    return _client
@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function once the job has been cancelled"""
+
+
+class Job:
+    """A unit of background work that Streamlit reruns can poll"""
+
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = QUEUED
+        self.message = "Queued"
+        self.progress = 0
+        self.items = []
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.subscribers = 1
+        self.spawned = {}
+        self.queue = None
+        self.future = None
+        self._cancel = threading.Event()
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        """Called by job functions between stages to stop early"""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def update(self, message, progress=None):
+        self.check_cancelled()
+        self.message = message
+        if progress is not None:
+            self.progress = progress
+
+    def add_item(self, item):
+        """Record a streamed item so pollers can render it before the job finishes"""
+        self.check_cancelled()
+        self.items.append(item)
+
+
+class JobQueue:
+    """Thread pool that runs generation jobs outside the Streamlit script
+
+    Submitting a job whose key matches one already queued or running returns
+    that job instead of starting a duplicate. Finished jobs are kept for
+    `keep_seconds` so every subscriber gets to read the result.
+    """
+
+    def __init__(self, max_workers=8, keep_seconds=600):
+        self.keep_seconds = keep_seconds
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation")
+        self.submitted = 0
+        self.deduplicated = 0
+        self._jobs = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Run fn(job, *args, **kwargs) in the pool, or join the identical job in flight"""
+        with self._lock:
+            self._prune()
+            self.submitted += 1
+            existing = self._in_flight.get(key)
+            if existing is not None and not existing.done:
+                existing.subscribers += 1
+                self.deduplicated += 1
+                return existing
+
+            job = Job(key)
+            job.queue = self
+            self._jobs[job.id] = job
+            self._in_flight[key] = job
+            job.future = self.executor.submit(self._run, job, fn, args, kwargs)
+            return job
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancelled:
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started = time.time()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            self._finish(job, CANCELLED if job.cancelled else DONE)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            job.error = str(e)
+            self._finish(job, FAILED)
+
+    def _finish(self, job, status):
+        job.finished = time.time()
+        job.progress = 100
+        job.status = status
+        job.message = {DONE: "Complete", FAILED: f"Failed: {job.error}", CANCELLED: "Cancelled"}[status]
+        with self._lock:
+            if self._in_flight.get(job.key) is job:
+                del self._in_flight[job.key]
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Withdraw one subscriber; the job only stops once nobody is waiting for it"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.done:
+                return
+            job.subscribers -= 1
+            if job.subscribers > 0:
+                return
+            job._cancel.set()
+            if self._in_flight.get(job.key) is job:
+                del self._in_flight[job.key]
+        if job.future.cancel():
+            self._finish(job, CANCELLED)
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            'submitted': self.submitted,
+            'deduplicated': self.deduplicated,
+            'queued': statuses.count(QUEUED),
+            'running': statuses.count(RUNNING),
+            'done': statuses.count(DONE),
+            'failed': statuses.count(FAILED),
+            'cancelled': statuses.count(CANCELLED)
+        }
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Return the process-wide queue shared by every Streamlit session"""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue(max_workers=int(os.environ.get("TIME_MACHINE_JOB_WORKERS", "8")))
+    return _job_queue
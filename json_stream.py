@@ -0,0 +1,152 @@
+import json
+import re
+import threading
+
+_decoder = json.JSONDecoder()
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+
+
+class IncrementalItemParser:
+    """Pull complete objects out of a JSON array while the text is still arriving
+
+    Feed it the model output chunk by chunk; every call returns the items of
+    `array_key` (e.g. "timeline" or "news_items") that were completed by that
+    chunk. The text is scanned once, so feeding is linear in the output size.
+    """
+
+    def __init__(self, array_key):
+        self.array_key = array_key
+        self.buffer = ""
+        self.done = False
+        self._key_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(array_key))
+        self._pos = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item_start = None
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        items = []
+        if self.done:
+            return items
+
+        if self._pos is None:
+            match = self._key_pattern.search(self.buffer)
+            if not match:
+                return items
+            self._pos = match.end()
+
+        buffer = self.buffer
+        i = self._pos
+        while i < len(buffer):
+            char = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                if self._depth == 0 and char == '{':
+                    self._item_start = i
+                self._depth += 1
+            elif char in '}]':
+                if self._depth == 0:
+                    # The array itself has closed
+                    self.done = True
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._item_start is not None:
+                    item = loads_lenient(buffer[self._item_start:i + 1])
+                    if isinstance(item, dict):
+                        items.append(item)
+                    self._item_start = None
+            i += 1
+
+        self._pos = i
+        return items
+
+
+def loads_lenient(text):
+    """json.loads that also forgives trailing commas; returns None if still invalid"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(_TRAILING_COMMA.sub(r'\1', text))
+    except json.JSONDecodeError:
+        return None
+
+
+def _string_field(text, key):
+    match = re.search(r'"%s"\s*:\s*("(?:[^"\\]|\\.)*")' % re.escape(key), text)
+    if match:
+        return loads_lenient(match.group(1))
+    return None
+
+
+class ParseStats:
+    """Counts how model output was parsed, per mode"""
+
+    OUTCOMES = ('parsed', 'salvaged', 'failed')
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, mode, outcome):
+        with self._lock:
+            counts = self._counts.setdefault(mode, dict.fromkeys(self.OUTCOMES, 0))
+            counts[outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = {}
+            for mode, counts in self._counts.items():
+                total = sum(counts.values())
+                snapshot[mode] = dict(counts, total=total, failure_rate=counts['failed'] / total if total else 0.0)
+            return snapshot
+
+
+parse_stats = ParseStats()
+
+
+def parse_generation(text, array_key, summary_key=None, mode=None):
+    """Parse a model response into a dict, salvaging what it can from broken output
+
+    Returns (data, outcome) where outcome is 'parsed' for a clean document,
+    'salvaged' when only the complete items of `array_key` (and the summary
+    string, if any) could be recovered, or 'failed' with data None.
+    """
+    data, outcome = None, 'failed'
+
+    start = text.find('{')
+    if start != -1:
+        # raw_decode stops at the end of the first document, ignoring any trailing text
+        try:
+            data, _ = _decoder.raw_decode(text, start)
+        except json.JSONDecodeError:
+            data = loads_lenient(text[start:text.rfind('}') + 1])
+        if isinstance(data, dict) and isinstance(data.get(array_key), list):
+            outcome = 'parsed'
+        else:
+            data = None
+
+    if data is None:
+        parser = IncrementalItemParser(array_key)
+        items = parser.feed(text)
+        if items:
+            data = {array_key: items}
+            if summary_key:
+                summary = _string_field(text, summary_key)
+                if summary:
+                    data[summary_key] = summary
+            outcome = 'salvaged'
+
+    parse_stats.record(mode or array_key, outcome)
+    return data, outcome
@@ -0,0 +1,247 @@
+"""Per-stage timings, counters and cache statistics, exported for scraping
+
+Turned on by TIME_MACHINE_METRICS=1, or by TIME_MACHINE_METRICS_PORT, which
+also serves the metrics over HTTP so they can be scraped without a browser:
+
+    curl localhost:9464/metrics        # Prometheus text format
+    curl localhost:9464/metrics.jsonl  # one JSON object per series
+
+When metrics are off, span() hands back one shared no-op object and
+nothing is recorded.
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "time_machine_"
+
+# Upper bounds in seconds, from a cache hit to a slow generation
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+DESCRIPTIONS = {
+    'stage_seconds': "Time spent in each pipeline stage",
+    'gemini_tokens_total': "Tokens reported by Gemini usage metadata",
+    'errors_total': "Errors shown to the user, by stage"
+}
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """(upper bound, observations at or below it) pairs, ending with +Inf"""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ('metrics', 'key', 'start')
+
+    def __init__(self, metrics, key):
+        self.metrics = metrics
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics._observe(self.key, time.perf_counter() - self.start)
+        return False
+
+
+def _labels_key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{str(value)}"' for key, value in pairs) + "}"
+
+
+class Metrics:
+    """Histograms and counters keyed by name and labels, plus collectors read at export time
+
+    A collector is a function returning a dict of numbers, such as a cache's
+    stats(); nested dicts become one series per key, labelled with `label`.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._histograms = {}
+        self._counters = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def span(self, stage, **labels):
+        """Context manager timing one run of a pipeline stage"""
+        if not self.enabled:
+            return NOOP_SPAN
+        return _Span(self, _labels_key('stage_seconds', dict(labels, stage=stage)))
+
+    def _observe(self, key, value):
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def observe(self, name, value, **labels):
+        if self.enabled:
+            self._observe(_labels_key(name, labels), value)
+
+    def incr(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = _labels_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def register_collector(self, name, collect, label='key'):
+        """Registering the same name again replaces the collector, so Streamlit reruns are harmless"""
+        self._collectors[name] = (collect, label)
+
+    def _collected(self):
+        """(metric name, labels, value) for every number the collectors report"""
+        for name, (collect, label) in list(self._collectors.items()):
+            try:
+                values = collect()
+            except Exception:
+                continue
+            for field, value in values.items():
+                if isinstance(value, dict):
+                    for sub_field, sub_value in value.items():
+                        if isinstance(sub_value, (int, float)) and not isinstance(sub_value, bool):
+                            yield f"{name}_{sub_field}", ((label, field),), sub_value
+                elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                    yield f"{name}_{field}", (), value
+
+    def _snapshot(self):
+        with self._lock:
+            histograms = [(key, list(h.cumulative()), h.sum, h.count) for key, h in self._histograms.items()]
+            counters = list(self._counters.items())
+        return sorted(histograms), sorted(counters)
+
+    def prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        histograms, counters = self._snapshot()
+        lines = []
+        described = set()
+
+        def header(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in DESCRIPTIONS:
+                    lines.append(f"# HELP {PREFIX}{name} {DESCRIPTIONS[name]}")
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+        for (name, labels), buckets, total, count in histograms:
+            header(name, "histogram")
+            for bound, cumulative in buckets:
+                le = "+Inf" if bound == float('inf') else repr(bound)
+                lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {count}")
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+        for name, labels, value in sorted(self._collected()):
+            header(name, "gauge")
+            lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def json_lines(self):
+        """All metrics as JSON lines, one series per line"""
+        histograms, counters = self._snapshot()
+        now = time.time()
+        records = []
+        for (name, labels), buckets, total, count in histograms:
+            records.append({
+                'time': now, 'metric': name, 'type': 'histogram', 'labels': dict(labels),
+                'count': count, 'sum': total,
+                'buckets': {("+Inf" if bound == float('inf') else str(bound)): cumulative for bound, cumulative in buckets}
+            })
+        for (name, labels), value in counters:
+            records.append({'time': now, 'metric': name, 'type': 'counter', 'labels': dict(labels), 'value': value})
+        for name, labels, value in self._collected():
+            records.append({'time': now, 'metric': name, 'type': 'gauge', 'labels': dict(labels), 'value': value})
+        return "".join(json.dumps(record) + "\n" for record in records)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve /metrics and /metrics.jsonl from a daemon thread"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = metrics.prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.jsonl":
+                    body, content_type = metrics.json_lines(), "application/x-ndjson"
+                else:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        return server
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide metrics, starting the HTTP endpoint once if a port is configured"""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                port = os.environ.get("TIME_MACHINE_METRICS_PORT")
+                metrics = Metrics(enabled=bool(port) or os.environ.get("TIME_MACHINE_METRICS", "") == "1")
+                if port:
+                    metrics.serve(int(port), os.environ.get("TIME_MACHINE_METRICS_HOST", "127.0.0.1"))
+                _metrics = metrics
+    return _metrics
@@ -0,0 +1,206 @@
+"""Keep timelines and newsfeeds for popular questions ready before anyone asks
+
+A daemon thread generates every mode for each warm question once the app
+has started, stores the results in SQLite so they survive restarts, and
+regenerates them every TIME_MACHINE_WARM_INTERVAL seconds (0 never
+refreshes). A refresh runs the normal pipeline, so it only costs a Gemini
+call when the question's Wikipedia context has changed.
+
+TIME_MACHINE_WARM_QUESTIONS may name a file with one question per line to
+warm instead of the sidebar examples; TIME_MACHINE_WARM=0 turns warming
+off.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from result_cache import normalize_question
+
+DEFAULT_WARM_PATH = os.environ.get(
+    "TIME_MACHINE_WARM_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "warm_results.sqlite3")
+)
+
+WARM_MODES = ('timeline', 'newsfeed')
+
+# Seconds before a failed warm-up is tried again
+RETRY_SECONDS = 300
+
+
+class Warmer:
+    """Precomputed results for a fixed list of questions, refreshed in the background
+
+    `generate(question, mode)` must return the app's result dict
+    ({'question', 'mode', 'context_data', 'context_used', 'data'}) or raise.
+    """
+
+    def __init__(self, questions, modes=WARM_MODES, interval=6 * 3600, path=DEFAULT_WARM_PATH,
+                 prompt_version=None, clock=time.time):
+        self.questions = list(questions)
+        self.modes = modes
+        self.interval = interval
+        self.prompt_version = str(prompt_version)
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.failures = 0
+
+        self._results = {}
+        self._retry_at = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._conn = None
+        if path:
+            if path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS warm_results (
+                    question TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    generated_at REAL NOT NULL,
+                    payload TEXT NOT NULL,
+                    PRIMARY KEY (question, mode)
+                )
+            """)
+            self._load()
+
+    def _load(self):
+        """Pick up results persisted by an earlier run with the same prompts"""
+        wanted = {normalize_question(question) for question in self.questions}
+        rows = self._conn.execute(
+            "SELECT question, mode, generated_at, payload FROM warm_results WHERE prompt_version = ?",
+            (self.prompt_version,)
+        ).fetchall()
+        for question, mode, generated_at, payload in rows:
+            if question in wanted and mode in self.modes:
+                self._results[(question, mode)] = (generated_at, payload)
+
+    def get(self, question, mode):
+        """The warm result for this question and mode, or None"""
+        with self._lock:
+            entry = self._results.get((normalize_question(question), mode))
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(entry[1])
+
+    def due(self):
+        """(question, mode) pairs that are missing or older than the refresh interval"""
+        now = self.clock()
+        pending = []
+        with self._lock:
+            for question in self.questions:
+                for mode in self.modes:
+                    key = (normalize_question(question), mode)
+                    if self._retry_at.get(key, 0) > now:
+                        continue
+                    entry = self._results.get(key)
+                    if entry is None or (self.interval and now - entry[0] >= self.interval):
+                        pending.append((question, mode))
+        return pending
+
+    def next_wait(self):
+        """Seconds until something is due again, or None if nothing ever will be"""
+        now = self.clock()
+        with self._lock:
+            times = list(self._retry_at.values())
+            if self.interval:
+                times += [generated_at + self.interval for generated_at, _ in self._results.values()]
+        if not times:
+            return None
+        return max(1.0, min(times) - now)
+
+    def refresh(self, generate, question, mode):
+        key = (normalize_question(question), mode)
+        try:
+            result = generate(question, mode)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+                self._retry_at[key] = self.clock() + RETRY_SECONDS
+            return False
+
+        generated_at = self.clock()
+        payload = json.dumps(result)
+        with self._lock:
+            self.refreshes += 1
+            self._retry_at.pop(key, None)
+            self._results[key] = (generated_at, payload)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO warm_results VALUES (?, ?, ?, ?, ?)",
+                    (key[0], mode, self.prompt_version, generated_at, payload)
+                )
+        return True
+
+    def run(self, generate):
+        """Warm everything that is due, then sleep until the next refresh"""
+        while not self._stop.is_set():
+            for question, mode in self.due():
+                if self._stop.is_set():
+                    return
+                self.refresh(generate, question, mode)
+            wait = self.next_wait()
+            if wait is None:
+                return
+            self._stop.wait(wait)
+
+    def start(self, generate):
+        """Start the background thread once; later calls do nothing"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self.run, args=(generate,), name="prewarm", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'refreshes': self.refreshes,
+                'failures': self.failures,
+                'warm': len(self._results),
+                'wanted': len(self.questions) * len(self.modes)
+            }
+
+
+def warm_questions(default_questions):
+    path = os.environ.get("TIME_MACHINE_WARM_QUESTIONS")
+    if not path:
+        return list(default_questions)
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+_warmer = None
+_warmer_lock = threading.Lock()
+
+
+def get_warmer(default_questions, prompt_version=None):
+    """Return the process-wide warmer, or None when TIME_MACHINE_WARM=0"""
+    global _warmer
+    if os.environ.get("TIME_MACHINE_WARM", "1") == "0":
+        return None
+    if _warmer is None:
+        with _warmer_lock:
+            if _warmer is None:
+                _warmer = Warmer(
+                    warm_questions(default_questions),
+                    interval=float(os.environ.get("TIME_MACHINE_WARM_INTERVAL", str(6 * 3600))),
+                    prompt_version=prompt_version
+                )
+    return _warmer
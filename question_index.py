@@ -0,0 +1,214 @@
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from itertools import combinations
+
+# Words that carry no meaning for matching two what-if questions
+STOP_WORDS = {
+    'what', 'if', 'had', 'been', 'was', 'were', 'would', 'could', 'should', 'the', 'and', 'then',
+    'instead', 'happened', 'happen', 'happens', 'have', 'has', 'did', 'does', 'for', 'from', 'with',
+    'that', 'this', 'there', 'their', 'its', 'his', 'her', 'they', 'into', 'about', 'how', 'be', 'are'
+}
+
+# Negation changes the scenario, so it is kept as a single term
+NEGATIONS = {'not', 'never', 'didn', 'wasn', 'weren', 'hadn', 'couldn', 'wouldn', 'no'}
+
+IRREGULAR_FORMS = {
+    'won': 'win', 'lost': 'lose', 'fell': 'fall', 'fallen': 'fall', 'burnt': 'burn', 'went': 'go',
+    'gone': 'go', 'became': 'become', 'began': 'begin', 'begun': 'begin', 'wrote': 'write',
+    'written': 'write', 'took': 'take', 'taken': 'take', 'made': 'make', 'built': 'build',
+    'found': 'find', 'led': 'lead', 'ran': 'run', 'rose': 'rise', 'risen': 'rise', 'sank': 'sink',
+    'sunk': 'sink', 'met': 'meet', 'chose': 'choose', 'chosen': 'choose', 'fought': 'fight',
+    'winning': 'win', 'losing': 'lose'
+}
+
+# Terms that turn a scenario into its opposite; two questions only match if they have the same ones
+POLARITY_TERMS = {'not', 'win', 'lose', 'defeat', 'fail', 'succeed'}
+
+# Longer questions are matched on their most specific terms only
+MAX_TERMS = 10
+
+
+def stem(word):
+    """Very small stemmer, just enough to line up tenses and plurals"""
+    if word in IRREGULAR_FORMS:
+        return IRREGULAR_FORMS[word]
+    if word.endswith('ing') and len(word) > 5:
+        return word[:-3]
+    if word.endswith('ied') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith('ed') and len(word) > 4:
+        return word[:-2]
+    if word.endswith('s') and not word.endswith('ss') and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def key_terms(question):
+    """Normalize a question to its set of key terms, like extract_search_terms does"""
+    terms = set()
+    for word in re.findall(r'[a-z0-9]+', question.lower()):
+        if word in NEGATIONS:
+            terms.add('not')
+        elif any(char.isdigit() for char in word):
+            # Years and names like "WW2" are what tell two questions apart
+            terms.add(stem(word))
+        elif word not in STOP_WORDS and len(word) > 2:
+            terms.add(stem(word))
+    return frozenset(terms)
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+def required_overlap(size, other_size, threshold):
+    """Shared terms needed for two sets of these sizes to reach the Jaccard threshold"""
+    return math.ceil(threshold * (size + other_size) / (1 + threshold) - 1e-9)
+
+
+def comparable_sizes(size, threshold):
+    """Sizes of term sets that can be within the threshold of a set of this size"""
+    return range(max(1, math.ceil(threshold * size - 1e-9)), int(size / threshold + 1e-9) + 1)
+
+
+class QuestionIndex:
+    """Index from past questions to the cache keys of their results
+
+    A stored set of m key terms matches a query of n terms exactly when they
+    share at least required_overlap(n, m) terms. Each stored set is filed
+    under (m, subset) for every subset size some query could need, so a
+    lookup only probes the subsets of its own terms and every hit is already
+    known to be within the threshold. No candidate list is ever scanned.
+    Signatures also carry the set's POLARITY_TERMS, so "never burned" and
+    "burned", or "won" and "lost", are never in the same bucket.
+    """
+
+    def __init__(self, threshold=0.8, max_entries=100000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.lookups = 0
+        self.hits = 0
+
+        self._entries = OrderedDict()
+        self._exact = {}
+        self._buckets = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _terms(self, question):
+        terms = key_terms(question)
+        if len(terms) > MAX_TERMS:
+            # Polarity terms are short but always kept, as they decide whether two questions can match
+            polarity = terms & POLARITY_TERMS
+            rest = sorted(terms - polarity, key=lambda term: (-len(term), term))
+            terms = frozenset(polarity | set(rest[:MAX_TERMS - len(polarity)]))
+        return terms
+
+    def _signatures(self, mode, terms):
+        size = len(terms)
+        polarity = tuple(sorted(terms & POLARITY_TERMS))
+        overlaps = {required_overlap(n, size, self.threshold) for n in comparable_sizes(size, self.threshold)}
+        ordered = sorted(terms)
+        for overlap in overlaps:
+            for subset in combinations(ordered, overlap):
+                yield (mode, polarity, size) + subset
+
+    def add(self, question, mode, result_key):
+        terms = self._terms(question)
+        if not terms or self.threshold is None:
+            return
+        signatures = list(self._signatures(mode, terms))
+
+        with self._lock:
+            existing = self._exact.get((mode, terms))
+            if existing is not None:
+                self._remove(existing)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (mode, terms, signatures, result_key)
+            self._exact[(mode, terms)] = entry_id
+            for signature in signatures:
+                self._buckets.setdefault(signature, set()).add(entry_id)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id):
+        mode, terms, signatures, _ = self._entries.pop(entry_id)
+        del self._exact[(mode, terms)]
+        for signature in signatures:
+            bucket = self._buckets[signature]
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[signature]
+
+    def lookup(self, question, mode):
+        """Return the result key of the closest stored question, or None"""
+        if self.threshold is None:
+            return None
+        terms = self._terms(question)
+        if not terms:
+            return None
+
+        size = len(terms)
+        polarity = tuple(sorted(terms & POLARITY_TERMS))
+        ordered = sorted(terms)
+
+        with self._lock:
+            self.lookups += 1
+            entry_id = self._exact.get((mode, terms))
+            if entry_id is not None:
+                self.hits += 1
+                return self._entries[entry_id][3]
+
+            candidates = set()
+            for stored_size in comparable_sizes(size, self.threshold):
+                overlap = required_overlap(size, stored_size, self.threshold)
+                for subset in combinations(ordered, overlap):
+                    candidates.update(self._buckets.get((mode, polarity, stored_size) + subset, ()))
+
+            # Every candidate is within the threshold; prefer the closest
+            best_key, best_score = None, -1.0
+            for entry_id in candidates:
+                _, entry_terms, _, result_key = self._entries[entry_id]
+                score = jaccard(terms, entry_terms)
+                if score > best_score:
+                    best_key, best_score = result_key, score
+
+            if best_key is not None:
+                self.hits += 1
+            return best_key
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._exact.clear()
+            self._buckets.clear()
+
+    def stats(self):
+        return {
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+            'entries': len(self._entries),
+            'threshold': self.threshold
+        }
+
+
+_question_index = None
+_question_index_lock = threading.Lock()
+
+
+def get_question_index():
+    """Return the process-wide index; TIME_MACHINE_SIMILARITY_THRESHOLD=off disables matching"""
+    global _question_index
+    if _question_index is None:
+        with _question_index_lock:
+            if _question_index is None:
+                threshold = os.environ.get("TIME_MACHINE_SIMILARITY_THRESHOLD", "0.8")
+                _question_index = QuestionIndex(threshold=None if threshold == "off" else float(threshold))
+    return _question_index
@@ -0,0 +1,187 @@
+"""HTML for the timeline, newsfeed and chat views, one fragment per view
+
+Every view goes to the page in a single st.markdown call instead of one
+per card. Model output is escaped before it is put into the page. Cards
+are memoized by their content in a process-wide cache, so a rerun that
+shows the same results again, in any session, only joins strings it
+already built.
+"""
+import html
+import os
+import threading
+from collections import OrderedDict
+
+STYLESHEET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "time_machine.css")
+# Where Streamlit serves ./static when server.enableStaticServing is on
+STYLESHEET_URL = "app/static/time_machine.css"
+
+
+class FragmentCache:
+    """LRU cache of rendered cards keyed by the values they were built from"""
+
+    def __init__(self, max_entries=5000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return fragment
+            self.misses += 1
+        fragment = build()
+        with self._lock:
+            self._entries[key] = fragment
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fragment
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries)
+            }
+
+
+fragments = FragmentCache()
+
+_stylesheet = None
+
+
+def page_style_html(static_serving):
+    """A link to the stylesheet when Streamlit serves ./static, so browsers fetch it once; else the CSS inline"""
+    global _stylesheet
+    if static_serving:
+        return f'<link rel="stylesheet" href="{STYLESHEET_URL}">'
+    if _stylesheet is None:
+        with open(STYLESHEET_PATH, encoding="utf-8") as f:
+            _stylesheet = f.read()
+    return f"<style>\n{_stylesheet}</style>"
+
+
+def escape(value):
+    """Escape model output for the page; blank lines would otherwise end the HTML block in markdown"""
+    return html.escape(str(value)).replace("\n", "<br>")
+
+
+def _sub_events_html(sub_events):
+    if not sub_events:
+        return ''
+    items = "".join(f'<li><strong>{escape(year)}</strong>: {escape(event)}</li>' for year, event in sub_events)
+    return f'<ul style="margin: 0.5rem 0 0 0; color: #5a6c7d;">{items}</ul>'
+
+
+def _timeline_event_html(year, event, impact, probability, sub_events=()):
+    probability_class = f"probability-{probability.lower()}"
+    return (
+        '<div class="timeline-item">'
+        '<div style="display: flex; justify-content: space-between; align-items: center;">'
+        f'<h3 style="margin: 0; color: #667eea;">📍 {escape(year)}</h3>'
+        f'<span class="{escape(probability_class)}">{escape(probability)} Probability</span>'
+        '</div>'
+        f'<h4 style="margin: 0.5rem 0; color: #2c3e50;">{escape(event)}</h4>'
+        f'<p style="margin: 0.5rem 0 0 0; color: #5a6c7d;"><strong>Impact:</strong> {escape(impact)}</p>'
+        f'{_sub_events_html(sub_events)}'
+        '</div>'
+    )
+
+
+def timeline_event_html(event):
+    """HTML card for a single timeline event, listing its sub-events if it has been drilled into"""
+    values = (
+        str(event.get('year', 'Unknown')), str(event.get('event', 'Unknown event')),
+        str(event.get('impact', 'No impact specified')), str(event.get('probability', 'Medium')),
+        tuple((str(sub.get('year', '')), str(sub.get('event', ''))) for sub in event.get('sub_events', []))
+    )
+    return fragments.get(('timeline',) + values, lambda: _timeline_event_html(*values))
+
+
+def _news_item_html(headline, date, source, summary):
+    return (
+        '<div class="news-item">'
+        f'<h3 style="margin: 0 0 0.5rem 0; color: #2c3e50;">📢 {escape(headline)}</h3>'
+        '<div style="display: flex; justify-content: space-between; margin-bottom: 0.5rem;">'
+        f'<span style="color: #667eea; font-weight: bold;">📅 {escape(date)}</span>'
+        f'<span style="color: #e74c3c; font-weight: bold;">📺 {escape(source)}</span>'
+        '</div>'
+        f'<p style="margin: 0; color: black;">{escape(summary)}</p>'
+        '</div>'
+    )
+
+
+def news_item_html(item):
+    """HTML card for a single news item"""
+    values = (
+        str(item.get('headline', 'No headline')), str(item.get('date', 'Unknown date')),
+        str(item.get('source', 'Unknown')), str(item.get('summary', 'No summary available'))
+    )
+    return fragments.get(('news',) + values, lambda: _news_item_html(*values))
+
+
+def _chat_message_html(role, content, figure_label):
+    if role == 'user':
+        return f'<div class="chat-message" style="margin-left: 2rem;"><strong>🧑 You:</strong> {escape(content)}</div>'
+    return f'<div class="chat-message"><strong>{escape(figure_label)}:</strong> {escape(content)}</div>'
+
+
+def chat_message_html(message, figure_label):
+    """HTML bubble for one chat message"""
+    key = ('chat', message['role'], message['content'], figure_label)
+    return fragments.get(key, lambda: _chat_message_html(message['role'], message['content'], figure_label))
+
+
+def items_html(items, render_item):
+    """One fragment for a list of cards, e.g. the items streamed so far"""
+    return "\n".join(render_item(item) for item in items)
+
+
+def timeline_html(timeline):
+    """The summary card followed by every event, as one fragment"""
+    summary = (
+        '<div class="timeline-item"><h3>🎯 Timeline Summary</h3>'
+        f"<p><strong>{escape(timeline.get('summary', 'No summary available'))}</strong></p></div>"
+    )
+    return summary + "\n" + items_html(timeline.get('timeline', []), timeline_event_html)
+
+
+def newsfeed_html(newsfeed):
+    return items_html(newsfeed.get('news_items', []), news_item_html)
+
+
+def _archive_hit_html(year_text, text, question, mode):
+    return (
+        f'<div class="archive-hit"><strong>{escape(year_text)}</strong> {escape(text)}'
+        f'<br><small>{escape(mode)} · {escape(question)}</small></div>'
+    )
+
+
+def archive_hits_html(hits):
+    """Archive search results as one fragment"""
+    def render_hit(hit):
+        values = (str(hit['year_text']), str(hit['text']), str(hit['question']), str(hit['mode']))
+        return fragments.get(('archive',) + values, lambda: _archive_hit_html(*values))
+    return items_html(hits, render_hit)
+
+
+def chat_page_count(message_count, per_page):
+    return max(1, -(-message_count // per_page))
+
+
+def chat_page(messages, per_page, pages_back=0):
+    """The messages on one page, counting pages back from the newest"""
+    pages_back = min(max(pages_back, 0), chat_page_count(len(messages), per_page) - 1)
+    end = len(messages) - pages_back * per_page
+    return messages[max(0, end - per_page):end]
+
+
+def chat_html(messages, figure_label):
+    return items_html(messages, lambda message: chat_message_html(message, figure_label))
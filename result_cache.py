@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Set this to a file path to keep generated results across restarts
+DEFAULT_RESULT_CACHE_PATH = os.environ.get("TIME_MACHINE_RESULT_CACHE")
+
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    question = re.sub(r'\s+', ' ', question.strip().lower())
+    return question.rstrip(' ?!.')
+
+
+def context_hash(context_data):
+    """Stable hash of the Wikipedia context a result was generated from"""
+    items = [[item.get('title', ''), item.get('extract', '')] for item in context_data]
+    return hashlib.sha256(json.dumps(items).encode()).hexdigest()[:16]
+
+
+def result_cache_key(question, mode, context_data, prompt_version):
+    parts = [normalize_question(question), mode, context_hash(context_data), str(prompt_version)]
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+
+class ResultCache:
+    """Process-wide LRU cache of generated timelines and newsfeeds
+
+    Results are held as JSON text so every caller gets its own copy. When
+    `path` is given the cache is written through to SQLite and survives
+    restarts.
+    """
+
+    def __init__(self, max_entries=500, path=DEFAULT_RESULT_CACHE_PATH, prompt_version=None, max_persisted=10000):
+        self.max_entries = max_entries
+        self.max_persisted = max_persisted
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    prompt_version TEXT NOT NULL,
+                    payload TEXT NOT NULL
+                )
+            """)
+            # Results generated by older prompts are never looked up again
+            if prompt_version is not None:
+                self._conn.execute("DELETE FROM results WHERE prompt_version != ?", (str(prompt_version),))
+
+    def get(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+            elif self._conn is not None:
+                row = self._conn.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+                if row:
+                    payload = row[0]
+                    self._remember(key, payload)
+
+            if payload is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(payload)
+
+    def put(self, key, result, prompt_version):
+        payload = json.dumps(result)
+        with self._lock:
+            self._remember(key, payload)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO results (key, prompt_version, payload) VALUES (?, ?, ?)",
+                    (key, str(prompt_version), payload)
+                )
+                # Replaced rows get a fresh rowid, so this keeps the most recently written
+                self._conn.execute(
+                    "DELETE FROM results WHERE rowid <= (SELECT MAX(rowid) FROM results) - ?",
+                    (self.max_persisted,)
+                )
+
+    def _remember(self, key, payload):
+        self._entries[key] = payload
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, current_prompt_version=None):
+        """Drop everything, or only persisted results from other prompt versions"""
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                if current_prompt_version is None:
+                    self._conn.execute("DELETE FROM results")
+                else:
+                    self._conn.execute(
+                        "DELETE FROM results WHERE prompt_version != ?", (str(current_prompt_version),)
+                    )
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'persistent': self._conn is not None
+        }
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache(prompt_version=None):
+    """Return the result cache shared by every Streamlit session in this process"""
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = ResultCache(prompt_version=prompt_version)
+    return _result_cache
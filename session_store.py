@@ -0,0 +1,138 @@
+"""Results shared by every Streamlit session, referenced from session state by key
+
+Sessions keep only keys in st.session_state. The timelines, newsfeeds and
+Wikipedia context they point at are held once per process, however many
+sessions show them, and dropped when no session references them any more.
+Sessions not seen for TIME_MACHINE_SESSION_IDLE seconds (default 30
+minutes) lose what they hold here, chat sessions included.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+IDLE_SECONDS = float(os.environ.get("TIME_MACHINE_SESSION_IDLE", "1800"))
+
+
+def content_key(payload):
+    return hashlib.sha256(payload.encode()).hexdigest()[:20]
+
+
+class SessionStore:
+    """Content-addressed values referenced by sessions, plus each session's private objects
+
+    Values are shared between sessions, so callers must not modify what
+    get() returns; put() a new value instead. Idle sessions are swept at
+    most once every `sweep_interval` seconds, on the next call.
+    """
+
+    def __init__(self, idle_seconds=IDLE_SECONDS, sweep_interval=60.0, clock=time.monotonic):
+        self.idle_seconds = idle_seconds
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self.shared_puts = 0
+        self.evicted_sessions = 0
+
+        # key -> [value, sessions referencing it, size of its JSON]
+        self._values = {}
+        # session id -> {'seen': time, 'refs': {slot: key}, 'private': {name: object}}
+        self._sessions = {}
+        self._last_sweep = clock()
+        self._lock = threading.Lock()
+
+    def _session(self, session_id):
+        now = self.clock()
+        if now - self._last_sweep >= self.sweep_interval:
+            self._sweep(now)
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = {'seen': now, 'refs': {}, 'private': {}}
+        session['seen'] = now
+        return session
+
+    def _release(self, key):
+        entry = self._values.get(key)
+        if entry is not None:
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._values[key]
+
+    def put(self, session_id, slot, value):
+        """Point this session's `slot` at `value`, reusing an identical stored value"""
+        payload = json.dumps(value, sort_keys=True)
+        key = content_key(payload)
+        with self._lock:
+            session = self._session(session_id)
+            if session['refs'].get(slot) == key:
+                return key
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [value, 0, len(payload)]
+            else:
+                self.shared_puts += 1
+            entry[1] += 1
+            previous = session['refs'].get(slot)
+            session['refs'][slot] = key
+            if previous is not None:
+                self._release(previous)
+        return key
+
+    def get(self, session_id, slot):
+        with self._lock:
+            key = self._session(session_id)['refs'].get(slot)
+            entry = self._values.get(key) if key else None
+            return entry[0] if entry else None
+
+    def private(self, session_id, name, factory):
+        """A mutable per-session object, created by factory() on first use"""
+        with self._lock:
+            objects = self._session(session_id)['private']
+            if name not in objects:
+                objects[name] = factory()
+            return objects[name]
+
+    def _drop(self, session_id):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            for key in session['refs'].values():
+                self._release(key)
+
+    def evict_idle(self):
+        """Drop sessions idle for `idle_seconds` now instead of on the next sweep"""
+        with self._lock:
+            self._sweep(self.clock())
+
+    def _sweep(self, now):
+        self._last_sweep = now
+        idle = [session_id for session_id, session in self._sessions.items()
+                if now - session['seen'] >= self.idle_seconds]
+        for session_id in idle:
+            self._drop(session_id)
+        self.evicted_sessions += len(idle)
+
+    def stats(self):
+        with self._lock:
+            references = sum(len(session['refs']) for session in self._sessions.values())
+            return {
+                'sessions': len(self._sessions),
+                'values': len(self._values),
+                'references': references,
+                'shared_puts': self.shared_puts,
+                'bytes': sum(entry[2] for entry in self._values.values()),
+                'evicted_sessions': self.evicted_sessions
+            }
+
+
+_session_store = None
+_session_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Return the store shared by every Streamlit session in this process"""
+    global _session_store
+    if _session_store is None:
+        with _session_store_lock:
+            if _session_store is None:
+                _session_store = SessionStore()
+    return _session_store
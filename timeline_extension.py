@@ -0,0 +1,95 @@
+"""Follow-up generations that build on a timeline instead of regenerating it
+
+Extending a timeline or drilling into one of its events sends the model a
+digest of what is already there, one short line per event, and merges the
+new events into the existing ones in year order. Timelines may be shared
+between sessions, so merging always returns new dicts and lists.
+"""
+import re
+
+from chat_session import estimate_tokens
+
+# "1815", "c. 1820", "1820s", "June 18, 1815", "15 March 44 BC", "Year 5"
+YEAR_PATTERN = re.compile(r'(?<!\d)(\d{1,4})(?!\d)(?:\s*(BCE|BC|CE|AD)\b)?', re.IGNORECASE)
+
+# Words of each event kept in the digest
+DIGEST_EVENT_WORDS = 14
+
+
+def event_year(text):
+    """Year of a timeline entry as a number to sort by, negative for BC, or None
+
+    A number with an era wins, then one of three or four digits, so the day
+    in "June 18, 1815" or "18 June 1815" is not taken for the year; a bare
+    small number ("Year 5") is the fallback.
+    """
+    matches = list(YEAR_PATTERN.finditer(str(text or '')))
+    if not matches:
+        return None
+    match = (
+        next((match for match in matches if match.group(2)), None)
+        or next((match for match in matches if len(match.group(1)) >= 3), None)
+        or matches[0]
+    )
+    year = int(match.group(1))
+    return -year if match.group(2) and match.group(2).upper().startswith('B') else year
+
+
+def sort_events(events):
+    """Events in year order; entries without a readable year keep their place at the end"""
+    return sorted(events, key=lambda event: (event_year(event.get('year')) is None, event_year(event.get('year')) or 0))
+
+
+def last_year(events):
+    years = [event_year(event.get('year')) for event in events]
+    years = [year for year in years if year is not None]
+    return max(years) if years else None
+
+
+def _event_line(event):
+    words = str(event.get('event', '')).split()
+    text = " ".join(words[:DIGEST_EVENT_WORDS]) + ("..." if len(words) > DIGEST_EVENT_WORDS else "")
+    return f"{event.get('year', '?')}: {text}"
+
+
+def timeline_digest(timeline, max_tokens=200):
+    """The timeline as one line per event, keeping the latest events if it is too long"""
+    lines = [_event_line(event) for event in timeline.get('timeline', [])]
+    dropped = False
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+        dropped = True
+    return "\n".join((["..."] if dropped else []) + lines)
+
+
+def _event_key(event):
+    return event_year(event.get('year')), re.sub(r'\W+', ' ', str(event.get('event', '')).lower()).strip()
+
+
+def merge_events(events, new_events, after=None):
+    """Existing events plus the new ones not already there, in year order
+
+    With `after`, new events dated on or before that year are dropped, so an
+    extension cannot rewrite the part of the timeline the user has seen.
+    """
+    seen = {_event_key(event) for event in events}
+    merged = list(events)
+    for event in new_events:
+        if not isinstance(event, dict) or not event.get('event'):
+            continue
+        year = event_year(event.get('year'))
+        if after is not None and (year is None or year <= after):
+            continue
+        key = _event_key(event)
+        if key not in seen:
+            seen.add(key)
+            merged.append(event)
+    return sort_events(merged)
+
+
+def add_sub_events(timeline, index, sub_events):
+    """A copy of `timeline` with `sub_events` merged under its event at `index`"""
+    events = list(timeline.get('timeline', []))
+    event = events[index]
+    events[index] = dict(event, sub_events=merge_events(event.get('sub_events', []), sub_events))
+    return dict(timeline, timeline=events)
@@ -0,0 +1,126 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "TIME_MACHINE_WIKI_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "wiki_summaries.sqlite3")
+)
+
+# Sentinel for "not in cache", since None is a cached 404
+MISSING = object()
+
+
+class SummaryCache:
+    """Persistent SQLite cache of Wikipedia summaries shared by all sessions and processes
+
+    Found pages are kept for `ttl` seconds and 404s for `negative_ttl` seconds.
+    Once more than `max_entries` rows are stored the least recently used are evicted.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=7 * 24 * 3600, negative_ttl=3600, max_entries=20000):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        # WAL lets Streamlit worker processes read while another one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS summaries (
+                term TEXT PRIMARY KEY,
+                payload TEXT,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used)")
+
+    def get(self, term):
+        """Return the cached summary, None for a cached 404, or MISSING"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM summaries WHERE term = ?", (term,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return MISSING
+
+            payload, expires_at = row
+            if expires_at <= now:
+                self._conn.execute("DELETE FROM summaries WHERE term = ?", (term,))
+                self.expired += 1
+                self.misses += 1
+                return MISSING
+
+            self._conn.execute("UPDATE summaries SET last_used = ? WHERE term = ?", (now, term))
+            if payload is None:
+                self.negative_hits += 1
+                return None
+            self.hits += 1
+            return json.loads(payload)
+
+    def put(self, term, data):
+        """Store a summary, or None to remember that the page does not exist"""
+        now = time.time()
+        if data is None:
+            payload, expires_at = None, now + self.negative_ttl
+        else:
+            payload, expires_at = json.dumps(data), now + self.ttl
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (term, payload, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (term, payload, expires_at, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used rows beyond max_entries"""
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM summaries WHERE term IN "
+                "(SELECT term FROM summaries ORDER BY last_used LIMIT ?)", (excess,)
+            )
+            self.evictions += excess
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM summaries")
+
+    def stats(self):
+        """Hit/miss counters for this process plus the current size of the shared store"""
+        with self._lock:
+            entries, negative = self._conn.execute(
+                "SELECT COUNT(*), COUNT(*) - COUNT(payload) FROM summaries"
+            ).fetchone()
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            'entries': entries,
+            'negative_entries': negative,
+            'max_entries': self.max_entries
+        }
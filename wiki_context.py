@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from wiki_cache import MISSING, SummaryCache
+
+WIKIPEDIA_SUMMARY_URL = "https://en.wikipedia.org/api/rest_v1/page/summary/"
+
+
+class ContextProvider(ABC):
+    """Source of page summaries ({'title', 'extract'} dicts) for generation context"""
+
+    @abstractmethod
+    def fetch_all(self, terms, deadline=None):
+        """Return one summary or None per term, in the same order"""
+
+    def close(self):
+        pass
+
+
+class LatencyTracker:
+    """Percentiles over a sliding window of recent request latencies"""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, pct):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+class WikipediaFetcher(ContextProvider):
+    """Fetch Wikipedia page summaries concurrently over one pooled HTTP session
+
+    With `hedge` on, a term still outstanding after the `hedge_percentile`
+    of recent latencies gets a second, identical request and whichever
+    answers first is used, so one stalled connection does not hold up the
+    whole context stage.
+    """
+
+    def __init__(self, base_url=WIKIPEDIA_SUMMARY_URL, max_workers=8, deadline=5.0, cache=None,
+                 hedge=True, hedge_percentile=95, initial_hedge_delay=0.5, min_hedge_delay=0.05):
+        self.base_url = base_url
+        self.deadline = deadline
+        self.cache = cache
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.latencies = LatencyTracker()
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._stats_lock = threading.Lock()
+
+        # One keep-alive session shared by every worker thread
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = "AI-Time-Machine/1.0"
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wiki-fetch")
+
+    def fetch_summary(self, term, timeout):
+        """Fetch a single page summary, returning None if the page is missing"""
+        response = self.session.get(f"{self.base_url}{term}", timeout=timeout)
+        if response.status_code == 404:
+            data = None
+        else:
+            response.raise_for_status()
+            data = response.json()
+
+        # Only definite answers are cached; timeouts and server errors are retried next time
+        if self.cache is not None:
+            self.cache.put(term, data)
+        return data
+
+    def _timed_fetch(self, term, timeout):
+        with self._stats_lock:
+            self.requests += 1
+        start = time.monotonic()
+        data = self.fetch_summary(term, timeout)
+        self.latencies.record(time.monotonic() - start)
+        return data
+
+    def hedge_delay(self):
+        """How long to wait on a request before sending a duplicate"""
+        if len(self.latencies) < 20:
+            return self.initial_hedge_delay
+        return max(self.min_hedge_delay, self.latencies.percentile(self.hedge_percentile))
+
+    def fetch_all(self, terms, deadline=None):
+        """Fetch summaries for all terms within one overall deadline, keeping their order
+
+        Terms that have not arrived by the deadline come back as None, so the
+        caller can go ahead with whatever context it has.
+        """
+        if deadline is None:
+            deadline = self.deadline
+        expires_at = time.monotonic() + deadline
+
+        results = [MISSING] * len(terms)
+        if self.cache is not None:
+            for i, term in enumerate(terms):
+                results[i] = self.cache.get(term)
+
+        pending = {
+            self.executor.submit(self._timed_fetch, term, deadline): i
+            for i, term in enumerate(terms) if results[i] is MISSING
+        }
+        hedge_at = time.monotonic() + self.hedge_delay() if self.hedge else None
+        hedged = set()
+
+        while pending:
+            now = time.monotonic()
+            if now >= expires_at:
+                break
+            wake_at = expires_at if hedge_at is None else min(expires_at, hedge_at)
+            done, _ = wait(pending, timeout=wake_at - now, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                i = pending.pop(future)
+                if results[i] is MISSING and future.exception() is None:
+                    results[i] = future.result()
+                    if future in hedged:
+                        with self._stats_lock:
+                            self.hedge_wins += 1
+                    # The other copy of this request is no longer needed
+                    for other in [other for other, j in pending.items() if j == i]:
+                        other.cancel()
+                        del pending[other]
+
+            if hedge_at is not None and time.monotonic() >= hedge_at:
+                for i in set(pending.values()):
+                    future = self.executor.submit(self._timed_fetch, terms[i], max(0.01, expires_at - time.monotonic()))
+                    pending[future] = i
+                    hedged.add(future)
+                    with self._stats_lock:
+                        self.hedges += 1
+                hedge_at = None
+
+        # Anything still running past the deadline is dropped, not waited for
+        for future in pending:
+            future.cancel()
+        return [None if result is MISSING else result for result in results]
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'p50': self.latencies.percentile(50),
+            'p95': self.latencies.percentile(95)
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_wikipedia_fetcher():
+    """Return the process-wide context provider shared by all sessions
+
+    Uses the local abstracts index named by TIME_MACHINE_WIKI_INDEX when set,
+    so nothing leaves the machine, and the Wikipedia REST API otherwise.
+    """
+    global _fetcher
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                index_path = os.environ.get("TIME_MACHINE_WIKI_INDEX")
+                if index_path:
+                    from wiki_offline import OfflineWikipedia
+                    _fetcher = OfflineWikipedia(index_path)
+                else:
+                    _fetcher = WikipediaFetcher(cache=SummaryCache())
+    return _fetcher
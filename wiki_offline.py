@@ -0,0 +1,193 @@
+"""Serve Wikipedia summaries from a local enwiki abstracts dump
+
+Build the index once from a dump (plain, .gz or .bz2), optionally with a
+tab-separated file of `redirect title<TAB>target title` lines:
+
+    python -m wiki_offline build enwiki-latest-abstract.xml.gz wiki.idx --redirects redirects.tsv
+
+then point the app at it with TIME_MACHINE_WIKI_INDEX=wiki.idx.
+"""
+import argparse
+import bz2
+import gzip
+import hashlib
+import mmap
+import re
+import struct
+import xml.etree.ElementTree as ElementTree
+
+from wiki_context import ContextProvider
+
+MAGIC = b"TMWIKI1\0"
+# magic, number of keys, offset of the key table
+HEADER = struct.Struct("<8sQQ")
+# title length, extract length; the UTF-8 text follows
+RECORD = struct.Struct("<II")
+# folded title hash, record offset; sorted by hash
+ENTRY = struct.Struct("<QQ")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fold_title(title):
+    """Key used for lookups, so "napoleon", "Napoleon_Bonaparte" and "NAPOLEON BONAPARTE" agree"""
+    return _WHITESPACE.sub(" ", title.replace("_", " ")).strip().casefold()
+
+
+def title_hash(title):
+    return int.from_bytes(hashlib.blake2b(fold_title(title).encode(), digest_size=8).digest(), "little")
+
+
+def open_dump(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def read_abstracts(path):
+    """Yield (title, abstract) for every <doc> in an abstracts dump, in constant memory"""
+    with open_dump(path) as dump:
+        for _, element in ElementTree.iterparse(dump, events=("end",)):
+            if element.tag != "doc":
+                continue
+            title = (element.findtext("title") or "").strip()
+            if title.startswith("Wikipedia:"):
+                title = title[len("Wikipedia:"):].strip()
+            abstract = (element.findtext("abstract") or "").strip()
+            element.clear()
+            if title:
+                yield title, abstract
+
+
+def read_redirects(path):
+    with open(path, encoding="utf-8") as redirects:
+        for line in redirects:
+            source, _, target = line.rstrip("\n").partition("\t")
+            if source and target:
+                yield source, target
+
+
+def build_index(dump_path, index_path, redirects_path=None):
+    """Write the index file and return (articles, redirects) counted into it
+
+    Articles are written one after another as length-prefixed records, then
+    a table of (title hash, record offset) pairs sorted by hash, so a lookup
+    is a binary search over the memory-mapped table plus one record read.
+    Redirects, whether from the redirects file or "#REDIRECT" abstracts, are
+    extra table entries pointing at their target's record.
+    """
+    offsets = {}
+    pending_redirects = []
+
+    with open(index_path, "wb") as index:
+        index.write(HEADER.pack(MAGIC, 0, 0))
+        for title, abstract in read_abstracts(dump_path):
+            match = re.match(r"#REDIRECT\s*\[\[([^\]|#]+)", abstract, re.IGNORECASE)
+            if match:
+                pending_redirects.append((title, match.group(1)))
+                continue
+            key = title_hash(title)
+            if key in offsets:
+                continue
+            offsets[key] = index.tell()
+            title_bytes, abstract_bytes = title.encode(), abstract.encode()
+            index.write(RECORD.pack(len(title_bytes), len(abstract_bytes)))
+            index.write(title_bytes)
+            index.write(abstract_bytes)
+        articles = len(offsets)
+
+        if redirects_path:
+            pending_redirects.extend(read_redirects(redirects_path))
+        for source, target in pending_redirects:
+            source_key, target_key = title_hash(source), title_hash(target)
+            if source_key not in offsets and target_key in offsets:
+                offsets[source_key] = offsets[target_key]
+
+        table_offset = index.tell()
+        for key in sorted(offsets):
+            index.write(ENTRY.pack(key, offsets[key]))
+        index.seek(0)
+        index.write(HEADER.pack(MAGIC, len(offsets), table_offset))
+
+    return articles, len(offsets) - articles
+
+
+class OfflineWikipedia(ContextProvider):
+    """Look up page summaries in an index built by build_index
+
+    The file is memory-mapped read-only, so it costs no memory beyond the
+    pages a lookup touches, the OS shares those pages between processes,
+    and lookups need no locking.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self._file = open(index_path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.table_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{index_path} is not a Wikipedia abstracts index")
+
+    def _record_offset(self, key):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            entry_key, offset = ENTRY.unpack_from(self._map, self.table_offset + middle * ENTRY.size)
+            if entry_key == key:
+                return offset
+            if entry_key < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def has_title(self, title):
+        """Whether the title, or a redirect to it, is in the index"""
+        return self._record_offset(title_hash(title)) is not None
+
+    def fetch_summary(self, term, timeout=None):
+        """Return {'title', 'extract'} like the REST API, or None if there is no such page"""
+        offset = self._record_offset(title_hash(term))
+        if offset is None:
+            return None
+        title_length, extract_length = RECORD.unpack_from(self._map, offset)
+        start = offset + RECORD.size
+        title = self._map[start:start + title_length].decode()
+        extract = self._map[start + title_length:start + title_length + extract_length].decode()
+        return {'title': title, 'extract': extract}
+
+    def fetch_all(self, terms, deadline=None):
+        return [self.fetch_summary(term) for term in terms]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build an index from an abstracts dump")
+    build.add_argument("dump", help="enwiki abstracts XML, optionally .gz or .bz2")
+    build.add_argument("index", help="index file to write")
+    build.add_argument("--redirects", help="tab-separated redirect title and target title per line")
+    lookup = commands.add_parser("lookup", help="look titles up in an index")
+    lookup.add_argument("index")
+    lookup.add_argument("titles", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        articles, redirects = build_index(args.dump, args.index, args.redirects)
+        print(f"Indexed {articles} articles and {redirects} redirects into {args.index}")
+    else:
+        wiki = OfflineWikipedia(args.index)
+        for title in args.titles:
+            print(f"{title}: {wiki.fetch_summary(title)}")
+        wiki.close()
+
+
+if __name__ == "__main__":
+    main()